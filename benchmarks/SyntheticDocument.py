@@ -0,0 +1,131 @@
+import math
+import random
+from array import array
+
+from io_scene_ogex.pyddl import DdlPrimitiveDataType as DataType
+from io_scene_ogex.pygex import *
+
+__author__ = 'Jonathan Hale'
+
+"""
+Generation of synthetic OpenGEX documents for benchmarking pyddl without Blender.
+"""
+
+
+def random_matrix(rng):
+    """
+    :param rng: random.Random to generate the matrix with
+    :return: a 4x4 rotation and translation matrix as list of rows
+    """
+    angle = rng.uniform(0.0, 2.0 * math.pi)
+    c, s = math.cos(angle), math.sin(angle)
+    return [[c, -s, 0.0, rng.uniform(-10.0, 10.0)],
+            [s, c, 0.0, rng.uniform(-10.0, 10.0)],
+            [0.0, 0.0, 1.0, rng.uniform(-10.0, 10.0)],
+            [0.0, 0.0, 0.0, 1.0]]
+
+
+def vertex_data(rng, vertex_count, vector_size, flat):
+    """
+    :param rng: random.Random to generate the data with
+    :param vertex_count: number of vertices
+    :param vector_size: number of components per vertex
+    :param flat: whether to return a flat array instead of a list of tuples
+    :return: random vertex data
+    """
+    values = [rng.uniform(-1.0, 1.0) for _ in range(vertex_count * vector_size)]
+    if flat:
+        return array("f", values)
+    return list(zip(*[iter(values)] * vector_size))
+
+
+def geometry_object(rng, name, vertex_count, flat):
+    """
+    Create a GeometryObject with a triangle mesh of position, normal and texcoord VertexArrays and an IndexArray.
+    """
+    index_count = vertex_count - vertex_count % 3
+    indices = [rng.randrange(vertex_count) for _ in range(index_count)]
+    if flat:
+        indices = array("I", indices)
+    else:
+        indices = list(zip(*[iter(indices)] * 3))
+
+    mesh = Mesh(children=[
+        VertexArray(B"position", vertex_data(rng, vertex_count, 3, flat), vertex_count),
+        VertexArray(B"normal", vertex_data(rng, vertex_count, 3, flat), vertex_count),
+        VertexArray(B"texcoord", vertex_data(rng, vertex_count, 2, flat), vertex_count, vector_size=2),
+        DdlStructure(B"IndexArray", children=[
+            DdlTextWriter.set_max_elements_per_line(
+                DdlPrimitive(DataType.unsigned_int32, data=indices, vector_size=3), 8)
+        ])
+    ])
+
+    geometry = GeometryObject(name)
+    geometry.children.append(mesh)
+    return geometry
+
+
+def animation(rng, transform, frame_count):
+    """
+    Create an Animation structure with a sampled Track targeting the given Transform.
+    """
+    times = [frame / 24.0 for frame in range(frame_count)]
+    matrices = [tuple(itertools.chain(*zip(*random_matrix(rng)))) for _ in range(frame_count)]
+
+    return DdlStructure(B"Animation", children=[
+        Track(target=transform, children=[
+            Time(children=[Key(data=times)]),
+            Value(children=[Key(data=matrices, vector_size=16)])
+        ])
+    ])
+
+
+def build_document(vertex_count=10000, node_count=100, frame_count=0, depth=1, geometry_count=4, flat=False,
+                   seed=0):
+    """
+    Build a synthetic OpenGEX document.
+    :param vertex_count: number of vertices of each GeometryObject
+    :param node_count: number of GeometryNodes
+    :param frame_count: number of animation samples per node, 0 for no animation
+    :param depth: nesting depth of the node hierarchy
+    :param geometry_count: number of GeometryObjects shared by the nodes
+    :param flat: whether to store primitive data in flat arrays instead of lists of tuples
+    :param seed: seed for the random data
+    :return: the generated DdlDocument
+    """
+    rng = random.Random(seed)
+    document = DdlDocument()
+
+    document.structures.extend([
+        Metric(B"distance", DataType.float, 1.0),
+        Metric(B"angle", DataType.float, 1.0),
+        Metric(B"time", DataType.float, 1.0),
+        Metric(B"up", DataType.string, "z")
+    ])
+
+    geometries = [geometry_object(rng, bytes("geometry{}".format(i + 1), "UTF-8"), vertex_count, flat)
+                  for i in range(geometry_count)]
+
+    parent = None
+    for i in range(node_count):
+        transform = Transform(random_matrix(rng))
+        transform.name = B"transform"
+        transform.name_is_global = False
+
+        node = DdlStructure(B"GeometryNode", name=bytes("node{}".format(i + 1), "UTF-8"), children=[
+            Name("Node {}".format(i + 1)),
+            ObjectRef(geometries[i % geometry_count]),
+            transform
+        ])
+        if frame_count > 0:
+            node.children.append(animation(rng, transform, frame_count))
+
+        # chains of nested nodes up to the requested depth
+        if i % depth == 0:
+            document.structures.append(node)
+        else:
+            parent.children.append(node)
+        parent = node
+
+    document.structures.extend(geometries)
+    return document
@@ -0,0 +1,131 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "src"))
+
+from benchmarks.SyntheticDocument import build_document
+from io_scene_ogex.pyddl import *
+
+__author__ = "Jonathan Hale"
+
+"""
+Benchmarks for pyddl writers and readers on synthetic documents. Runs in plain CPython, Blender is not required.
+
+Example: python run_benchmarks.py --vertices 100000 --nodes 1000 --frames 24 --depth 4
+"""
+
+writers = OrderedDict([
+    ("text", lambda document: DdlTextWriter(document)),
+    ("text (float32)", lambda document: DdlTextWriter(document, float_encoding=DdlFloatEncoding.float32)),
+    ("text (hex)", lambda document: DdlTextWriter(document, float_encoding=DdlFloatEncoding.hex)),
+    ("compressed text", lambda document: DdlCompressedTextWriter(document)),
+    ("binary", lambda document: DdlBinaryWriter(document)),
+])
+
+
+def measure(function, repeat):
+    """
+    Run a function several times.
+    :param function: function to run
+    :param repeat: number of timed runs
+    :return: tuple of the best time in seconds and the peak memory allocated during an extra run in bytes
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    # tracing allocations slows down execution, so the peak memory is measured separately
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return best, peak
+
+
+def structures_by_type(document):
+    """
+    :param document: the document to collect the structures of
+    :return: OrderedDict of structure identifiers to lists of all structures with that identifier
+    """
+    result = OrderedDict()
+    pending = list(reversed(document.structures))
+    while pending:
+        structure = pending.pop()
+        if isinstance(structure, DdlStructure):
+            result.setdefault(structure.identifier, []).append(structure)
+            pending.extend(reversed(structure.children))
+    return result
+
+
+def benchmark_structure_types(document, repeat):
+    """
+    Time serializing all structures of each type with DdlTextWriter, including their substructures.
+    :param document: the document to benchmark
+    :param repeat: number of timed runs
+    """
+    writer = DdlTextWriter(document)
+    print("\n{:<20} {:>9} {:>11} {:>14} {:>10}".format("structure", "count", "seconds", "us/structure", "MB/s"))
+
+    for identifier, structures in structures_by_type(document).items():
+        size = sum(len(writer.structure_as_text(structure)) for structure in structures)
+        seconds, _ = measure(lambda: [writer.structure_as_text(structure) for structure in structures], repeat)
+        print("{:<20} {:>9} {:>11.4f} {:>14.2f} {:>10.2f}".format(
+            identifier.decode(), len(structures), seconds, seconds / len(structures) * 1e6, size / 1e6 / seconds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pyddl writers and readers on synthetic documents.")
+    parser.add_argument("--vertices", type=int, default=100000, help="vertices per GeometryObject")
+    parser.add_argument("--geometries", type=int, default=4, help="number of GeometryObjects")
+    parser.add_argument("--nodes", type=int, default=1000, help="number of GeometryNodes")
+    parser.add_argument("--frames", type=int, default=24, help="animation samples per node, 0 for no animation")
+    parser.add_argument("--depth", type=int, default=4, help="nesting depth of the node hierarchy")
+    parser.add_argument("--flat", action="store_true", help="store primitive data in flat arrays")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs, the best is reported")
+    parser.add_argument("--no-types", action="store_true", help="skip the per structure type timings")
+    args = parser.parse_args()
+
+    def build():
+        return build_document(vertex_count=args.vertices, node_count=args.nodes, frame_count=args.frames,
+                              depth=args.depth, geometry_count=args.geometries, flat=args.flat)
+
+    seconds, peak = measure(build, 1)
+    document = build()
+    print("Generated document in {:.2f} s, peak memory {:.1f} MB".format(seconds, peak / 1e6))
+
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, "Benchmark.ogex")
+
+    print("\n{:<20} {:>9} {:>11} {:>10} {:>14}".format("writer", "MB", "seconds", "MB/s", "peak MB"))
+    try:
+        for name, create_writer in writers.items():
+            seconds, peak = measure(lambda: create_writer(document).write(filename), args.repeat)
+            size = os.path.getsize(filename)
+            print("{:<20} {:>9.2f} {:>11.4f} {:>10.2f} {:>14.1f}".format(
+                name, size / 1e6, seconds, size / 1e6 / seconds, peak / 1e6))
+
+        # read back the text written by the default text writer
+        writers["text"](document).write(filename)
+        size = os.path.getsize(filename)
+        seconds, peak = measure(lambda: DdlTextReader().read(filename), args.repeat)
+        print("{:<20} {:>9.2f} {:>11.4f} {:>10.2f} {:>14.1f}".format(
+            "text reader", size / 1e6, seconds, size / 1e6 / seconds, peak / 1e6))
+    finally:
+        if os.path.isfile(filename):
+            os.remove(filename)
+        os.rmdir(directory)
+
+    if not args.no_types:
+        benchmark_structure_types(document, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
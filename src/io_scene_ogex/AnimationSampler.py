@@ -0,0 +1,62 @@
+__author__ = 'Jonathan Hale'
+
+
+class AnimationSampler:
+    """
+    Samples the animated values of all objects in a single pass over the frame range of the scene. Setting a frame
+    evaluates the whole scene, so sampling every object separately would cost a pass over the timeline per object.
+    Requests are collected while the nodes are exported and fill the Key structures of their Tracks in sample().
+    """
+
+    def __init__(self, begin_frame, end_frame):
+        """
+        Constructor
+        :param begin_frame: first frame to sample
+        :param end_frame: last frame to sample
+        """
+        self.begin_frame = begin_frame
+        self.end_frame = end_frame
+        self.requests = []
+
+    def request(self, key, value, changed=None, static=None):
+        """
+        Request sampling a value at every frame.
+        :param key: Key DdlStructure to set the data of its primitive to the list of sampled values
+        :param value: function returning the value at the current frame, which must not change with the frame
+        :param changed: optional function returning whether the current frame differs from the frame the export
+        started at. Called for every frame but the last until it returns True
+        :param static: function to call instead of setting the data of the key if `changed` never returned True,
+        e.g. to remove the Animation
+        """
+        self.requests.append((key, value, changed, static))
+
+    def sample(self, scene):
+        """
+        Set every frame once, sample the values of all requests and restore the current frame afterwards.
+        :param scene: scene to sample
+        """
+        if len(self.requests) == 0:
+            return
+
+        current_frame = scene.frame_current
+        current_subframe = scene.frame_subframe
+
+        values = [[] for _ in self.requests]
+        changed = [changed is None for _, _, changed, _ in self.requests]
+        for frame in range(self.begin_frame, self.end_frame + 1):
+            scene.frame_set(frame)
+
+            for i, (_, value, is_changed, _) in enumerate(self.requests):
+                values[i].append(value())
+                if not changed[i] and frame != self.end_frame:
+                    changed[i] = is_changed()
+
+        scene.frame_set(current_frame, current_subframe)
+
+        for (key, _, _, static), key_values, key_changed in zip(self.requests, values, changed):
+            if key_changed:
+                key.children[0].data = key_values
+            else:
+                static()
+
+        self.requests = []
@@ -7,22 +7,22 @@ __author__ = 'Eric Lengyel, Jonathan Hale, Nicolas Wehrle'
 
 class BoneWrapper(BaseWrapper):
 
-    def __init__(self, bone, container, parent=None, offset=None):
+    def __init__(self, bone, container, parent, offset=None):
         super().__init__(bone, container, parent, offset)
 
+        # the armature object, which is the item of the NodeWrapper of the root bones
+        self.armature = getattr(parent, "armature", parent.item)
+
         self.process_bone()
 
         if len(bone.children) != 0:
             self.create_children(bone.children)
 
-        if bone.dupli_group:
-            offset = bone.dupli_group.dupli_offset
-            self.create_children(bone.dupli_group.objects, offset)
-
-    def process_bone(self, bone):
-        if self.container.exportAllFlag or bone.select:
+    def process_bone(self):
+        if self.container.exportAll or self.item.select:
             self.nodeRef["nodeType"] = NodeType.bone
             self.nodeRef["structName"] = bytes("node" + str(len(self.container.nodes)), "UTF-8")
+            self.container.bone_array[(self.armature, self.item.name)] = self
 
     def create_children(self, children, offset=None):
         for bone in children:
@@ -2,6 +2,8 @@ from enum import IntEnum
 
 from collections import OrderedDict
 
+from io_scene_ogex.AnimationSampler import AnimationSampler
+
 __author__ = 'Eric Lengyel, Jonathan Hale, Nicolas Wehrle'
 
 
@@ -19,12 +21,19 @@ class ExporterState:
         self.exportAll = export_all
         self.sampleAnimation = sample_animation
         self.boneParentArray = {}
+        # BoneWrappers of the exported bones by armature object and bone name
+        self.bone_array = {}
 
         self.beginFrame = scene.frame_start
         self.endFrame = scene.frame_end
         self.frameTime = 1.0 / (scene.render.fps_base * scene.render.fps)
+        # sampled animations, which are sampled together after all nodes are exported
+        self.animation_sampler = AnimationSampler(self.beginFrame, self.endFrame)
 
-        self.geometry_array = {}
+        self.geometry_array = OrderedDict()
+        # entries of GeometryObjects in geometry_array waiting for their Mesh, with the mesh data read by
+        # meshtools.read_mesh(), material count, cache key and skeleton
+        self.pending_geometry = []
         self.light_array = OrderedDict()
         self.camera_array = {}
         self.material_array = {}
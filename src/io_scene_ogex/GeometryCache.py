@@ -0,0 +1,70 @@
+import os
+
+from io_scene_ogex import meshtools
+
+__author__ = 'Jonathan Hale'
+
+
+class GeometryCache:
+    """
+    Directory of serialized Mesh structures addressed by the content of the mesh they were created from, to skip
+    processing and formatting meshes which did not change since a previous export.
+    """
+
+    # increase when the exported Mesh structures change, which invalidates all previously cached ones
+    version = 2
+
+    # separates the Mesh structures of the levels of detail, which never occurs in the text itself
+    separator = B"\0"
+
+    def __init__(self, directory, options):
+        """
+        Constructor
+        :param directory: directory to store the cached structures in, created when needed
+        :param options: str of all options which affect the text of the Mesh structures
+        """
+        self.directory = directory
+        self.salt = bytes("{} {}".format(self.version, options), "UTF-8")
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, data, num_materials):
+        """
+        :param data: dict of mesh data as returned by meshtools.read_mesh()
+        :param num_materials: number of materials used in the mesh
+        :return: key of the Mesh structure generated from the data
+        """
+        return meshtools.digest(data, num_materials, self.salt)
+
+    def filename(self, key):
+        return os.path.join(self.directory, key[:2], key + ".oddl")
+
+    def load(self, key):
+        """
+        :param key: key of the mesh as returned by key()
+        :return: list of the cached texts as bytes, one per level of detail, or None if the mesh is not cached
+        """
+        try:
+            with open(self.filename(key), "rb") as file:
+                text = file.read()
+        except OSError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return text.split(self.separator)
+
+    def store(self, key, texts):
+        """
+        Store the texts of the Mesh structures of a mesh. Concurrent exports may store the same key, so the file is
+        replaced atomically.
+        :param key: key of the mesh as returned by key()
+        :param texts: list of serialized Mesh structures as bytes, one per level of detail
+        """
+        filename = self.filename(key)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+        temp_filename = "{}.{}.tmp".format(filename, os.getpid())
+        with open(temp_filename, "wb") as file:
+            file.write(self.separator.join(texts))
+        os.replace(temp_filename, filename)
@@ -48,8 +48,7 @@ class NodeWrapper(BaseWrapper):
                 if skeleton:
                     for bone in skeleton.bones:
                         if not bone.parent:
-                            # FIXME register somehow
-                            self.bones.append(BoneWrapper(bone, self.container))
+                            self.bones.append(BoneWrapper(bone, self.container, self))
 
     def get_node_type(self):
         if self.item.type == "MESH":
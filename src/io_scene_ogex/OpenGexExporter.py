@@ -7,6 +7,13 @@ from io_scene_ogex.NodeWrapper import NodeWrapper
 from io_scene_ogex.ExporterState import *
 from io_scene_ogex.pygex import *
 
+try:
+    from io_scene_ogex import meshtools
+    from io_scene_ogex.GeometryCache import GeometryCache
+except ImportError:
+    # NumPy is not available, meshes are extracted with bmesh
+    meshtools = None
+
 __author__ = 'Eric Lengyel, Jonathan Hale, Nicolas Wehrle'
 
 k_animation_sampled = 0
@@ -36,9 +43,33 @@ image_format_items = [
 oddl_format_items = [
     ('TEXT', 'Text', 'Human readable text.', 0),
     ('COMPRESSED_TEXT', 'Compressed Text',
-     'Text without whitespaces, tabs or newlines.\nSmaller and faster to export.', 1)
+     'Text without whitespaces, tabs or newlines.\nSmaller and faster to export.', 1),
+    ('BINARY', 'Binary',
+     'Binary encoding with primitive data stored as raw little-endian arrays.\n'
+     'Smallest and fastest to export and load, but not human readable.', 2)
+]
+
+float_encoding_items = [
+    ('FIXED', 'Fixed Decimal Places', 'Decimal values rounded to the set amount of decimal places.', 0),
+    ('FLOAT32', 'Shortest Float',
+     'Shortest decimal values which read back as exactly the same 32 bit float.\n'
+     'Lossless for Blender data, double values are written in full.', 1),
+    ('HEX', 'Hexadecimal', 'Exact hexadecimal bit patterns of the floats.\nFastest to write and parse.', 2)
+]
+
+# pyddl float encodings of the float_encoding_items
+float_encodings = {'FIXED': DdlFloatEncoding.fixed, 'FLOAT32': DdlFloatEncoding.float32, 'HEX': DdlFloatEncoding.hex}
+
+compression_items = [
+    ('NONE', 'None', 'Write the file uncompressed.', 0),
+    ('GZIP', 'gzip', 'Compress the file with gzip (.gz) while writing.', 1),
+    ('BZ2', 'bzip2', 'Compress the file with bzip2 (.bz2) while writing.', 2),
+    ('LZMA', 'xz', 'Compress the file with LZMA (.xz) while writing.\nSmallest, but slowest to write.', 3)
 ]
 
+# pyddl compression names of the compression_items
+compression_methods = {'NONE': None, 'GZIP': "gzip", 'BZ2': "bz2", 'LZMA': "lzma"}
+
 
 class ProgressLog:
     def __init__(self):
@@ -49,8 +80,12 @@ class ProgressLog:
         print(message, end="", flush=True)
         self.lastTime = time.time()
 
-    def end_task(self):
-        print(" done! ({:.2f} ms)".format((time.time() - self.lastTime) * 1000))
+    def end_task(self, summary=None):
+        """
+        :param summary: optional short description of the result of the task, e.g. "3 merged"
+        """
+        elapsed = "{:.2f} ms".format((time.time() - self.lastTime) * 1000)
+        print(" done! ({})".format(elapsed if summary is None else summary + ", " + elapsed))
 
 
 class OpenGexExporter(bpy.types.Operator, ExportHelper):
@@ -70,11 +105,117 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
                                                         description="Only export the first material of any object. May"
                                                                     "be useful for some game engines for example.",
                                                         default=False)
+    bulk_mesh_extraction = bpy.props.BoolProperty(name="Bulk Mesh Extraction",
+                                                   description="Read mesh data with NumPy in bulk instead of per loop.\n"
+                                                               "Much faster for large meshes, needs NumPy",
+                                                   default=False)
+    geometry_processes = bpy.props.IntProperty(name="Geometry Processes",
+                                               description="Number of processes to weld meshes in after reading "
+                                                           "them. Needs Bulk Mesh Extraction, not available on "
+                                                           "Windows.",
+                                               default=1, min=1, max=64)
+    compact_indices = bpy.props.BoolProperty(name="Compact Indices",
+                                             description="Write index arrays as unsigned_int8 or unsigned_int16 "
+                                                         "when the number of vertices or bones allows it",
+                                             default=False)
+    half_precision = bpy.props.BoolProperty(name="Half Precision Normals and Texcoords",
+                                            description="Write normals and texture coordinates as 16 bit half floats",
+                                            default=False)
+    byte_colors = bpy.props.BoolProperty(name="Byte Vertex Colors",
+                                         description="Write vertex colors as unsigned_int8, mapping 0.0 to 1.0 to 0 to "
+                                                     "255. The importer needs to normalize them",
+                                         default=False)
+    optimize_vertex_cache = bpy.props.BoolProperty(name="Optimize Vertex Cache",
+                                                   description="Reorder triangles for the post-transform vertex "
+                                                               "cache and vertices by first use. Needs NumPy",
+                                                   default=False)
+    optimize_overdraw = bpy.props.BoolProperty(name="Optimize Overdraw",
+                                               description="Draw outward facing triangle clusters first to reduce "
+                                                           "overdraw, at a slight cost of vertex cache efficiency",
+                                               default=False)
+    lod_ratios = bpy.props.StringProperty(name="LOD Ratios", default='',
+                                          description="Comma separated fractions of triangles to keep for additional "
+                                                      "levels of detail, e.g. \"0.5, 0.25\". Needs NumPy, disabled "
+                                                      "if empty")
+    sparse_morph_targets = bpy.props.BoolProperty(name="Sparse Morph Targets",
+                                                  description="Export only the vertices changed by a morph target, "
+                                                              "with their offsets and normals, to 'SparseMorph' "
+                                                              "Extension structures instead of full vertex arrays",
+                                                  default=False)
+    max_bone_influences = bpy.props.IntProperty(name="Max Bone Influences",
+                                                description="Maximum number of bones influencing a vertex, the "
+                                                            "strongest influences are kept and normalized. 0 for no "
+                                                            "limit",
+                                                default=0, min=0, max=64)
+    weld_position_epsilon = bpy.props.FloatProperty(name="Weld Position Tolerance",
+                                                    description="Merge vertices whose positions differ by less than "
+                                                                "this distance and have equal bone weights and morph "
+                                                                "offsets. Needs Bulk Mesh Extraction, 0 to only merge "
+                                                                "shared vertices",
+                                                    default=0.0, min=0.0, precision=6)
+    weld_normal_epsilon = bpy.props.FloatProperty(name="Weld Normal Tolerance",
+                                                  description="Share vertices between faces whose normals differ by "
+                                                              "less than this per component. 0 for exact welding",
+                                                  default=0.0, min=0.0, precision=6)
+    weld_texcoord_epsilon = bpy.props.FloatProperty(name="Weld Texcoord Tolerance",
+                                                    description="Share vertices between faces whose texture "
+                                                                "coordinates differ by less than this per component. "
+                                                                "0 for exact welding",
+                                                    default=0.0, min=0.0, precision=6)
+    weld_color_epsilon = bpy.props.FloatProperty(name="Weld Color Tolerance",
+                                                 description="Share vertices between faces whose vertex colors "
+                                                             "differ by less than this per component. 0 for exact "
+                                                             "welding",
+                                                 default=0.0, min=0.0, precision=6)
+    split_meshes = bpy.props.BoolProperty(name="Split Large Meshes",
+                                          description="Split meshes with more vertices than Max Chunk Vertices into "
+                                                      "several GeometryObjects, referenced by subnodes of the "
+                                                      "GeometryNode, and index them with unsigned_int16. Meshes with "
+                                                      "shape keys are not split. Needs NumPy",
+                                          default=False)
+    max_chunk_vertices = bpy.props.IntProperty(name="Max Chunk Vertices",
+                                               description="Maximum number of vertices of a GeometryObject when "
+                                                           "splitting large meshes",
+                                               default=65535, min=3, max=65536)
+    deduplicate_geometry = bpy.props.BoolProperty(name="Merge Identical Geometry",
+                                                  description="Export meshes of different datablocks which result in "
+                                                              "identical vertex and index arrays only once. Needs "
+                                                              "NumPy",
+                                                  default=False)
+    geometry_cache_path = bpy.props.StringProperty(name="Geometry Cache Directory", default='', subtype='DIR_PATH',
+                                                   description="Directory to keep exported meshes in, to reuse them "
+                                                               "for unchanged meshes in later exports. Needs Bulk "
+                                                               "Mesh Extraction and a text format, disabled if "
+                                                               "empty.")
+    spool_mesh_text = bpy.props.BoolProperty(name="Spool Mesh Text",
+                                             description="Move the text of every mesh to a temporary file as soon as "
+                                                         "it is exported and free its data, so that only one mesh "
+                                                         "is kept in memory at a time, or one batch per geometry "
+                                                         "process. Nodes, materials, animations and the skeletons "
+                                                         "of skinned meshes stay in memory until the file is "
+                                                         "written. Ignored for the binary format",
+                                             default=False)
     rounding = bpy.props.IntProperty(name="Float Rounding Decimal Places",
                                      description="Amount of decimal places to round floating point values to.",
                                      default=6)
+    float_encoding = bpy.props.EnumProperty(name="Float Encoding", items=float_encoding_items, default='FIXED',
+                                            description="Text representation of floating point values.")
     oddl_format = bpy.props.EnumProperty(name="OpenDDL Format", items=oddl_format_items, default='TEXT',
                                          description="Format for the exported OpenGEX (based on OpenDDL) file.")
+    writer_processes = bpy.props.IntProperty(name="Writer Processes",
+                                             description="Number of processes to write the text formats in. Output "
+                                                         "is identical, but uses more memory. Not available on "
+                                                         "Windows.",
+                                             default=1, min=1, max=64)
+    compression = bpy.props.EnumProperty(name="Compression", items=compression_items, default='NONE',
+                                         description="Compress the exported file while it is being written.")
+    compression_level = bpy.props.IntProperty(name="Compression Level",
+                                              description="Compression level from 0 (fastest) to 9 (smallest).",
+                                              default=6, min=0, max=9)
+    compression_extension = bpy.props.StringProperty(name="Compressed File Extension", default='',
+                                                     description="Extension to append to the file name of "
+                                                                 "compressed files.\nLeave empty for the usual "
+                                                                 "extension of the compression, e.g. '.gz'.")
 
     # Extension settings
     export_custom_properties = bpy.props.BoolProperty(name="Export Custom Properties",
@@ -95,6 +236,16 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
     audio_path_prefix = bpy.props.StringProperty(name="Audio Path Prefix", default='',
                                                  description="Prefix relative to the exported scene file\n"
                                                              "to set audio paths to.\n\nExample: audio/")
+    export_bounds = bpy.props.BoolProperty(name="Export Bounding Volumes",
+                                           description="Export the bounding box and a bounding sphere of every "
+                                                       "GeometryObject to 'BoundingBox' and 'BoundingSphere' "
+                                                       "Extension structures. Needs NumPy",
+                                           default=False)
+    export_node_bounds = bpy.props.BoolProperty(name="Export Node Bounds",
+                                                description="Export the world space bounding box of every "
+                                                            "GeometryNode and its subnodes to a 'WorldBoundingBox' "
+                                                            "Extension structure. Needs NumPy",
+                                                default=False)
 
     # image texture export properties
     export_image_textures = bpy.props.BoolProperty(name="Export Image Textures",
@@ -111,6 +262,7 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
         self.container = None
         self.document = None
         self.unresolved_refs = []
+        self.unresolved_bone_refs = []
 
     @staticmethod
     def get_shape_keys(mesh):
@@ -121,13 +273,6 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
 
         return None
 
-    def find_node(self, name):
-        # TODO this does not seem very efficient...
-        for nodeRef in self.node_array.items():
-            if nodeRef[0].name == name:
-                return nodeRef
-        return None
-
     @staticmethod
     def find_export_vertex(bucket, export_vertex_array, vertex):
 
@@ -305,147 +450,104 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
 
     def export_node_sampled_animation(self, nw, node, scene):
         """
-        Export animation as full 4x4 matrices for each frame.
+        Export animation as full 4x4 matrices for each frame. The matrices are sampled by the AnimationSampler of the
+        container after all nodes are exported, which removes the Animation if the transform never changes.
         :param nw: Node wrapper
         :param node: the node to export the animated transforms for
         :param scene: the current scene
         :return: the created Animation DdlStructure
         """
-        # Save frame settings to later restore
-        previous_frame = scene.frame_current
-        previous_subframe = scene.frame_subframe
+        begin_frame = self.container.beginFrame
+        end_frame = self.container.endFrame
+        frame_time = self.container.frameTime
+
+        value_key = Key(vector_size=16)
+        animation_struct = DdlStructure(B"Animation", children=[
+            Track(target=B"%transform", children=[
+                Time(children=[
+                    Key(data=[((i - begin_frame) * frame_time) for i in range(begin_frame, end_frame + 1)])
+                ]),
+                Value(children=[value_key])
+            ])
+        ])
 
         # if transform for frames is the same, there is no need for animation.
-        has_animation = False
         first_frame_transform = node.matrix_local.copy()
-        for i in range(self.container.beginFrame, self.container.endFrame):
-            # matrix_local adapts to the current frame.
-            scene.frame_set(i)
-            cur_frame_transform = node.matrix_local
-
-            if OpenGexExporter.matrices_differ(first_frame_transform, cur_frame_transform):
-                has_animation = True
-                break
-
-        # if there is an animation, assemble the Animation DdlStructure
-        animation_struct = None
-        if has_animation:
-            # helper to get local transformation matrix at a certain frame index
-            def get_matrix_local_at_frame(i):
-                scene.frame_set(i)
-                blender_matrix = self.handle_offset(node.matrix_local, nw.offset)
-                return itertools.chain(*zip(*blender_matrix))  # create list of all elements
-
-            begin_frame = self.container.beginFrame
-            end_frame = self.container.endFrame
-            frame_time = self.container.frameTime
-
-            animation_struct = DdlStructure(B"Animation", children=[
-                Track(target=B"%transform", children=[
-                    Time(children=[
-                        Key(data=[((i - begin_frame) * frame_time) for i in range(begin_frame, end_frame + 1)])
-                    ]),
-                    Value(children=[
-                        Key(data=[get_matrix_local_at_frame(i) for i in range(begin_frame, end_frame + 1)],
-                            vector_size=16)
-                    ])
-                ])
-            ])
 
-        # restore "current frame" settings
-        scene.frame_set(previous_frame, previous_subframe)
+        def get_matrix_local():
+            # list of all elements of the local transformation matrix at the current frame
+            return tuple(itertools.chain(*zip(*self.handle_offset(node.matrix_local, nw.offset))))
+
+        self.container.animation_sampler.request(
+            value_key, get_matrix_local,
+            changed=lambda: OpenGexExporter.matrices_differ(first_frame_transform, node.matrix_local),
+            static=lambda: nw.nodeRef["struct"].children.remove(animation_struct))
 
         return animation_struct
 
-    def export_bone_sampled_animation(self, pose_bone, scene):
+    def export_bone_sampled_animation(self, bw, pose_bone, scene):
         """
+        :param bw: wrapper of the bone
         :param pose_bone: bone to export the animation of
         :param scene: scene of the bone
-        :return: an optional Animation DdlStructure
+        :return: the Animation DdlStructure, which is sampled by the AnimationSampler of the container after all
+        nodes are exported and removed if the bone matrix never changes
         """
 
         # This function exports bone animation as full 4x4 matrices for each frame.
 
-        current_frame = scene.frame_current
-        current_subframe = scene.frame_subframe
+        value_key = Key(vector_size=16)
+        animation_structure = DdlStructure(B"Animation", children=[
+            Track(target=B"%transform", children=[
+                Time(children=[
+                    Key(data=[(i - self.container.beginFrame) * self.container.frameTime
+                              for i in range(self.container.beginFrame, self.container.endFrame + 1)])
+                ]),
+                Value(children=[value_key])
+            ])
+        ])
 
-        has_animation = False
+        parent = pose_bone.parent
         m1 = pose_bone.matrix.copy()
 
-        # search for a frame which has a different bone matrix than in an other frame
-        for i in range(self.container.beginFrame, self.container.endFrame):
-            scene.frame_set(i)
-            m2 = pose_bone.matrix
-            if OpenGexExporter.matrices_differ(m1, m2):
-                has_animation = True
-                break
-
-        animation_structure = None
-
-        if has_animation:
-            parent = pose_bone.parent
-
-            # -----
-            # Helpers for the generator of the Value structure data
-            def get_matrix_at_frame(frame_index):
-                scene.frame_set(frame_index)
-                return pose_bone.matrix
-
-            def get_matrix_at_frame_with_parent(frame_index):
-                scene.frame_set(frame_index)
-                if math.fabs(parent.matrix.determinant()) > k_export_epsilon:
-                    return parent.matrix.inverted() * pose_bone.matrix
-                else:
-                    return pose_bone.matrix
-            # -----
-
-            get_value_for_frame = get_matrix_at_frame_with_parent if parent is not None else get_matrix_at_frame
-
-            animation_structure = DdlStructure(B"Animation", children=[
-                Track(target=B"%transform", children=[
-                    Time(children=[
-                        Key(data=[(i - self.container.beginFrame) * self.container.frameTime
-                                  for i in range(self.container.beginFrame, self.container.endFrame + 1)])
-                    ]),
-                    Value(children=[
-                        Key(data=[get_value_for_frame(i)
-                                  for i in range(self.container.beginFrame, self.container.endFrame + 1)],
-                            vector_size=16)
-                    ])
-                ])
-            ])
+        # -----
+        # Helpers for the sampled values, all elements of the bone matrix at the current frame in column-major order
+        def get_matrix():
+            return tuple(itertools.chain(*zip(*pose_bone.matrix)))
+
+        def get_matrix_with_parent():
+            if math.fabs(parent.matrix.determinant()) > k_export_epsilon:
+                return tuple(itertools.chain(*zip(*(parent.matrix.inverted() * pose_bone.matrix))))
+            else:
+                return tuple(itertools.chain(*zip(*pose_bone.matrix)))
+        # -----
 
-        scene.frame_set(current_frame, current_subframe)
+        # the Animation is removed if no frame has a different bone matrix than the current one
+        self.container.animation_sampler.request(
+            value_key, get_matrix_with_parent if parent is not None else get_matrix,
+            changed=lambda: OpenGexExporter.matrices_differ(m1, pose_bone.matrix),
+            static=lambda: bw.nodeRef["struct"].children.remove(animation_structure))
 
         return animation_structure
 
     def export_morph_weight_sampled_animation_track(self, block, target, scene):
-        # TODO doc
         """
-        :param block:
-        :param target:
-        :param scene:
-        :return: a Track DdlStructure
+        :param block: shape key to sample the value of
+        :param target: name of the MorphWeight the track targets
+        :param scene: scene of the shape key
+        :return: a Track DdlStructure, which is sampled by the AnimationSampler of the container after all nodes are
+        exported
         """
-        current_frame = scene.frame_current
-        current_subframe = scene.frame_subframe
-
-        # helper function for generater of Value Key data
-        def get_frame_value(frame_index):
-            scene.frame_set(frame_index)
-            return block.value
-
+        value_key = Key()
         track_struct = Track(target=target, children=[
             Time(children=[
                 Key(data=[(i - self.container.beginFrame) * self.container.frameTime
                           for i in range(self.container.beginFrame, self.container.endFrame + 1)])
             ]),
-            Value(children=[
-                Key(data=[get_frame_value(i) for i in range(self.container.beginFrame, self.container.endFrame + 1)])
-            ])
+            Value(children=[value_key])
         ])
 
-        scene.frame_set(current_frame, current_subframe)
+        self.container.animation_sampler.request(value_key, lambda: block.value)
 
         return track_struct
 
@@ -586,10 +688,7 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
                 transform_struct.name = B"transform"
                 transform_struct.name_is_global = False
 
-                animation_struct = self.export_node_sampled_animation(nw, node, scene)
-
-                if animation_struct is not None:
-                    structs.append(animation_struct)
+                structs.append(self.export_node_sampled_animation(nw, node, scene))
 
         else:
             animation_struct = DdlStructure(B"Animation", props=OrderedDict([
@@ -759,18 +858,20 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
         return m
 
     def export_bone_transform(self, nw, bw, scene):
-        # TODO doc!
         """
-        :return: a Transform DdlStructure
+        :param nw: wrapper of the armature object
+        :param bw: wrapper of the bone
+        :param scene: scene to sample the animation of the bone in
+        :return: list of the Transform DdlStructure and, if the bone is animated, the Animation DdlStructure of the bone
         """
 
         curve_array = self.export_bone_animation(nw.item, bw.item.name)
-        animation = ((len(curve_array) != 0) or self.container.sampleAnimationFlag)
+        animation = ((len(curve_array) != 0) or self.container.sampleAnimation)
 
         transform = bw.item.matrix_local.copy()
-        parent_bone_wrapper = bw.parent
-        if parent_bone_wrapper and (math.fabs(parent_bone_wrapper.item.matrix_local.determinant()) > k_export_epsilon):
-            transform = parent_bone_wrapper.item.matrix_local.inverted() * transform
+        parent_bone = bw.item.parent
+        if parent_bone and (math.fabs(parent_bone.matrix_local.determinant()) > k_export_epsilon):
+            transform = parent_bone.matrix_local.inverted() * transform
 
         pose_bone = nw.item.pose.bones.get(bw.item.name)
         if pose_bone:
@@ -780,18 +881,16 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
                 transform = parent_pose_bone.matrix.inverted() * transform
 
         transform_struct = Transform(matrix=transform)
+        structs = [transform_struct]
 
         if animation:
             transform_struct.name = B"transform"
             transform_struct.name_is_global = False
 
             if pose_bone:
-                animation_struct = self.export_bone_sampled_animation(pose_bone, scene)
-
-                if animation_struct is not None:
-                    transform_struct.children.append(animation_struct)
+                structs.append(self.export_bone_sampled_animation(bw, pose_bone, scene))
 
-        return transform_struct
+        return structs
 
     def export_morph_weights(self, node, shape_keys, scene):
 
@@ -840,15 +939,15 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
             ])
 
             if animated:
-                morph_weight_struct.name = B"mw"
+                morph_weight_struct.name = B"mw" + bytes(str(k), "UTF-8")
                 morph_weight_struct.name_is_global = False
 
             structs.append(morph_weight_struct)
 
         if animated:
-            animation_struct = DdlStructure(B"Animation", props=OrderedDict[
+            animation_struct = DdlStructure(B"Animation", props=OrderedDict([
                 (B"begin", (action.frame_range[0] - self.container.beginFrame) * self.container.frameTime),
-                (B"end", (action.frame_range[1] - self.container.beginFrame) * self.container.frameTime)], children=[])
+                (B"end", (action.frame_range[1] - self.container.beginFrame) * self.container.frameTime)]), children=[])
 
             for a in range(len(curve_array)):
                 k = index_array[a]
@@ -856,26 +955,27 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
 
                 fcurve = curve_array[a]
                 kind = OpenGexExporter.classify_animation_curve(fcurve)
-                if (kind != k_animation_sampled) and (not self.container.sampleAnimationFlag):
+                if (kind != k_animation_sampled) and (not self.container.sampleAnimation):
                     animation_struct.children.append(self.export_animation_track(fcurve, kind, target))
                 else:
                     animation_struct.children.append(
                         self.export_morph_weight_sampled_animation_track(shape_keys.key_blocks[k], target, scene))
 
-            self.dec_indent()
-            self.indent_write(B"}\n")
+            structs.append(animation_struct)
+
+        return structs
 
     def export_bone(self, nw, bw, scene):  # armature, bone, scene):
         bone_struct = None
         structs = []
 
-        if nw.nodeRef:
-            bone_struct = DdlStructure(struct_identifiers[nw.nodeRef["nodeType"]], name=nw.nodeRef["structName"],
+        if bw.nodeRef:
+            bone_struct = DdlStructure(struct_identifiers[bw.nodeRef["nodeType"]], name=bw.nodeRef["structName"],
                                        children=[Name(name=bw.item.name)])
             structs.append(bone_struct)
-            nw.nodeRef["struct"] = bone_struct
+            bw.nodeRef["struct"] = bone_struct
 
-            bone_struct.children.append(self.export_bone_transform(nw, bw, scene))
+            bone_struct.children.extend(self.export_bone_transform(nw, bw, scene))
 
             for child in bw.children:
                 bone_struct.children.extend(self.export_bone(nw, child, scene))
@@ -884,7 +984,7 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
                 structs.extend(self.export_bone(nw, child, scene))
 
         # Export any ordinary nodes that are parented to this bone.
-        bone_subnode_array = self.container.boneParent_array.get(bw.item.name)
+        bone_subnode_array = self.container.boneParentArray.get(bw.item.name)
         if bone_subnode_array:
             pose_bone = None
             if not bw.item.use_relative_parent:
@@ -922,11 +1022,9 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
                                       geometry=geometry,
                                       use_custom_properties=self.export_custom_properties)
 
-                # TODO Shape Keys?
                 shape_keys = OpenGexExporter.get_shape_keys(mesh.data)
                 if shape_keys:
-                    # FIXME Wrapper or item?
-                    self.export_morph_weights(mesh, shape_keys, scene)
+                    struct.children.extend(self.export_morph_weights(mesh, shape_keys, scene))
             else:
                 struct = Node(struct_identifiers[node_type],
                               obj=nw.item,
@@ -949,9 +1047,8 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
             # Export the transform. If the node is animated, then animation tracks are exported here.
             struct.children.extend(self.export_node_transformation(nw, scene))
 
-            if nw.bones:
-                for bw in nw.bones:
-                    self.export_bone(nw, bw, scene)  # TODO
+            for bw in nw.bones:
+                struct.children.extend(self.export_bone(nw, bw, scene))
 
         # export physics properties
         if self.export_physics:
@@ -966,13 +1063,51 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
             struct.children.append(self.export_audio_properties(nw.item.data))
 
         for subnode in nw.children:
-            if subnode.parent.item.type != "BONE":
+            # nodes parented to bones are exported with their bone
+            if subnode.item.parent_type != "BONE":
                 substructure = self.export_node(subnode, scene)
                 struct.children.append(substructure)
                 substructure = None
 
+        if self.export_node_bounds and meshtools is not None:
+            # needs the bounds of the subnodes, which are exported by now
+            nw.nodeRef["worldBounds"] = world_bounds = self.world_bounds(nw)
+            if world_bounds is not None and nw.nodeRef["nodeType"] == NodeType.geometry:
+                struct.children.append(Extension(B"WorldBoundingBox", children=[
+                    DdlPrimitive(DataType.float, data=list(world_bounds), vector_size=3)
+                ]))
+
         return struct
 
+    def world_matrix(self, nw):
+        """
+        :param nw: the node wrapper
+        :return: the transformation of the node into world space at the current frame, as exported
+        """
+        matrix = self.handle_offset(nw.item.matrix_local, nw.offset)
+        if nw.parent is None:
+            return matrix
+        return self.world_matrix(nw.parent) * matrix
+
+    def world_bounds(self, nw):
+        """
+        Compute the world space bounding box of the geometry of a node and its subnodes, which need to be exported
+        already.
+        :param nw: the node wrapper
+        :return: minimum and maximum of the box or None if neither the node nor its subnodes have geometry
+        """
+        boxes = [subnode.nodeRef.get("worldBounds") for subnode in nw.children]
+        if nw.nodeRef.get("nodeType") == NodeType.geometry:
+            bounds = self.container.geometry_array[nw.item.data]["bounds"]
+            if bounds is not None:
+                boxes.append(meshtools.transform_bounds(bounds[0], bounds[1], self.world_matrix(nw)))
+
+        boxes = [box for box in boxes if box is not None]
+        if len(boxes) == 0:
+            return None
+        return ([min(box[0][i] for box in boxes) for i in range(3)],
+                [max(box[1][i] for box in boxes) for i in range(3)])
+
     @staticmethod
     def almost_equal(a, b, rtol=1.0000000000000001e-05, atol=1e-08):
         """
@@ -1296,88 +1431,77 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
 
         return struct
 
-    def export_skin(self, node, armature, export_vertex_array):
-
-        # This function exports all skinning data, which includes the skeleton
-        # and per-vertex bone influence data.
-
-        skin_struct = DdlStructure(B"Skin\n", children=[
-            Transform(node.matrix_world)
-        ])
+    def export_skeleton(self, node, armature):
+        """
+        Export the skeleton of a skinned mesh. The bone references are resolved by resolve_unresolved_refs(), once all
+        bones are exported.
+        :param node: the skinned object
+        :param armature: the armature object deforming the mesh
+        :return: list of the Transform and Skeleton DdlStructures of the Skin
+        """
+        bones = armature.data.bones
+        bone_refs = DdlPrimitive(data_type=DataType.ref, data=[bone.name for bone in bones])
+        self.unresolved_bone_refs.append((bone_refs, armature))
 
-        skeleton_struct = DdlStructure(B"Skeleton", children=[
-            DdlStructure(B"BoneRefArray", children=[
-                DdlPrimitive(data_type=DataType.ref, data=[self.find_node(bone.name)[1]["struct"]
-                                                           for bone in armature.data.bones])
-            ]),
-            Transform(matrices=[armature.matrix_world * bone.matrix_local for bone in armature.data.bones])
-        ])
-        skin_struct.children.append(skeleton_struct)
+        return [
+            Transform(node.matrix_world),
+            DdlStructure(B"Skeleton", children=[
+                DdlStructure(B"BoneRefArray", children=[bone_refs]),
+                Transform(matrices=[armature.matrix_world * bone.matrix_local for bone in bones])
+            ])]
 
-        # Export the per-vertex bone influence data.
+    def export_skin(self, export_mesh, skeleton):
+        """
+        Export the per vertex bone influences of a mesh.
+        :param export_mesh: dict of property to per vertex data with bone influences, see
+        meshtools.limit_influences()
+        :param skeleton: Transform and Skeleton DdlStructures as returned by export_skeleton()
+        :return: the Skin DdlStructure
+        """
+        bone_counts, bone_indices, bone_weights = meshtools.skin_arrays(export_mesh)
 
-        group_remap = []
+        if self.compact_indices:
+            count_type = index_data_type(int(bone_counts.max()) + 1 if len(bone_counts) else 1)
+            index_type = index_data_type(int(bone_indices.max()) + 1 if len(bone_indices) else 1)
+        else:
+            count_type = index_type = DataType.unsigned_int16
 
-        for group in node.vertex_groups:
-            group_name = group.name
-            for (i, bone) in enumerate(armature.data.bones):
-                if bone.name == group_name:
-                    group_remap.append(i)
-                    break
-            else:
-                group_remap.append(-1)
-
-        bone_count_array = []
-        bone_index_array = []
-        bone_weight_array = []
-
-        mesh_vertex_array = node.data.vertices
-        for ev in export_vertex_array:
-            bone_count = 0
-            total_weight = 0.0
-            for element in mesh_vertex_array[ev.vertexIndex].groups:
-                bone_index = group_remap[element.group]
-                bone_weight = element.weight
-                if (bone_index >= 0) and (bone_weight != 0.0):
-                    bone_count += 1
-                    total_weight += bone_weight
-                    bone_index_array.append(bone_index)
-                    bone_weight_array.append(bone_weight)
-            bone_count_array.append(bone_count)
-
-            if total_weight != 0.0:
-                normalizer = 1.0 / total_weight
-                for i in range(-bone_count, 0):
-                    bone_weight_array[i] *= normalizer
-
-        # Write the bone count array. There is one entry per vertex.
-
-        skin_struct.children.append(DdlStructure(B"BoneCountArray", children=[
-            DdlPrimitive(data_type=DataType.unsigned_int16, data=bone_count_array)
-        ]))
-        skin_struct.children.append(DdlStructure(B"BoneIndexArray", children=[
-            DdlPrimitive(data_type=DataType.unsigned_int16, data=bone_index_array)
-        ]))
-        skin_struct.children.append(DdlStructure(B"BoneWeightArray", children=[
-            DdlPrimitive(data_type=DataType.float, data=bone_weight_array)
-        ]))
+        return DdlStructure(B"Skin", children=skeleton + [
+            DdlStructure(B"BoneCountArray", children=[
+                DdlPrimitive(data_type=count_type, data=bone_counts)
+            ]),
+            DdlStructure(B"BoneIndexArray", children=[
+                DdlPrimitive(data_type=index_type, data=bone_indices)
+            ]),
+            DdlStructure(B"BoneWeightArray", children=[
+                DdlPrimitive(data_type=DataType.float, data=bone_weights)
+            ])])
 
     @staticmethod
-    def to_per_vertex_data(m, num_materials=1, uv_layers=None):
+    def to_per_vertex_data(m, num_materials=1, uv_layers=None, epsilons=None, corner_data=None):
         """
         Generate per vertex data from blender bmesh.
         :param m: triangulated bmesh to generate the data from
         :param num_materials: number of materials used in the mesh
         :param uv_layers: names of uv layers to export or None to export all.
-        :return: dict of property to data. Possibly keys are: "position", "normal", "tris" and "texcoord"
+        :param epsilons: dict of attribute name to welding tolerance, see meshtools.per_vertex_data(). Vertices are
+        only merged by their attributes, "position" is not supported.
+        :param corner_data: numpy array of additional data of every triangle corner, in the order of the faces and
+        their loops, which needs to be equal to share a vertex, e.g. the normals of morph targets. Welded with the
+        tolerance of the normals.
+        :return: dict of property to data. Possibly keys are: "position", "normal", "tris", "texcoord", "vertex", the
+        index of the bmesh vertex every vertex was created from, "corner", the triangle corner it was created from, and
+        "weld", the number of vertices with exact welding and the number of vertices created, if there are tolerances
         """
         num_materials = max(1, num_materials)
 
         num_verts = len(m.verts)
 
-        # list of list which stores all the new indices corresponding to an old index
-        index_translation = [[i] for i in range(num_verts)]
+        # maps the index of the position and the data of a loop to the index of the vertex created for it
+        vertex_indices = {}
         positions = [v.co for v in m.verts]
+        source_vertices = list(range(num_verts))
+        source_corners = [None] * num_verts
         normals = [None] * num_verts
         color_layer = m.loops.layers.color.active
 
@@ -1393,89 +1517,464 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
         if has_uv_layers:
             texcoords = {l: [None] * num_verts for l in active_uv_layers}
 
-        mesh_indices = [[]] * num_materials  # list of triples of the faces for all materials
+        mesh_indices = [[] for _ in range(num_materials)]  # list of triples of the faces for all materials
+
+        epsilons = epsilons or {}
+        normal_epsilon = epsilons.get("normal", 0.0)
+        color_epsilon = epsilons.get("color", 0.0)
+        texcoord_epsilon = epsilons.get("texcoord", 0.0)
+        # keys of exact welding, to report the effect of the tolerances
+        exact_keys = set() if epsilons else None
 
-        for face in m.faces:
+        corner_keys = None
+        if corner_data is not None:
+            corner_data = corner_data.reshape(len(corner_data), -1)
+            corner_keys = [row.tobytes() for row in corner_data]
+            if exact_keys is not None:
+                quantized_corner_keys = [row.tobytes() for row in meshtools.quantize(corner_data, normal_epsilon)]
+
+        for face_index, face in enumerate(m.faces):
             face_indices = [0, 0, 0]
 
             for cur_index, loop in enumerate(face.loops):
                 vert = loop.vert
-
-                pos = vert.co
+                corner = face_index * 3 + cur_index
                 normal = vert.normal if face.smooth else face.normal
+                color = loop[color_layer] if color_layer is not None else None
+                uvs = [loop[layer].uv for layer in active_uv_layers]
+
+                key = (vert.index, tuple(normal), None if color is None else tuple(color), tuple(map(tuple, uvs)),
+                       None if corner_keys is None else corner_keys[corner])
+                if exact_keys is not None:
+                    exact_keys.add(key)
+                    key = (vert.index, OpenGexExporter.quantize(normal, normal_epsilon),
+                           None if color is None else OpenGexExporter.quantize(color, color_epsilon),
+                           tuple(OpenGexExporter.quantize(uv, texcoord_epsilon) for uv in uvs),
+                           None if corner_keys is None else quantized_corner_keys[corner])
+                index = vertex_indices.get(key)
+
+                if index is None:
+                    i = vert.index
+                    if normals[i] is None:
+                        # the first data for this vertex, it keeps its index
+                        index = i
+                        source_corners[i] = corner
+                        normals[i] = normal
+                        if color_layer is not None:
+                            colors[i] = color
+                        for layer, uv in zip(active_uv_layers, uvs):
+                            texcoords[layer][i] = uv
+                    else:
+                        # no vertex with this data yet, we need to create one.
+                        index = len(positions)
 
-                # check if this vertex has not been initialized yet:
-                i = vert.index
-                if normals[i] is None:
-                    # not in use yet, we can set the data for this
-                    # vertex safely
-                    normals[i] = normal
-                    if color_layer is not None:
-                        colors[i] = loop[color_layer]
-                    for layer in active_uv_layers:
-                        texcoords[layer][i] = loop[layer].uv
-
-                    face_indices[cur_index] = i
-                    continue
-                # else: check for an existing vertex that matches our data.
-                indices = index_translation[vert.index]  # existing indices with same position
-                found_existing = False
-                for i in indices:
-                    # position is always identical.
-
-                    # normals
-                    if normals[i] != normal:
-                        # this one does not have an identical normal
-                        continue
-
-                    # vertex colors
-                    if color_layer is not None:
-                        if colors[i] != loop[color_layer]:
-                            # this one does not have an identical vertex color
-                            continue
-
-                    # texture coordinates
-                    found_uvs = True  # in case we do not have any active layers.
-                    for layer in active_uv_layers:
-                        if texcoords[layer][i] != loop[layer].uv:
-                            found_uvs = False
-                            break
-
-                    if not found_uvs:
-                        # this one does not have an identical uv coord in one of its layers
-                        continue
-
-                    # we found matching data => reuse!
-                    found_existing = True
-                    face_indices[cur_index] = i
-                    break
-
-                if not found_existing:
-                    # no data matched, we need to create some.
-                    new_index = len(positions)
-
-                    indices.append(new_index)  # make sure this vertex can be found later
-                    face_indices[cur_index] = new_index
+                        positions.append(vert.co)
+                        source_vertices.append(i)
+                        source_corners.append(corner)
+                        normals.append(normal)
+                        if color_layer is not None:
+                            colors.append(color)
+                        for layer, uv in zip(active_uv_layers, uvs):
+                            texcoords[layer].append(uv)
 
-                    # append data of current loop
-                    positions.append(pos)
-                    normals.append(normal)
-                    if color_layer is not None:
-                        colors.append(loop[color_layer])
+                    vertex_indices[key] = index
 
-                    for layer in active_uv_layers:
-                        texcoords[layer].append(loop[layer].uv)
+                face_indices[cur_index] = index
 
             # add the triple to the list of faces/triangles for the corresponding material index
             mesh_indices[face.material_index].append(face_indices)
 
-        ret_value = {"position": positions, "normal": normals, "tris": mesh_indices}
+        ret_value = {"position": positions, "normal": normals, "tris": mesh_indices, "vertex": source_vertices,
+                     "corner": source_corners}
         if has_uv_layers:
             ret_value["texcoord"] = texcoords
         if color_layer is not None:
             ret_value["color"] = colors
+        if exact_keys is not None:
+            ret_value["weld"] = (len(exact_keys), len(positions))
         return ret_value
 
+    @staticmethod
+    def quantize(values, epsilon):
+        """
+        :param values: vector to weld with a tolerance
+        :param epsilon: welding tolerance, 0.0 for exact welding
+        :return: tuple of the cell of the values in a grid with a cell size of `epsilon`, see meshtools.quantize()
+        """
+        if not epsilon:
+            return tuple(values)
+        return tuple(math.floor(c / epsilon + 0.5) for c in values)
+
+    @staticmethod
+    def parse_lod_ratios(text):
+        """
+        :param text: comma separated fractions of triangles to keep, e.g. "0.5, 0.25"
+        :return: list of the fractions as floats
+        """
+        ratios = [float(ratio) for ratio in text.replace(";", ",").split(",") if ratio.strip()]
+        for ratio in ratios:
+            if not 0.0 < ratio < 1.0:
+                raise ValueError("LOD ratios must be between 0 and 1, got {}".format(ratio))
+        return ratios
+
+    def export_mesh(self, export_mesh, m=None, lod=None, morph_indices=None, skeleton=None):
+        """
+        Create the Mesh structure of a GeometryObject from per vertex data.
+        :param export_mesh: dict of property to data as returned by to_per_vertex_data()
+        :param m: bmesh the data refers to, which is kept in memory with the Mesh
+        :param lod: level of detail of the Mesh or None for the base level
+        :param morph_indices: Morph index of every morph target in the data, see meshtools.read_shape_keys()
+        :param skeleton: Transform and Skeleton DdlStructures of the Skin of a skinned mesh, see export_skeleton()
+        :return: the created Mesh structure
+        """
+        vertex_count = len(export_mesh["position"])
+
+        mesh_struct = Mesh(mesh=m, lod=lod, children=[
+            # position array
+            VertexArray(B"position", vertex_count=vertex_count, data=export_mesh["position"])
+        ])
+
+        # Write the normal array.
+        attribute_type = DataType.half if self.half_precision else DataType.float
+        if "normal" in export_mesh:
+            mesh_struct.children.append(VertexArray(B"normal", vertex_count=vertex_count, data=export_mesh["normal"],
+                                                    data_type=attribute_type))
+
+        # Write the color array if it exists.
+        if "color" in export_mesh:
+            colors = export_mesh["color"]
+            if self.byte_colors:
+                mesh_struct.children.append(VertexArray(B"color", vertex_count=vertex_count,
+                                                        data=to_unorm8(colors), data_type=DataType.unsigned_int8))
+            else:
+                mesh_struct.children.append(VertexArray(B"color", vertex_count=vertex_count, data=colors))
+
+        # Write the texcoord arrays.
+        if "texcoord" in export_mesh:
+            count = 0
+            for texcoords in export_mesh["texcoord"].values():
+                name = B'texcoord'
+                if count > 0:
+                    name += B'[' + self.to_int_byte(count) + B']'
+
+                mesh_struct.children.append(
+                    VertexArray(attrib=name, vertex_count=vertex_count, data=texcoords, vector_size=2,
+                                data_type=attribute_type))
+
+                count += 1
+                if count > 2:
+                    break
+
+        if self.compact_indices:
+            index_type = index_data_type(vertex_count)
+        elif self.chunk_vertices and vertex_count <= 0x10000:
+            index_type = DataType.unsigned_int16
+        else:
+            index_type = DataType.unsigned_int32
+
+        # Write the morph targets.
+        if "morph_position" in export_mesh:
+            for target, morph in enumerate(morph_indices):
+                morph = int(morph)
+                if self.sparse_morph_targets:
+                    indices, offsets, normals = meshtools.displaced_vertices(export_mesh, target, k_export_epsilon)
+                    mesh_struct.children.append(Extension(B"SparseMorph", children=[
+                        Extension(B"SM/morph", children=[DdlPrimitive(DataType.unsigned_int32, data=[morph])]),
+                        Extension(B"SM/index", children=[DdlPrimitive(index_type, data=indices)]),
+                        Extension(B"SM/offset", children=[DdlPrimitive(DataType.float, data=offsets, vector_size=3)]),
+                        Extension(B"SM/normal", children=[DdlPrimitive(attribute_type, data=normals, vector_size=3)])
+                    ]))
+                else:
+                    positions, normals = meshtools.morph_target(export_mesh, target)
+                    mesh_struct.children.append(VertexArray(B"position", vertex_count=vertex_count, data=positions,
+                                                            morph=morph))
+                    mesh_struct.children.append(VertexArray(B"normal", vertex_count=vertex_count, data=normals,
+                                                            morph=morph, data_type=attribute_type))
+
+        # Write the bone influences.
+        if "bone_count" in export_mesh and skeleton is not None:
+            mesh_struct.children.append(self.export_skin(export_mesh, skeleton))
+
+        # Write the index arrays.
+        for material_index, indices in enumerate(export_mesh["tris"]):
+            num_tris = len(indices)
+            if num_tris != 0:
+                props = dict()
+                if material_index != 0:
+                    props[B"material"] = material_index
+                mesh_struct.add_structure(B"IndexArray", props=props, children=[
+                    DdlTextWriter.set_max_elements_per_line(
+                        DdlTextWriter.set_comment(
+                            DdlPrimitive(index_type, vector_size=3, data=indices), comment=str(num_tris)),
+                        elements=16)
+                ])
+
+        return mesh_struct
+
+    @staticmethod
+    def process_mesh(data, num_materials, optimize=False, overdraw=False, lod_ratios=None, epsilons=None,
+                     max_vertices=0):
+        """
+        Generate the per vertex data for a mesh read with meshtools.read_mesh() and optimize it. Runs in worker
+        processes with multiple geometry processes, so it must not access blender data.
+        :param data: dict of mesh data as returned by meshtools.read_mesh()
+        :param num_materials: number of materials used in the mesh
+        :param optimize: whether to optimize the mesh for the vertex cache
+        :param overdraw: whether to additionally optimize the mesh for overdraw
+        :param lod_ratios: fractions of triangles to keep for additional levels of detail
+        :param epsilons: dict of attribute name to welding tolerance, see meshtools.per_vertex_data()
+        :param max_vertices: maximum number of vertices of a GeometryObject, see process_export_mesh()
+        :return: dict of property to data, see meshtools.per_vertex_data() and meshtools.optimize_vertex_cache(),
+        with the number of vertices with exact welding and the number of vertices created at "weld" if there are
+        tolerances
+        """
+        export_mesh = meshtools.per_vertex_data(data, num_materials=num_materials, epsilons=epsilons)
+        vertex_count = len(export_mesh["position"])
+        export_mesh = OpenGexExporter.process_export_mesh(export_mesh, optimize, overdraw, lod_ratios, max_vertices)
+        if epsilons:
+            export_mesh["weld"] = (meshtools.exact_vertex_count(data), vertex_count)
+        return export_mesh
+
+    @staticmethod
+    def process_export_mesh(export_mesh, optimize=False, overdraw=False, lod_ratios=None, max_vertices=0):
+        """
+        Split per vertex data into chunks, then generate the levels of detail of every chunk and optimize all levels.
+        :param export_mesh: dict of property to per vertex data
+        :param optimize: whether to optimize the mesh for the vertex cache
+        :param overdraw: whether to additionally optimize the mesh for overdraw
+        :param lod_ratios: fractions of triangles to keep for additional levels of detail
+        :param max_vertices: maximum number of vertices of a chunk, see meshtools.split_mesh(), or 0 to not split
+        :return: the processed per vertex data of the first chunk, with the levels of detail in a list at "lod" and
+        the processed further chunks in a list at "chunks"
+        """
+        chunks = meshtools.split_mesh(export_mesh, max_vertices) if max_vertices else [export_mesh]
+        for i, chunk in enumerate(chunks):
+            levels = [meshtools.decimate(chunk, ratio) for ratio in lod_ratios or []]
+            if optimize:
+                chunk = meshtools.optimize_vertex_cache(chunk, overdraw=overdraw)
+                levels = [meshtools.optimize_vertex_cache(level, overdraw=overdraw) for level in levels]
+            if levels:
+                chunk["lod"] = levels
+            chunks[i] = chunk
+
+        export_mesh = chunks[0]
+        if len(chunks) > 1:
+            export_mesh["chunks"] = chunks[1:]
+        return export_mesh
+
+    def add_mesh(self, entry, export_mesh, m=None, cache_key=None, morph_indices=None, skeleton=None):
+        """
+        Create the Mesh structures of a GeometryObject, one per level of detail, and store them in the geometry cache.
+        Further chunks of a split mesh are exported to GeometryObjects in the "chunks" list of the entry.
+        :param entry: entry of the GeometryObject to add the Meshes to in ExporterState.geometry_array
+        :param export_mesh: dict of property to data as returned by to_per_vertex_data(), with optional levels of
+        detail in a list at "lod" and further chunks in a list at "chunks"
+        :param m: bmesh the data refers to, which is kept in memory with the Mesh
+        :param cache_key: key to store the Meshes in self.geometry_cache with or None to not cache them
+        :param morph_indices: Morph index of every morph target in the data, see meshtools.read_shape_keys()
+        :param skeleton: Transform and Skeleton DdlStructures of the Skin of a skinned mesh, see export_skeleton()
+        """
+        struct = entry["struct"]
+        chunks = export_mesh.get("chunks", [])
+        if "weld" in export_mesh:
+            self.weld_report.append(export_mesh["weld"])
+
+        mesh_structs = self.export_meshes(struct.name, export_mesh, m, morph_indices, skeleton)
+
+        # the cache holds the Meshes of a single GeometryObject
+        if cache_key is not None and len(chunks) == 0:
+            # the GeometryObject is always a top-level structure, its Meshes are written at depth 1
+            mesh_structs = [self.writer.serialize_structure(mesh_struct, depth=1) for mesh_struct in mesh_structs]
+            self.geometry_cache.store(cache_key, [mesh_struct.text for mesh_struct in mesh_structs])
+
+        struct.children.extend(self.spool_meshes(mesh_structs, m))
+
+        if len(chunks) != 0 and self.export_bounds:
+            # the bounding volumes were computed for the whole mesh, replace them with those of the first chunk
+            for i, child in enumerate(struct.children):
+                if self.is_bounding_volume(child):
+                    struct.children[i:i + 2] = self.export_bounding_volumes(meshtools.bounds(export_mesh["position"]))
+                    break
+
+        for i, chunk in enumerate(chunks, 2):
+            chunk_struct = GeometryObject(name=struct.name + B"_" + bytes(str(i), "UTF-8"))
+            if self.export_bounds:
+                chunk_struct.children.extend(self.export_bounding_volumes(meshtools.bounds(chunk["position"])))
+            mesh_structs = self.export_meshes(chunk_struct.name, chunk, None, morph_indices, skeleton)
+            chunk_struct.children.extend(self.spool_meshes(mesh_structs))
+            entry["chunks"].append(chunk_struct)
+
+    def export_meshes(self, name, export_mesh, m=None, morph_indices=None, skeleton=None):
+        """
+        :param name: name of the GeometryObject, for the vertex cache report
+        :param export_mesh: dict of property to data as returned by to_per_vertex_data(), with optional levels of
+        detail in a list at "lod"
+        :param m: bmesh the data refers to, which is kept in memory with the Mesh
+        :param morph_indices: Morph index of every morph target in the data, see meshtools.read_shape_keys()
+        :param skeleton: Transform and Skeleton DdlStructures of the Skin of a skinned mesh, see export_skeleton()
+        :return: list of the Mesh structures of all levels of detail
+        """
+        if "acmr" in export_mesh:
+            self.vertex_cache_report.append((name, export_mesh["acmr"]))
+
+        mesh_structs = [self.export_mesh(export_mesh, m, morph_indices=morph_indices, skeleton=skeleton)]
+        for lod, level in enumerate(export_mesh.get("lod", []), 1):
+            mesh_structs.append(self.export_mesh(level, lod=lod, morph_indices=morph_indices, skeleton=skeleton))
+        return mesh_structs
+
+    def spool_meshes(self, mesh_structs, m=None):
+        """
+        If mesh text is spooled, move the text of Mesh structures to the spool file of the writer and free the bmesh
+        they refer to. The BoneRefArray of a Skin is only resolved after all nodes are exported, so of skinned Meshes
+        only the substructures which do not contain it are spooled.
+        :param mesh_structs: Mesh structures of a GeometryObject
+        :param m: bmesh the Meshes refer to
+        :return: the structures to add to the GeometryObject instead of the Mesh structures
+        """
+        if not self.spool_geometry:
+            return mesh_structs
+
+        unresolved = {id(bone_refs) for bone_refs, _ in self.unresolved_bone_refs}
+        # the GeometryObject is always a top-level structure, its Meshes are written at depth 1
+        spooled = [self.spool_resolved(mesh_struct, 1, unresolved) for mesh_struct in mesh_structs]
+        for mesh_struct in mesh_structs:
+            if isinstance(mesh_struct, Mesh):
+                mesh_struct.mesh = None
+        if m is not None:
+            m.free()
+        return spooled
+
+    def spool_resolved(self, structure, depth, unresolved):
+        """
+        :param structure: structure to move to the spool file of the writer
+        :param depth: nesting depth the structure will be written at
+        :param unresolved: ids of the primitives with references which are not resolved yet
+        :return: the spooled structure, or the structure itself with its substructures spooled if it contains
+        unresolved references
+        """
+        if not self.contains_primitives(structure, unresolved):
+            return self.writer.spool_structure(structure, depth)
+
+        structure.children = [child if isinstance(child, DdlPrimitive) else
+                              self.spool_resolved(child, depth + 1, unresolved) for child in structure.children]
+        return structure
+
+    @staticmethod
+    def contains_primitives(structure, primitives):
+        """
+        :param structure: structure to search
+        :param primitives: ids of the primitives to search for
+        :return: whether one of the primitives is part of the structure or its substructures
+        """
+        return any(id(child) in primitives if isinstance(child, DdlPrimitive) else
+                   OpenGexExporter.contains_primitives(child, primitives) for child in structure.children)
+
+    @staticmethod
+    def is_bounding_volume(structure):
+        """
+        :param structure: child structure of a GeometryObject
+        :return: whether the structure was created by export_bounding_volumes()
+        """
+        return structure.identifier == B"Extension" and \
+            structure.properties.get(B"type") in (B"BoundingBox", B"BoundingSphere")
+
+    @staticmethod
+    def export_bounding_volumes(bounds):
+        """
+        :param bounds: bounds of a mesh as returned by meshtools.bounds()
+        :return: list of the 'BoundingBox' and 'BoundingSphere' Extension structures of a GeometryObject
+        """
+        minimum, maximum, center, radius = bounds
+        return [
+            Extension(B"BoundingBox", children=[
+                DdlPrimitive(DataType.float, data=[minimum, maximum], vector_size=3)
+            ]),
+            Extension(B"BoundingSphere", children=[
+                DdlPrimitive(DataType.float, data=[center], vector_size=3),
+                DdlPrimitive(DataType.float, data=[radius])
+            ])]
+
+    def process_pending_geometry(self):
+        """
+        Create the Mesh structures of the GeometryObjects in ExporterState.pending_geometry, welding the meshes in a
+        pool of `geometry_processes` processes.
+        """
+        pending = self.container.pending_geometry
+        if len(pending) == 0:
+            return
+
+        self.progress.begin_task("Processing {} meshes...".format(len(pending)))
+
+        # meshes with morph targets are not split, their MorphWeights belong to a single GeometryNode
+        meshes = [(data, num_materials, self.optimize_vertex_cache, self.optimize_overdraw, self.lod_levels,
+                   self.weld_epsilons, 0 if "morph_index" in data else self.chunk_vertices)
+                  for (_, data, num_materials, _, _) in pending]
+        for (entry, data, _, cache_key, skeleton), export_mesh in zip(pending, meshtools.process_meshes(
+                meshes, self.geometry_processes, self.process_mesh)):
+            self.add_mesh(entry, export_mesh, cache_key=cache_key, morph_indices=data.get("morph_index"),
+                          skeleton=skeleton)
+
+        self.container.pending_geometry = []
+        self.progress.end_task()
+
+    def merge_duplicate_geometry(self):
+        """
+        Merge GeometryObjects with identical content, which are exported from different meshes, into the first of
+        them and point the ObjectRefs of all GeometryNodes to it.
+        """
+        self.progress.begin_task("Merging identical geometry...")
+
+        # bones are only referenced by name until all nodes are exported, but bones of different armatures may have
+        # the same names
+        armatures = {id(refs): bytes(str(armature.as_pointer()), "UTF-8")
+                     for refs, armature in self.unresolved_bone_refs}
+
+        merged = {}
+        unique = {}
+        for mesh, entry in list(self.container.geometry_array.items()):
+            key = tuple(meshtools.structure_digest(struct, refs=armatures)
+                        for struct in [entry["struct"]] + entry["chunks"])
+            original = unique.setdefault(key, entry)
+            if original is entry:
+                continue
+
+            original["nodeTable"].extend(node for node in entry["nodeTable"] if node not in original["nodeTable"])
+            merged[entry["struct"]] = original["struct"]
+            del self.container.geometry_array[mesh]
+
+        if len(merged) != 0:
+            for nw in self.container.nodes:
+                if nw.nodeRef.get("nodeType") != NodeType.geometry or "struct" not in nw.nodeRef:
+                    continue
+                for child in nw.nodeRef["struct"].children:
+                    if child.identifier == B"ObjectRef":
+                        child.children[0].data = [merged.get(ref, ref) for ref in child.children[0].data]
+
+        self.progress.end_task("{} merged".format(len(merged)))
+
+    def export_geometry_chunks(self):
+        """
+        Add a subnode to every GeometryNode of a split mesh for each further chunk of it, which refers to the
+        GeometryObject of the chunk and the materials of the GeometryNode.
+        """
+        chunks = {entry["struct"]: entry["chunks"] for entry in self.container.geometry_array.values()
+                  if len(entry["chunks"]) != 0}
+        if len(chunks) == 0:
+            return
+
+        for nw in self.container.nodes:
+            if nw.nodeRef.get("nodeType") != NodeType.geometry or "struct" not in nw.nodeRef:
+                continue
+            struct = nw.nodeRef["struct"]
+            object_ref = next(child for child in struct.children if child.identifier == B"ObjectRef")
+            material_refs = [child for child in struct.children if child.identifier == B"MaterialRef"]
+
+            for i, chunk in enumerate(chunks.get(object_ref.children[0].data[0], []), 2):
+                props = {B"visible": False} if nw.item.hide_render else dict()
+                struct.children.append(DdlStructure(
+                    B"GeometryNode", name=struct.name + B"_" + bytes(str(i), "UTF-8"), props=props,
+                    children=[ObjectRef(chunk)] + material_refs))
+
     def export_geometry(self, scene, node, mesh):
         if mesh in self.container.geometry_array:
             entry = self.container.geometry_array[mesh]
@@ -1486,9 +1985,11 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
         self.progress.begin_task("Exporting geometry for " + node.name + "...")
 
         struct = GeometryObject(name=B"geometry" + bytes(str(len(self.container.geometry_array) + 1), "UTF-8"))
-        self.container.geometry_array[mesh] = {
+        entry = self.container.geometry_array[mesh] = {
             "struct": struct,
-            "nodeTable": [node]}
+            "nodeTable": [node],
+            "bounds": None,
+            "chunks": []}
 
         # This function exports a single geometry object.]
 
@@ -1498,11 +1999,8 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
         current_morph_value = []
 
         shape_keys = OpenGexExporter.get_shape_keys(mesh)
+        base_index = 0
         if shape_keys:
-            node.active_shape_key_index = 0
-            node.show_only_shape_key = True
-
-            base_index = 0
             relative = shape_keys.use_relative
             if relative:
                 morph_count = 0
@@ -1513,6 +2011,10 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
                         break
                     morph_count += 1
 
+            # export the base shape, the morph targets are read from the shape keys directly
+            node.active_shape_key_index = base_index
+            node.show_only_shape_key = True
+
             morph_count = 0
             for block in shape_keys.key_blocks:
                 current_morph_value.append(block.value)
@@ -1545,110 +2047,140 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
         # but the Blender API does not provide a reasonable way to retrieve the mesh at an
         # arbitrary stage in the modifier stack.
 
-        m = bmesh.new()
         mesh = node.to_mesh(scene, apply_modifiers, "RENDER", True, False)
-        m.from_mesh(mesh)
-
-        # Triangulate the mesh
-        bmesh.ops.triangulate(m, faces=m.faces, quad_method=0, ngon_method=0)
-
-        m.faces.ensure_lookup_table()
-        m.edges.ensure_lookup_table()
-
-        # cleanup loose edges and vertices
-        bmesh.ops.delete(m, geom=[v for v in m.verts if len(v.link_faces) == 0], context=1)  # 1 <=> DEL_VERTS
-
         uv_layers = [mesh.uv_textures.active_index] if mesh.uv_textures.active_index != -1 else None
-
-        export_mesh = self.to_per_vertex_data(m, num_materials=len(mesh.materials), uv_layers=uv_layers)
-        vertex_count = len(export_mesh["position"])
-
-        mesh_struct = Mesh(mesh=m, children=[
-            # position array
-            VertexArray(B"position", vertex_count=vertex_count, data=export_mesh["position"])
-        ])
-        struct.children.append(mesh_struct)
-
-        # Write the normal array.
-        if "normal" in export_mesh:
-            mesh_struct.children.append(VertexArray(B"normal", vertex_count=vertex_count, data=export_mesh["normal"]))
-
-        # Write the color array if it exists.
-        if "color" in export_mesh:
-            mesh_struct.children.append(VertexArray(B"color", vertex_count=vertex_count, data=export_mesh["color"]))
-
-        # Write the texcoord arrays.
-        if "texcoord" in export_mesh:
-            count = 0
-            for texcoords in export_mesh["texcoord"].values():
-                name = B'texcoord'
-                if count > 0:
-                    name += B'[' + self.to_int_byte(count) + B']'
-
-                mesh_struct.children.append(
-                    VertexArray(attrib=name, vertex_count=vertex_count, data=texcoords, vector_size=2))
-
-                count += 1
-                if count > 2:
-                    break
-
-        # If there are multiple morph targets, export them here.
-        if shape_keys and False:  # TODO currently no shape key support
-            shape_keys.key_blocks[0].value = 0.0
-            for i in range(1, len(current_morph_value)):
-                shape_keys.key_blocks[i].value = 1.0
-                mesh.update()
-
-                node.active_shape_key_index = i
-                morph_mesh = node.to_mesh(scene, apply_modifiers, "RENDER", True, False)
-
-                # morph target position array
-                mesh_struct.children.append(
-                    VertexArray(attrib=B"position", morph=i, data=[morph_mesh.vertices[i].co for i in export_mesh],
-                                vertex_count=vertex_count))  # TODO currently no shape key support
-
-                # morph target normal array
-                mesh_struct.children.append(
-                    VertexArray(attrib=B"normal",
-                                morph=i,
-                                data=[vert.normal if face.use_smooth else face.normal for (face, vert) in
-                                      [(morph_mesh.tessfaces[v.faceIndex], morph_mesh.vertices[v.vertexIndex])
-                                       for v in export_mesh]],
-                                vertex_count=vertex_count))  # TODO currently no shape key support
-
-                bpy.data.meshes.remove(morph_mesh)
-
-        # Write the index arrays.
-        for material_index, indices in enumerate(export_mesh["tris"]):
-            num_tris = len(indices)
-            if num_tris != 0:
-                props = dict()
-                if material_index != 0:
-                    props[B"material"] = material_index
-                mesh_struct.add_structure(B"IndexArray", props=props, children=[
-                    DdlTextWriter.set_max_elements_per_line(
-                        DdlTextWriter.set_comment(
-                            DdlPrimitive(DataType.unsigned_int32, vector_size=3, data=indices), comment=str(num_tris)),
-                        elements=16)
-                ])
-
-        # If the mesh is skinned, export the skinning data here.
-        if armature and False:  # TODO
-            self.export_skin(node, armature, export_mesh)
+        num_materials = len(mesh.materials)
+
+        # shape keys refer to the vertices of the original mesh, modifiers may have changed them
+        export_morph_targets = shape_keys and meshtools is not None
+        if export_morph_targets and len(shape_keys.key_blocks[base_index].data) != len(mesh.vertices):
+            print("Skipping morph targets of {}, modifiers change its vertices".format(node.name))
+            export_morph_targets = False
+        morph_indices = None
+
+        skeleton = None
+        if armature and meshtools is not None:
+            skeleton = self.export_skeleton(node, armature)
+            bone_indices = {bone.name: i for i, bone in enumerate(armature.data.bones)}
+            group_bones = [bone_indices.get(group.name, -1) for group in node.vertex_groups]
+
+        m = None
+        export_mesh = None
+        cache_key = None
+        bounds = None
+        bounds_index = len(struct.children)
+
+        if meshtools is not None and self.bulk_mesh_extraction:
+            if not hasattr(mesh, "loop_triangles"):
+                # Blender 2.7x has no loop triangles, triangulate the mesh itself instead
+                m = bmesh.new()
+                m.from_mesh(mesh)
+                bmesh.ops.triangulate(m, faces=m.faces, quad_method=0, ngon_method=0)
+                m.to_mesh(mesh)
+                m.free()
+                m = None
+
+            data = meshtools.read_mesh(mesh, uv_layers=uv_layers)
+            if export_morph_targets:
+                data.update(meshtools.read_shape_keys(shape_keys, base_index, data["loop_vertex"], data["triangles"],
+                                                      data["smooth"]))
+                morph_indices = data["morph_index"]
+            if skeleton is not None:
+                data.update(meshtools.read_vertex_weights(mesh, group_bones, self.max_bone_influences))
+            if self.export_bounds or self.export_node_bounds:
+                bounds = meshtools.bounds(data["position"][data["loop_vertex"][data["triangles"]]])
+
+            cached_texts = None
+            # the Skin refers to the bones, which are not part of the mesh data
+            if self.geometry_cache is not None and skeleton is None:
+                cache_key = self.geometry_cache.key(data, num_materials)
+                cached_texts = self.geometry_cache.load(cache_key)
+
+            if cached_texts is not None:
+                # unchanged since a previous export, neither processing nor formatting needed
+                struct.children.extend(self.spool_meshes([DdlSerializedStructure(B"Mesh", text, depth=1)
+                                                          for text in cached_texts]))
+            elif self.geometry_processes > 1:
+                # welded in parallel with the other meshes by process_pending_geometry()
+                self.container.pending_geometry.append((entry, data, num_materials, cache_key, skeleton))
+            else:
+                export_mesh = self.process_mesh(data, num_materials, self.optimize_vertex_cache,
+                                                self.optimize_overdraw, self.lod_levels, self.weld_epsilons,
+                                                0 if export_morph_targets else self.chunk_vertices)
+        else:
+            m = bmesh.new()
+            m.from_mesh(mesh)
+
+            # Triangulate the mesh
+            bmesh.ops.triangulate(m, faces=m.faces, quad_method=0, ngon_method=0)
+
+            m.faces.ensure_lookup_table()
+            m.edges.ensure_lookup_table()
+
+            # per vertex data of the original vertices
+            vertex_data = {}
+            morph_normals = None
+            if export_morph_targets:
+                # the loops of the triangles in face order are the corners to_per_vertex_data() creates vertices for
+                vertex_data = meshtools.read_shape_keys(shape_keys, base_index,
+                                                        [v.index for face in m.faces for v in face.verts],
+                                                        list(range(len(m.faces) * 3)),
+                                                        [face.smooth for face in m.faces])
+                morph_indices = vertex_data.pop("morph_index")
+                morph_normals = vertex_data.pop("morph_normal")
+            if skeleton is not None:
+                vertex_data.update(meshtools.read_vertex_weights(mesh, group_bones, self.max_bone_influences))
+            used_vertices = [v.index for v in m.verts if len(v.link_faces) != 0]
+
+            # cleanup loose edges and vertices
+            bmesh.ops.delete(m, geom=[v for v in m.verts if len(v.link_faces) == 0], context=1)  # 1 <=> DEL_VERTS
+
+            # vertices are only merged by position with bulk mesh extraction
+            epsilons = {key: epsilon for key, epsilon in (self.weld_epsilons or {}).items() if key != "position"}
+            export_mesh = self.to_per_vertex_data(m, num_materials=num_materials, uv_layers=uv_layers,
+                                                  epsilons=epsilons, corner_data=morph_normals)
+            weld = export_mesh.pop("weld", None)
+            source_vertices = [used_vertices[i] for i in export_mesh.pop("vertex")]
+            source_corners = export_mesh.pop("corner")
+            for key, values in vertex_data.items():
+                export_mesh[key] = values[source_vertices]
+            if morph_normals is not None:
+                export_mesh["morph_normal"] = morph_normals[source_corners]
+            if meshtools is not None:
+                if self.export_bounds or self.export_node_bounds:
+                    bounds = meshtools.bounds(export_mesh["position"])
+                export_mesh = self.process_export_mesh(export_mesh, self.optimize_vertex_cache,
+                                                       self.optimize_overdraw, self.lod_levels,
+                                                       0 if export_morph_targets else self.chunk_vertices)
+            if weld is not None:
+                export_mesh["weld"] = weld
+
+        bpy.data.meshes.remove(mesh)
+
+        entry["bounds"] = bounds
+        if self.export_bounds and bounds is not None:
+            struct.children[bounds_index:bounds_index] = self.export_bounding_volumes(bounds)
+
+        if export_mesh is not None:
+            self.add_mesh(entry, export_mesh, m, cache_key, morph_indices, skeleton)
 
         # Restore the morph state.
 
-        if shape_keys and False:  # TODO
+        if shape_keys:
             node.active_shape_key_index = active_shape_key_index
             node.show_only_shape_key = show_only_shape_key
 
             for i in range(len(current_morph_value)):
                 shape_keys.key_blocks[i].value = current_morph_value[i]
 
-            mesh.update()
+            node.data.update()
 
         self.progress.end_task()
 
+        if self.spool_geometry and len(self.container.pending_geometry) >= 4 * self.geometry_processes:
+            # process the meshes in batches, so that the data read from them is freed
+            self.process_pending_geometry()
+
         return struct
 
     def export_light(self, node, light):
@@ -1776,9 +2308,12 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
             return entry["struct"]
 
     def export_objects(self):
+        # chunks of split meshes follow the GeometryObject of their first chunk
+        geometry = [dict(item, struct=struct) for item in self.container.geometry_array.values()
+                    for struct in [item["struct"]] + item["chunks"]]
         self.document.structures.extend([
             DdlTextWriter.set_comment(item["struct"], B", ".join([bytes(n.name, "UTF-8") for n in item["nodeTable"]]))
-            for item in itertools.chain(self.container.geometry_array.values(),
+            for item in itertools.chain(geometry,
                                         self.container.light_array.values(),
                                         self.container.camera_array.values(),
                                         self.container.material_array.values())
@@ -1829,6 +2364,16 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
 
         self.unresolved_refs = []
 
+        for ref, armature in self.unresolved_bone_refs:
+            bone_wrappers = [self.container.bone_array.get((armature, name)) for name in ref.data]
+            for name, bw in zip(ref.data, bone_wrappers):
+                if bw is None or "struct" not in bw.nodeRef:
+                    raise ValueError("Bone {} of {} is needed for skinning, but not exported.".format(
+                        name, armature.name))
+            ref.data = [bw.nodeRef["struct"] for bw in bone_wrappers]
+
+        self.unresolved_bone_refs = []
+
     def execute(self, context):
 
         start_time = time.time()
@@ -1849,6 +2394,35 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
         export_all_flag = not self.export_selection
         self.container = ExporterState(export_all_flag, self.sample_animation, scene)
 
+        # the writer is needed before writing the file to serialize meshes for the geometry cache
+        if self.oddl_format == 'TEXT':
+            self.writer = DdlTextWriter(self.document, rounding=self.rounding, workers=self.writer_processes,
+                                        float_encoding=float_encodings[self.float_encoding])
+        elif self.oddl_format == 'COMPRESSED_TEXT':
+            self.writer = DdlCompressedTextWriter(self.document, rounding=self.rounding,
+                                                  workers=self.writer_processes,
+                                                  float_encoding=float_encodings[self.float_encoding])
+        else:
+            self.writer = DdlBinaryWriter(self.document)
+
+        self.vertex_cache_report = []
+        self.weld_report = []
+        self.spool_geometry = self.spool_mesh_text and self.oddl_format != 'BINARY'
+        self.chunk_vertices = self.max_chunk_vertices if self.split_meshes and meshtools is not None else 0
+        self.weld_epsilons = {key: epsilon for key, epsilon in [
+            ("position", self.weld_position_epsilon), ("normal", self.weld_normal_epsilon),
+            ("texcoord", self.weld_texcoord_epsilon), ("color", self.weld_color_epsilon)] if epsilon > 0.0} or None
+        self.lod_levels = self.parse_lod_ratios(self.lod_ratios) if meshtools is not None else []
+        self.geometry_cache = None
+        if self.geometry_cache_path and self.oddl_format != 'BINARY' and meshtools is not None:
+            # everything which changes the text of the Mesh structures needs to be part of the key
+            options = " ".join(str(option) for option in [
+                self.oddl_format, self.float_encoding, self.rounding if self.float_encoding == 'FIXED' else None,
+                self.optimize_vertex_cache, self.optimize_overdraw, self.compact_indices, self.half_precision,
+                self.byte_colors, self.lod_levels, self.sparse_morph_targets,
+                sorted((self.weld_epsilons or {}).items()), self.chunk_vertices])
+            self.geometry_cache = GeometryCache(bpy.path.abspath(self.geometry_cache_path), options)
+
         self.document.structures.extend(self.export_metrics(scene))
 
         # export the worlds ambient color, if enabled
@@ -1873,6 +2447,29 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
             if not obj.parent:
                 self.document.structures.append(self.export_node(obj, scene))
 
+        self.progress.begin_task("Sampling animations...")
+        self.container.animation_sampler.sample(scene)
+        self.progress.end_task()
+
+        self.process_pending_geometry()
+        if self.deduplicate_geometry and meshtools is not None:
+            self.merge_duplicate_geometry()
+        self.export_geometry_chunks()
+
+        for name, stats in self.vertex_cache_report:
+            print("Vertex cache of {}: {}".format(name.decode("UTF-8"), ", ".join(
+                "ACMR {:.3f} -> {:.3f}".format(before, after) for before, after in stats)))
+
+        if self.weld_report:
+            exact = sum(before for before, _ in self.weld_report)
+            welded = sum(after for _, after in self.weld_report)
+            print("Welding with tolerances: {} vertices instead of {} ({:.1f}% fewer)".format(
+                welded, exact, 100.0 * (exact - welded) / max(1, exact)))
+
+        if self.geometry_cache is not None:
+            print("Geometry cache: {} meshes reused, {} meshes exported".format(self.geometry_cache.hits,
+                                                                                self.geometry_cache.misses))
+
         # progress update is handled within ExportObjects()
         self.export_objects()
 
@@ -1882,11 +2479,17 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
 
         self.resolve_unresolved_refs()
 
+        filepath = self.filepath
+        compression = compression_methods[self.compression]
+        if compression is not None:
+            extension = self.compression_extension or DdlWriter.compression_extensions[compression]
+            if not filepath.endswith(extension):
+                filepath += extension
+
         self.progress.begin_task("Writing file...")
-        if self.oddl_format == 'TEXT':
-            DdlTextWriter(self.document, rounding=self.rounding).write(self.filepath)
-        if self.oddl_format == 'COMPRESSED_TEXT':
-            DdlCompressedTextWriter(self.document, rounding=self.rounding).write(self.filepath)
+        self.writer.write(filepath, compression, self.compression_level)
+        if self.oddl_format != 'BINARY':
+            self.writer.close_spool()
         self.progress.end_task()
 
         # cleanup
@@ -1895,7 +2498,7 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
 
         context.scene.render.image_settings.file_format = previous_file_format
 
-        print('-- Successfully exported to "{}". ({:.2f} sec)'.format(self.filepath, time.time() - start_time))
+        print('-- Successfully exported to "{}". ({:.2f} sec)'.format(filepath, time.time() - start_time))
 
         return {'FINISHED'}
 
@@ -1919,10 +2522,45 @@ class OpenGexExporter(bpy.types.Operator, ExportHelper):
         col.prop(self, "export_audio")
         if self.export_audio:
             col.prop(self, "audio_path_prefix")
+        col.prop(self, "export_bounds")
+        col.prop(self, "export_node_bounds")
         col.separator()
 
         col.label("Advanced")
-        col.prop(self, "rounding")
+        col.prop(self, "float_encoding")
+        if self.float_encoding == 'FIXED':
+            col.prop(self, "rounding")
         col.prop(self, "export_only_first_material")
+        col.prop(self, "compact_indices")
+        col.prop(self, "half_precision")
+        col.prop(self, "byte_colors")
+        col.prop(self, "optimize_vertex_cache")
+        if self.optimize_vertex_cache:
+            col.prop(self, "optimize_overdraw")
+        col.prop(self, "lod_ratios")
+        if self.bulk_mesh_extraction:
+            col.prop(self, "weld_position_epsilon")
+        col.prop(self, "weld_normal_epsilon")
+        col.prop(self, "weld_texcoord_epsilon")
+        col.prop(self, "weld_color_epsilon")
+        col.prop(self, "split_meshes")
+        if self.split_meshes:
+            col.prop(self, "max_chunk_vertices")
+        col.prop(self, "deduplicate_geometry")
+        col.prop(self, "sparse_morph_targets")
+        col.prop(self, "max_bone_influences")
+        col.prop(self, "bulk_mesh_extraction")
+        if self.bulk_mesh_extraction:
+            col.prop(self, "geometry_processes")
+            if self.oddl_format != 'BINARY':
+                col.prop(self, "geometry_cache_path")
+        if self.oddl_format != 'BINARY':
+            col.prop(self, "spool_mesh_text")
         col.prop(self, "image_path_prefix")
         col.prop(self, "oddl_format")
+        if self.oddl_format != 'BINARY':
+            col.prop(self, "writer_processes")
+        col.prop(self, "compression")
+        if self.compression != 'NONE':
+            col.prop(self, "compression_level")
+            col.prop(self, "compression_extension")
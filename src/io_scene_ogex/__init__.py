@@ -25,9 +25,14 @@
 # DEALINGS IN THE SOFTWARE.
 # =============================================================
 
-import bpy
-
-from io_scene_ogex.OpenGexExporter import OpenGexExporter
+try:
+    import bpy
+except ImportError:
+    # pyddl and pygex are usable without Blender, e.g. by run_benchmarks.py
+    bpy = None
+
+if bpy is not None:
+    from io_scene_ogex.OpenGexExporter import OpenGexExporter
 
 __author__ = ' Jonathan Hale, Eric Lengyel,Nicolas Wehrle'
 
@@ -0,0 +1,1130 @@
+from collections import OrderedDict, deque
+import hashlib
+import heapq
+import itertools
+import multiprocessing
+import operator
+
+import numpy
+
+from io_scene_ogex.pyddl import DdlPrimitiveDataType as DataType
+
+__author__ = 'Jonathan Hale'
+
+"""
+Bulk mesh processing with NumPy.
+
+read_mesh() copies all data needed for export out of a blender mesh with foreach_get, which avoids accessing
+every loop from Python. All other functions only work on the resulting numpy arrays and do not depend on blender.
+"""
+
+# function and meshes to process in the worker processes of process_meshes(), inherited when forking
+_pool_function = None
+_pool_meshes = None
+
+
+def _pool_process_mesh(index):
+    """
+    Process a mesh of `_pool_meshes` with `_pool_function` in a worker process.
+    :param index: index of the mesh in `_pool_meshes`
+    :return: the result of the function
+    """
+    return _pool_function(*_pool_meshes[index])
+
+
+def read_mesh(mesh, uv_layers=None):
+    """
+    Read the triangles and per loop data of a blender mesh into numpy arrays.
+    :param mesh: blender mesh to read. Without loop_triangles (blender 2.7x), every polygon needs to be a triangle.
+    :param uv_layers: indices or names of uv layers to read or None to read all.
+    :return: dict of property to data. Keys are "position" (per vertex), "loop_vertex", "normal", optionally
+    "color" and "texcoord" (OrderedDict of layer name to data, all per loop), "triangles" (loop triples),
+    "material" and "smooth" (per triangle).
+    """
+    vertex_count = len(mesh.vertices)
+    loop_count = len(mesh.loops)
+
+    positions = numpy.empty(vertex_count * 3, numpy.float32)
+    mesh.vertices.foreach_get("co", positions)
+
+    loop_vertices = numpy.empty(loop_count, numpy.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+
+    # split normals are the vertex normal for smooth and the face normal for flat faces
+    mesh.calc_normals_split()
+    normals = numpy.empty(loop_count * 3, numpy.float32)
+    mesh.loops.foreach_get("normal", normals)
+
+    if hasattr(mesh, "loop_triangles"):
+        mesh.calc_loop_triangles()
+        triangles = mesh.loop_triangles
+        triangle_loops = numpy.empty(len(triangles) * 3, numpy.int32)
+        triangles.foreach_get("loops", triangle_loops)
+    else:
+        triangles = mesh.polygons
+        loop_totals = numpy.empty(len(triangles), numpy.int32)
+        triangles.foreach_get("loop_total", loop_totals)
+        if numpy.any(loop_totals != 3):
+            raise ValueError("Mesh {} needs to be triangulated.".format(mesh.name))
+
+        triangle_loops = numpy.empty(len(triangles), numpy.int32)
+        triangles.foreach_get("loop_start", triangle_loops)
+        triangle_loops = (triangle_loops[:, numpy.newaxis] + numpy.arange(3, dtype=numpy.int32)).ravel()
+
+    materials = numpy.empty(len(triangles), numpy.int32)
+    triangles.foreach_get("material_index", materials)
+    smooth = numpy.empty(len(triangles), bool)
+    triangles.foreach_get("use_smooth", smooth)
+
+    ret_value = {
+        "position": positions.reshape(-1, 3),
+        "loop_vertex": loop_vertices,
+        "normal": normals.reshape(-1, 3),
+        "triangles": triangle_loops.reshape(-1, 3),
+        "material": materials,
+        "smooth": smooth}
+
+    color_layer = mesh.vertex_colors.active
+    if color_layer is not None:
+        # blender 2.7x has rgb, later versions rgba vertex colors
+        size = len(color_layer.data[0].color) if loop_count != 0 else 3
+        colors = numpy.empty(loop_count * size, numpy.float32)
+        color_layer.data.foreach_get("color", colors)
+        ret_value["color"] = colors.reshape(-1, size)
+
+    if uv_layers is None:
+        layers = mesh.uv_layers.values()
+    else:
+        layers = [mesh.uv_layers[layer] for layer in uv_layers]
+
+    if len(layers) != 0:
+        texcoords = OrderedDict()
+        for layer in layers:
+            uvs = numpy.empty(loop_count * 2, numpy.float32)
+            layer.data.foreach_get("uv", uvs)
+            texcoords[layer.name] = uvs.reshape(-1, 2)
+        ret_value["texcoord"] = texcoords
+
+    return ret_value
+
+
+def vertex_normals(positions, triangles):
+    """
+    :param positions: 2D array of vertex positions
+    :param triangles: 2D array of vertex index triples
+    :return: normals of the vertices, averaged from the normals of their triangles weighted by area
+    """
+    positions = numpy.asarray(positions, numpy.float32).reshape(-1, 3)
+    triangles = numpy.asarray(triangles).reshape(-1, 3)
+
+    corners = positions[triangles]
+    face_normals = numpy.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+
+    normals = numpy.empty_like(positions)
+    for axis in range(3):
+        normals[:, axis] = sum(numpy.bincount(triangles[:, i], face_normals[:, axis], len(positions))
+                               for i in range(3))
+    lengths = numpy.linalg.norm(normals, axis=1)
+    normals /= numpy.maximum(lengths, 1e-30)[:, numpy.newaxis]
+    return normals
+
+
+def split_normals(positions, loop_vertices, triangles, smooth):
+    """
+    :param positions: 2D array of vertex positions
+    :param loop_vertices: vertex of every loop
+    :param triangles: 2D array of loop index triples
+    :param smooth: whether every triangle is shaded smooth
+    :return: normals of the loops, the vertex normal for smooth and the face normal for flat triangles, like the split
+    normals of blender without sharp edges and custom normals
+    """
+    positions = numpy.asarray(positions, numpy.float32).reshape(-1, 3)
+    loop_vertices = numpy.asarray(loop_vertices).ravel()
+    triangles = numpy.asarray(triangles).reshape(-1, 3)
+
+    normals = vertex_normals(positions, loop_vertices[triangles])[loop_vertices]
+
+    flat = triangles[~numpy.asarray(smooth, bool)]
+    if len(flat) != 0:
+        corners = positions[loop_vertices[flat]]
+        face_normals = numpy.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+
+        # loops of flat ngons are part of several triangles, their normals are summed like for the polygon normal
+        sums = numpy.empty((len(loop_vertices), 3), numpy.float32)
+        for axis in range(3):
+            sums[:, axis] = sum(numpy.bincount(flat[:, i], face_normals[:, axis], len(loop_vertices))
+                                for i in range(3))
+        flat_loops = numpy.unique(flat)
+        lengths = numpy.linalg.norm(sums[flat_loops], axis=1)
+        normals[flat_loops] = sums[flat_loops] / numpy.maximum(lengths, 1e-30)[:, numpy.newaxis]
+    return normals
+
+
+def read_shape_keys(shape_keys, base_index, loop_vertices, triangles, smooth):
+    """
+    Read the morph targets of a mesh from the coordinates of its shape keys.
+    :param shape_keys: blender shape keys of the mesh
+    :param base_index: index of the key block of the base mesh
+    :param loop_vertices: vertex of every loop of the mesh
+    :param triangles: 2D array of loop index triples of the mesh, to compute the normals of the morph targets
+    :param smooth: whether every triangle is shaded smooth
+    :return: dict with "morph_index" (index of the key block of every morph target), "morph_position" (offset of
+    every vertex from the base per morph target) and "morph_normal" (change of the split normal of every loop per
+    morph target, see split_normals())
+    """
+    blocks = shape_keys.key_blocks
+    vertex_count = len(blocks[base_index].data)
+    indices = [i for i in range(len(blocks)) if i != base_index]
+
+    coordinates = numpy.empty((len(blocks), vertex_count * 3), numpy.float32)
+    for i, block in enumerate(blocks):
+        block.data.foreach_get("co", coordinates[i])
+    coordinates = coordinates.reshape(len(blocks), vertex_count, 3)
+
+    base_normals = split_normals(coordinates[base_index], loop_vertices, triangles, smooth)
+
+    # positions per vertex, so the vertices can be welded and reordered like all other per vertex data, normals per
+    # loop like the normals of the base mesh, so flat faces keep their face normals
+    positions = numpy.empty((vertex_count, len(indices), 3), numpy.float32)
+    normals = numpy.empty((len(base_normals), len(indices), 3), numpy.float32)
+    for target, i in enumerate(indices):
+        positions[:, target] = coordinates[i] - coordinates[base_index]
+        normals[:, target] = split_normals(coordinates[i], loop_vertices, triangles, smooth) - base_normals
+
+    return {
+        "morph_index": numpy.array(indices, numpy.int32),
+        "morph_position": positions,
+        "morph_normal": normals}
+
+
+def read_vertex_weights(mesh, group_bones, max_influences=0):
+    """
+    Read the bone influences of the vertices of a mesh from its vertex groups.
+    :param mesh: blender mesh to read
+    :param group_bones: index of the bone of every vertex group of the object, -1 for groups without bone
+    :param max_influences: maximum number of influences per vertex or 0 for no limit, see limit_influences()
+    :return: dict of per vertex data, see limit_influences()
+    """
+    # vertex groups have no bulk access, flatten the elements of all vertices in one pass and read their attributes
+    # straight into arrays. The vertex of every element follows from the number of elements per vertex.
+    vertex_groups = [vertex.groups for vertex in mesh.vertices]
+    counts = numpy.fromiter(map(len, vertex_groups), numpy.int64, len(vertex_groups))
+    elements = list(itertools.chain.from_iterable(vertex_groups))
+    groups = numpy.fromiter(map(operator.attrgetter("group"), elements), numpy.int64, len(elements))
+    weights = numpy.fromiter(map(operator.attrgetter("weight"), elements), numpy.float32, len(elements))
+    vertices = numpy.repeat(numpy.arange(len(vertex_groups), dtype=numpy.int64), counts)
+
+    # groups without a vertex group of the object map to the appended -1
+    group_bones = numpy.append(numpy.asarray(group_bones, numpy.int64), -1)
+    groups = numpy.minimum(groups, len(group_bones) - 1)
+    return limit_influences(len(vertex_groups), vertices, group_bones[groups], weights, max_influences)
+
+
+def limit_influences(vertex_count, vertices, bones, weights, max_influences=0):
+    """
+    Keep the strongest bone influences of every vertex and normalize their weights.
+    :param vertex_count: number of vertices
+    :param vertices: vertex of every influence
+    :param bones: bone of every influence, influences with negative bones are ignored
+    :param weights: weight of every influence, influences with zero weight are ignored
+    :param max_influences: maximum number of influences per vertex or 0 for no limit
+    :return: dict with "bone_count" (number of influences per vertex), "bone_index" and "bone_weight" (2D arrays with
+    the bones and weights of the influences of every vertex, strongest first and padded with zeros)
+    """
+    vertices = numpy.asarray(vertices, numpy.int64)
+    bones = numpy.asarray(bones, numpy.int64)
+    weights = numpy.asarray(weights, numpy.float32)
+
+    valid = (bones >= 0) & (weights > 0.0)
+    vertices, bones, weights = vertices[valid], bones[valid], weights[valid]
+
+    # sort by vertex, then by descending weight
+    order = numpy.lexsort((-weights, vertices))
+    vertices, bones, weights = vertices[order], bones[order], weights[order]
+
+    counts = numpy.bincount(vertices, minlength=vertex_count)
+    starts = numpy.cumsum(counts) - counts
+    ranks = numpy.arange(len(vertices)) - starts[vertices]
+    if max_influences > 0:
+        kept = ranks < max_influences
+        vertices, bones, weights, ranks = vertices[kept], bones[kept], weights[kept], ranks[kept]
+        counts = numpy.minimum(counts, max_influences)
+
+    totals = numpy.bincount(vertices, weights, minlength=vertex_count)
+    weights = weights / totals[vertices]
+
+    width = max(1, int(counts.max())) if vertex_count else 1
+    bone_index = numpy.zeros((vertex_count, width), numpy.uint32)
+    bone_weight = numpy.zeros((vertex_count, width), numpy.float32)
+    bone_index[vertices, ranks] = bones
+    bone_weight[vertices, ranks] = weights
+
+    return {
+        "bone_count": counts.astype(numpy.uint32),
+        "bone_index": bone_index,
+        "bone_weight": bone_weight}
+
+
+def skin_arrays(export_mesh):
+    """
+    :param export_mesh: dict of property to per vertex data with bone influences, see limit_influences()
+    :return: tuple of the bone count of every vertex and the bone indices and weights of all vertices in order
+    """
+    counts = numpy.asarray(export_mesh["bone_count"])
+    used = numpy.arange(export_mesh["bone_index"].shape[1]) < counts[:, numpy.newaxis]
+    return counts, export_mesh["bone_index"][used], export_mesh["bone_weight"][used]
+
+
+def morph_target(export_mesh, target):
+    """
+    :param export_mesh: dict of property to per vertex data with "morph_position" and "morph_normal", see
+    read_shape_keys()
+    :param target: index of the morph target in the morph data
+    :return: tuple of the positions and normals of the vertices of the morph target
+    """
+    positions = numpy.asarray(export_mesh["position"], numpy.float32) + export_mesh["morph_position"][:, target]
+    normals = numpy.asarray(export_mesh["normal"], numpy.float32) + export_mesh["morph_normal"][:, target]
+    normals /= numpy.maximum(numpy.linalg.norm(normals, axis=1), 1e-30)[:, numpy.newaxis]
+    return positions, normals
+
+
+def displaced_vertices(export_mesh, target, epsilon=1e-6):
+    """
+    :param export_mesh: dict of property to per vertex data with "morph_position" and "morph_normal", see
+    read_shape_keys()
+    :param target: index of the morph target in the morph data
+    :param epsilon: largest change of a position or normal component which is not considered a change
+    :return: tuple of the indices of the vertices changed by the morph target, their offsets and their normals
+    """
+    offsets = export_mesh["morph_position"][:, target]
+    changed = (numpy.abs(offsets).max(axis=1) > epsilon) | \
+        (numpy.abs(export_mesh["morph_normal"][:, target]).max(axis=1) > epsilon)
+    indices = numpy.flatnonzero(changed)
+    _, normals = morph_target(export_mesh, target)
+    return indices.astype(numpy.uint32), offsets[indices], normals[indices]
+
+
+def digest(data, num_materials=1, salt=B""):
+    """
+    Hash mesh data read with read_mesh(), which covers all input of per_vertex_data().
+    :param data: dict of mesh data as returned by read_mesh()
+    :param num_materials: number of materials used in the mesh
+    :param salt: bytes to hash in addition, e.g. options which affect how the mesh is exported
+    :return: hexadecimal SHA-256 digest
+    """
+    h = hashlib.sha256(salt)
+    h.update(bytes(str(max(1, num_materials)), "UTF-8"))
+
+    arrays = [(key, data[key]) for key in sorted(data) if key != "texcoord"]
+    arrays.extend(("texcoord " + name, uvs) for name, uvs in data.get("texcoord", {}).items())
+    for name, values in arrays:
+        values = numpy.ascontiguousarray(values)
+        h.update(bytes("\n{} {} {}\n".format(name, values.dtype.str, values.shape), "UTF-8"))
+        h.update(values.data)
+
+    return h.hexdigest()
+
+
+def structure_digest(structure, salt=B"", refs=None):
+    """
+    Hash the substructures of a structure, e.g. the processed vertex and index arrays of a GeometryObject. The name of
+    the structure itself is not hashed, so that structures with the same content have the same digest.
+    :param structure: DdlStructure to hash
+    :param salt: bytes to hash in addition
+    :param refs: optional dict of the id() of ref primitives to bytes identifying what their values refer to, for
+    references which are still unresolved names
+    :return: hexadecimal SHA-256 digest
+    """
+    h = hashlib.sha256(salt)
+    _update_structure_digest(h, structure, refs or {})
+    return h.hexdigest()
+
+
+def _update_structure_digest(h, structure, refs):
+    h.update(B"\n" + structure.identifier)
+    for key, value in sorted(structure.properties.items()):
+        h.update(bytes(" {!r}={!r}".format(key, value), "UTF-8"))
+
+    if hasattr(structure, "text"):
+        # serialized structure, see pyddl.DdlSerializedStructure
+        h.update(structure.text)
+        return
+
+    for child in structure.children:
+        if not hasattr(child, "data_type"):
+            h.update(B"\n" + (child.name or B""))
+            _update_structure_digest(h, child, refs)
+            continue
+
+        h.update(bytes("\n{} {} {!r}\n".format(child.data_type.name, child.vector_size, child.name), "UTF-8"))
+        if child.data_type in (DataType.string, DataType.ref, DataType.type):
+            h.update(refs.get(id(child), B""))
+            h.update(bytes(repr([getattr(value, "name", value) for value in child.data]), "UTF-8"))
+            continue
+
+        # floats from lists of vectors and from arrays hash equally
+        if child.data_type == DataType.double:
+            dtype = "<f8"
+        elif child.data_type in (DataType.half, DataType.float):
+            dtype = "<f4"
+        elif child.data_type.name.startswith("unsigned"):
+            dtype = "<u8"
+        else:
+            dtype = "<i8"
+        values = numpy.ascontiguousarray(numpy.asarray(child.data).astype(dtype, copy=False)).ravel()
+        h.update(bytes(str(len(values)), "UTF-8"))
+        h.update(values.data)
+
+
+def unique_rows(rows):
+    """
+    Find the unique rows of a 2D array, like numpy.unique(axis=0), which older NumPy versions do not support.
+    :param rows: 2D array
+    :return: tuple of the index of the first occurrence of each unique row, the index of the unique row of each row
+    and the number of occurrences of each unique row
+    """
+    rows = numpy.ascontiguousarray(rows)
+    if rows.dtype.kind == "f":
+        # adding zero turns -0.0 into 0.0, which compare equal but differ in their bytes
+        rows = rows + rows.dtype.type(0.0)
+
+    keys = rows.view(numpy.dtype((numpy.void, rows.itemsize * rows.shape[1]))).ravel()
+    _, first, inverse, counts = numpy.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+    return first, inverse.ravel(), counts
+
+
+def weld(corner_vertices, attributes):
+    """
+    Find the unique combinations of vertex and attributes, in order of first occurrence.
+    The first combination of every vertex keeps the index of that vertex, further combinations are appended after the
+    last vertex, which results in the same indices as welding with a dict while walking the corners in order.
+    :param corner_vertices: vertex index of every triangle corner, every index in range(max + 1) needs to be used
+    :param attributes: 2D float32 array with the attributes of every triangle corner, or float64 array of their
+    quantized values
+    :return: tuple of the new vertex index of every corner and the corner every new vertex was created from
+    """
+    corner_vertices = numpy.asarray(corner_vertices, numpy.int32)
+    if attributes.dtype == numpy.float64:
+        # quantized attributes, see quantize()
+        rows = numpy.empty((len(corner_vertices), 1 + attributes.shape[1]), numpy.float64)
+        rows[:, 0] = corner_vertices
+    else:
+        rows = numpy.empty((len(corner_vertices), 1 + attributes.shape[1]), numpy.float32)
+        rows[:, 0] = corner_vertices.view(numpy.float32)
+    # adding zero turns -0.0 into 0.0, which compare equal but differ in their bytes
+    numpy.add(attributes, rows.dtype.type(0.0), out=rows[:, 1:])
+
+    keys = rows.view(numpy.dtype((numpy.void, rows.itemsize * rows.shape[1]))).ravel()
+    _, first_corners, inverse = numpy.unique(keys, return_index=True, return_inverse=True)
+
+    # sort the unique rows by their first occurrence
+    order = numpy.argsort(first_corners)
+    first_corners = first_corners[order]
+    row_vertices = corner_vertices[first_corners]
+
+    # the first row for each vertex keeps its index
+    _, keeping = numpy.unique(row_vertices, return_index=True)
+    is_new = numpy.ones(len(order), bool)
+    is_new[keeping] = False
+
+    indices = row_vertices.astype(numpy.int64)
+    indices[is_new] = len(keeping) + numpy.arange(numpy.count_nonzero(is_new))
+
+    row_indices = numpy.empty(len(order), numpy.int64)
+    row_indices[order] = indices
+
+    sources = numpy.empty(len(order), numpy.int64)
+    sources[indices] = first_corners
+
+    return row_indices[inverse.ravel()], sources
+
+
+def quantize(values, epsilon):
+    """
+    Snap values onto a grid with a cell size of `epsilon`. Values in the same cell are considered equal when welding,
+    the cell index is their key in the spatial hash.
+    :param values: float array
+    :param epsilon: size of the grid cells, 0.0 to keep the values exact
+    :return: the values if `epsilon` is 0.0, the cell indices as float64 array otherwise
+    """
+    if not epsilon:
+        return values
+    return numpy.floor(numpy.asarray(values, numpy.float64) / epsilon + 0.5)
+
+
+def weld_vertices(positions, epsilon, extra=()):
+    """
+    Merge vertices whose positions fall into the same cell of a grid with a cell size of `epsilon`.
+    :param positions: positions of the vertices
+    :param epsilon: size of the grid cells
+    :param extra: per vertex arrays which need to be equal for vertices to be merged, e.g. bone weights
+    :return: index of the first vertex with the same key for every vertex
+    """
+    columns = [quantize(positions, epsilon)]
+    columns.extend(numpy.asarray(values, numpy.float64).reshape(len(positions), -1) for values in extra)
+    first, inverse, _ = unique_rows(numpy.hstack(columns))
+    return first[inverse]
+
+
+def _corner_columns(data, corner_loops, epsilons=None):
+    """
+    :param data: dict of mesh data as returned by read_mesh()
+    :param corner_loops: loop of every triangle corner
+    :param epsilons: dict of attribute name to welding tolerance
+    :return: 2D array of the attributes which need to be equal to share a vertex, for every corner
+    """
+    epsilons = epsilons or {}
+    columns = [quantize(data["normal"][corner_loops], epsilons.get("normal", 0.0))]
+    if "morph_normal" in data:
+        # coplanar flat faces share their normal, but not necessarily the normals of their morph targets
+        morph_normals = data["morph_normal"][corner_loops].reshape(len(corner_loops), -1)
+        columns.append(quantize(morph_normals, epsilons.get("normal", 0.0)))
+    if "color" in data:
+        columns.append(quantize(data["color"][corner_loops], epsilons.get("color", 0.0)))
+    if "texcoord" in data:
+        columns.extend(quantize(uvs[corner_loops], epsilons.get("texcoord", 0.0)) for uvs in data["texcoord"].values())
+    return numpy.hstack(columns)
+
+
+def exact_vertex_count(data):
+    """
+    :param data: dict of mesh data as returned by read_mesh()
+    :return: number of vertices per_vertex_data() creates without welding tolerances, to report their effect
+    """
+    corner_loops = data["triangles"].ravel()
+    corner_vertices = numpy.asarray(data["loop_vertex"][corner_loops], numpy.float64)
+    first, _, _ = unique_rows(numpy.hstack((corner_vertices[:, numpy.newaxis], _corner_columns(data, corner_loops))))
+    return len(first)
+
+
+def per_vertex_data(data, num_materials=1, epsilons=None):
+    """
+    Generate per vertex data from the arrays read with read_mesh(). Unused vertices are removed.
+    With tolerances, vertices whose attributes fall into the same cell of a grid with the tolerance as cell size are
+    merged, keeping the attributes of the first one. Vertices merged by position need to have equal per vertex
+    data, e.g. bone weights, and triangles which collapse by merging them are removed.
+    :param data: dict of mesh data as returned by read_mesh()
+    :param num_materials: number of materials used in the mesh
+    :param epsilons: dict of attribute name to welding tolerance. Possible keys are "position", "normal", "color" and
+    "texcoord", missing attributes are welded exactly
+    :return: dict of property to data. Possible keys are: "position", "normal", "tris", "texcoord", "color",
+    "morph_position" and "morph_normal" if the data contains morph targets, see read_shape_keys(), and "bone_count",
+    "bone_index" and "bone_weight" if it contains bone influences, see read_vertex_weights()
+    """
+    num_materials = max(1, num_materials)
+
+    vertex_keys = ("morph_position", "bone_count", "bone_index", "bone_weight")
+    triangles = data["triangles"]
+    materials = data["material"]
+    corner_vertices = data["loop_vertex"][triangles.ravel()]
+
+    if epsilons and epsilons.get("position"):
+        extra = [data[key] for key in vertex_keys if key in data]
+        merged = weld_vertices(data["position"], epsilons["position"], extra)
+        corners = merged[corner_vertices].reshape(-1, 3)
+        remaining = (corners[:, 0] != corners[:, 1]) & (corners[:, 1] != corners[:, 2]) & \
+            (corners[:, 2] != corners[:, 0])
+        triangles = triangles[remaining]
+        materials = materials[remaining]
+        corner_vertices = corners[remaining].ravel()
+
+    corner_loops = triangles.ravel()
+
+    # remove vertices without faces, keeping the order of the others
+    used = numpy.zeros(len(data["position"]), bool)
+    used[corner_vertices] = True
+    compacted = numpy.cumsum(used, dtype=numpy.int64) - 1
+
+    corner_indices, sources = weld(compacted[corner_vertices], _corner_columns(data, corner_loops, epsilons))
+    source_loops = corner_loops[sources]
+
+    tris = corner_indices.astype(numpy.uint32).reshape(-1, 3)
+    # blender uses the last material for out of range material indices
+    materials = numpy.minimum(materials, num_materials - 1)
+
+    ret_value = {
+        "position": data["position"][corner_vertices[sources]],
+        "normal": data["normal"][source_loops],
+        "tris": [tris[materials == i] for i in range(num_materials)]}
+    if "texcoord" in data:
+        ret_value["texcoord"] = OrderedDict(
+            (name, uvs[source_loops]) for name, uvs in data["texcoord"].items())
+    if "color" in data:
+        ret_value["color"] = data["color"][source_loops]
+    if "morph_normal" in data:
+        ret_value["morph_normal"] = data["morph_normal"][source_loops]
+    for key in vertex_keys:
+        if key in data:
+            ret_value[key] = data[key][corner_vertices[sources]]
+    return ret_value
+
+
+def bounds(positions):
+    """
+    Compute the axis aligned bounding box and a bounding sphere of vertex positions. The sphere is centered in the
+    box, which is cheap to compute and tight enough for culling.
+    :param positions: 2D array of vertex positions
+    :return: tuple of minimum and maximum of the box and center and radius of the sphere or None if there are no
+    positions
+    """
+    positions = numpy.asarray(positions, numpy.float64).reshape(-1, 3)
+    if len(positions) == 0:
+        return None
+
+    minimum = positions.min(axis=0)
+    maximum = positions.max(axis=0)
+    center = (minimum + maximum) * 0.5
+    radius = numpy.sqrt(numpy.square(positions - center).sum(axis=1).max())
+    return minimum, maximum, center, float(radius)
+
+
+def transform_bounds(minimum, maximum, matrix):
+    """
+    :param minimum: minimum of an axis aligned bounding box
+    :param maximum: maximum of an axis aligned bounding box
+    :param matrix: 4x4 transformation matrix, e.g. a mathutils.Matrix
+    :return: minimum and maximum of the axis aligned box enclosing the transformed box
+    """
+    matrix = numpy.array(matrix, numpy.float64)
+    corners = numpy.array([[x, y, z] for x in (minimum[0], maximum[0]) for y in (minimum[1], maximum[1])
+                           for z in (minimum[2], maximum[2])])
+    corners = corners.dot(matrix[:3, :3].T) + matrix[:3, 3]
+    return corners.min(axis=0), corners.max(axis=0)
+
+
+def vertex_cache_misses(tris, cache_size=16):
+    """
+    Count the misses of a FIFO post-transform vertex cache when drawing triangles in order.
+    :param tris: vertex index triples
+    :param cache_size: number of vertices in the cache
+    :return: number of vertices which need to be transformed
+    """
+    cached = set()
+    fifo = deque()
+    misses = 0
+    for v in numpy.asarray(tris).ravel().tolist():
+        if v not in cached:
+            misses += 1
+            cached.add(v)
+            fifo.append(v)
+            if len(fifo) > cache_size:
+                cached.discard(fifo.popleft())
+    return misses
+
+
+def acmr(tris, cache_size=16):
+    """
+    :param tris: vertex index triples
+    :param cache_size: number of vertices in the FIFO cache
+    :return: average cache miss ratio, the number of transformed vertices per triangle
+    """
+    return vertex_cache_misses(tris, cache_size) / max(1, len(tris))
+
+
+def tipsify(tris, vertex_count, cache_size=16):
+    """
+    Order triangles for the post-transform vertex cache with Tipsify (Sander et al., "Fast Triangle Reordering for
+    Vertex Locality and Reduced Overdraw"), which fans around vertices which are still in the cache.
+    :param tris: 2D array of vertex index triples
+    :param vertex_count: number of vertices the triangles refer to
+    :param cache_size: number of vertices in the cache
+    :return: tuple of the new triangle order and the start of each cluster of triangles after which the cache
+    could not be reused
+    """
+    flat = tris.ravel()
+
+    # triangles of every vertex
+    live = numpy.bincount(flat, minlength=vertex_count)
+    offsets = numpy.concatenate(([0], numpy.cumsum(live))).tolist()
+    adjacency = (numpy.argsort(flat, kind="stable") // 3).tolist()
+    live = live.tolist()
+
+    triangles = tris.tolist()
+    emitted = [False] * len(triangles)
+    cache_time = [0] * vertex_count
+    timestamp = cache_size + 1
+    dead_end = []
+    cursor = 0
+
+    order = []
+    starts = [0]
+    fanning = 0
+    while fanning >= 0:
+        candidates = []
+        for t in adjacency[offsets[fanning]:offsets[fanning + 1]]:
+            if not emitted[t]:
+                emitted[t] = True
+                order.append(t)
+                for v in triangles[t]:
+                    dead_end.append(v)
+                    candidates.append(v)
+                    live[v] -= 1
+                    if timestamp - cache_time[v] > cache_size:
+                        cache_time[v] = timestamp
+                        timestamp += 1
+
+        # continue with the candidate which has been in the cache longest while still staying in it for its fan
+        fanning = -1
+        best_priority = -1
+        for v in candidates:
+            if live[v] > 0:
+                priority = 0
+                if timestamp - cache_time[v] + 2 * live[v] <= cache_size:
+                    priority = timestamp - cache_time[v]
+                if priority > best_priority:
+                    fanning = v
+                    best_priority = priority
+
+        if fanning < 0:
+            # dead end, continue with a recently used vertex or the next one with triangles left
+            if starts[-1] != len(order):
+                starts.append(len(order))
+            while dead_end and fanning < 0:
+                v = dead_end.pop()
+                if live[v] > 0:
+                    fanning = v
+            while fanning < 0 and cursor < vertex_count:
+                if live[cursor] > 0:
+                    fanning = cursor
+                cursor += 1
+
+    if len(starts) > 1 and starts[-1] == len(order):
+        # the last dead end is the end of the triangles
+        starts.pop()
+
+    return numpy.array(order, numpy.int64), starts
+
+
+def split_clusters(tris, starts, cache_size=16, threshold=0.75):
+    """
+    Split clusters of triangles further where the cache miss ratio of the cluster so far is already low, so that
+    clusters can be sorted without losing much vertex locality.
+    :param tris: vertex index triples in drawing order
+    :param starts: first triangle of each cluster
+    :param cache_size: number of vertices in the FIFO cache
+    :param threshold: cache miss ratio after which a cluster is ended
+    :return: first triangle of each cluster
+    """
+    boundaries = set(starts)
+    result = []
+    cached = set()
+    fifo = deque()
+    misses = 0
+    count = 0
+    for i, triangle in enumerate(numpy.asarray(tris).tolist()):
+        if i in boundaries or (count != 0 and misses <= threshold * count):
+            result.append(i)
+            misses = 0
+            count = 0
+
+        for v in triangle:
+            if v not in cached:
+                misses += 1
+                cached.add(v)
+                fifo.append(v)
+                if len(fifo) > cache_size:
+                    cached.discard(fifo.popleft())
+        count += 1
+    return result
+
+
+def sort_clusters(tris, starts, positions):
+    """
+    Sort clusters of triangles so that outward facing clusters are drawn first, which tends to reduce overdraw from
+    any view direction, as proposed along with Tipsify.
+    :param tris: 2D array of vertex index triples in drawing order
+    :param starts: first triangle of each cluster
+    :param positions: 2D array of vertex positions
+    :return: the new triangle order
+    """
+    corners = numpy.asarray(positions, numpy.float64)[tris]
+    normals = numpy.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    areas = numpy.linalg.norm(normals, axis=1)
+    centroids = corners.mean(axis=1)
+
+    mesh_centroid = (centroids * areas[:, numpy.newaxis]).sum(axis=0) / max(areas.sum(), 1e-30)
+
+    cluster_normals = numpy.add.reduceat(normals, starts)
+    cluster_areas = numpy.add.reduceat(areas, starts)
+    cluster_centroids = numpy.add.reduceat(centroids * areas[:, numpy.newaxis], starts)
+    cluster_centroids /= numpy.maximum(cluster_areas, 1e-30)[:, numpy.newaxis]
+
+    lengths = numpy.maximum(numpy.linalg.norm(cluster_normals, axis=1), 1e-30)
+    occlusion = ((cluster_centroids - mesh_centroid) * cluster_normals).sum(axis=1) / lengths
+
+    ends = list(starts[1:]) + [len(tris)]
+    return numpy.concatenate([numpy.arange(starts[c], ends[c]) for c in numpy.argsort(-occlusion, kind="stable")])
+
+
+def optimize_vertex_cache(export_mesh, overdraw=False, cache_size=16):
+    """
+    Reorder the triangles of each index array for the post-transform vertex cache and optionally for overdraw, then
+    order the vertices by their first use for the vertex fetch.
+    :param export_mesh: dict of property to per vertex data, e.g. as returned by per_vertex_data(). Data of all keys
+    except "tris" is per vertex.
+    :param overdraw: whether to sort clusters of triangles to reduce overdraw
+    :param cache_size: number of vertices in the post-transform vertex cache to optimize for
+    :return: the reordered per vertex data with an additional "acmr" key, a list of the average cache miss ratio
+    before and after optimization for each non-empty index array
+    """
+    vertex_count = len(export_mesh["position"])
+
+    ret_value = {"tris": [], "acmr": []}
+    for tris in export_mesh["tris"]:
+        tris = numpy.asarray(tris, numpy.int64).reshape(-1, 3)
+        if len(tris) == 0:
+            ret_value["tris"].append(tris.astype(numpy.uint32))
+            continue
+
+        before = acmr(tris, cache_size)
+
+        order, starts = tipsify(tris, vertex_count, cache_size)
+        tris = tris[order]
+        if overdraw:
+            starts = split_clusters(tris, starts, cache_size)
+            tris = tris[sort_clusters(tris, starts, export_mesh["position"])]
+
+        ret_value["tris"].append(tris)
+        ret_value["acmr"].append((before, acmr(tris, cache_size)))
+
+    # order vertices by first use, unused vertices stay at the end
+    used, first_use = numpy.unique(numpy.concatenate([tris.ravel() for tris in ret_value["tris"]]),
+                                   return_index=True)
+    unused = numpy.ones(vertex_count, bool)
+    unused[used] = False
+    vertex_order = numpy.concatenate((used[numpy.argsort(first_use)], numpy.flatnonzero(unused)))
+
+    new_indices = numpy.empty(vertex_count, numpy.uint32)
+    new_indices[vertex_order] = numpy.arange(vertex_count, dtype=numpy.uint32)
+    ret_value["tris"] = [new_indices[tris] for tris in ret_value["tris"]]
+
+    for key, data in export_mesh.items():
+        if key in ret_value:
+            continue
+        if isinstance(data, dict):
+            ret_value[key] = OrderedDict((name, numpy.asarray(values)[vertex_order]) for name, values in data.items())
+        else:
+            ret_value[key] = numpy.asarray(data)[vertex_order]
+
+    return ret_value
+
+
+def quadric_decimation(positions, triangles, target_count, boundary_weight=1000.0):
+    """
+    Collapse edges of a triangle mesh in order of their quadric error (Garland and Heckbert, "Surface Simplification
+    Using Quadric Error Metrics") until at most `target_count` triangles are left. Edges are collapsed into the one of
+    their vertices with the lower error, so that vertices keep their attributes. Collapses which would flip a triangle
+    or violate the link condition, i.e. create non-manifold edges or duplicate triangles, are skipped and boundaries
+    are kept in place by additional planes perpendicular to the boundary triangles.
+    :param positions: 2D array of vertex positions
+    :param triangles: 2D array of vertex index triples
+    :param target_count: number of triangles to reduce to
+    :param boundary_weight: weight of the boundary planes relative to the triangle planes
+    :return: array with the index of the vertex every vertex was collapsed into
+    """
+    positions = numpy.asarray(positions, numpy.float64)
+    triangles = numpy.asarray(triangles, numpy.int64).reshape(-1, 3)
+    vertex_count = len(positions)
+
+    # plane quadrics of all triangles, weighted by area
+    corners = positions[triangles]
+    normals = numpy.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    areas = numpy.linalg.norm(normals, axis=1)
+    normals /= numpy.maximum(areas, 1e-30)[:, numpy.newaxis]
+    planes = numpy.hstack((normals, -(normals * corners[:, 0]).sum(axis=1)[:, numpy.newaxis]))
+    quadrics = numpy.zeros((vertex_count, 4, 4))
+    face_quadrics = planes[:, :, numpy.newaxis] * planes[:, numpy.newaxis, :] * (areas / 2)[:, numpy.newaxis,
+                                                                                          numpy.newaxis]
+    for i in range(3):
+        numpy.add.at(quadrics, triangles[:, i], face_quadrics)
+
+    # edges used by a single triangle are boundaries
+    edges = numpy.sort(triangles[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    edge_faces, _, edge_uses = unique_rows(edges)
+    unique_edges = edges[edge_faces]
+    boundary = edge_uses == 1
+    if numpy.any(boundary):
+        a, b = positions[unique_edges[boundary, 0]], positions[unique_edges[boundary, 1]]
+        direction = b - a
+        length = numpy.linalg.norm(direction, axis=1)
+        normal = numpy.cross(direction, normals[edge_faces[boundary] // 3])
+        normal /= numpy.maximum(numpy.linalg.norm(normal, axis=1), 1e-30)[:, numpy.newaxis]
+        boundary_planes = numpy.hstack((normal, -(normal * a).sum(axis=1)[:, numpy.newaxis]))
+        boundary_quadrics = boundary_planes[:, :, numpy.newaxis] * boundary_planes[:, numpy.newaxis, :] * \
+            (boundary_weight * length * length)[:, numpy.newaxis, numpy.newaxis]
+        numpy.add.at(quadrics, unique_edges[boundary, 0], boundary_quadrics)
+        numpy.add.at(quadrics, unique_edges[boundary, 1], boundary_quadrics)
+
+    # cost of collapsing every edge into the one of its vertices with the lower error, all at once
+    homogeneous = numpy.hstack((positions, numpy.ones((vertex_count, 1))))
+    edge_quadrics = quadrics[unique_edges[:, 0]] + quadrics[unique_edges[:, 1]]
+    costs = numpy.stack([numpy.einsum("ni,nij,nj->n", homogeneous[unique_edges[:, i]], edge_quadrics,
+                                      homogeneous[unique_edges[:, i]]) for i in range(2)], 1)
+    into_first = costs[:, 0] < costs[:, 1]
+    directed = numpy.where(into_first[:, numpy.newaxis], unique_edges[:, ::-1], unique_edges)
+
+    # the collapses themselves only touch a few vertices each, which is faster with plain Python numbers than with
+    # NumPy calls on tiny arrays. Quadrics are symmetric, so their upper triangles are kept
+    upper = numpy.triu_indices(4)
+    vertex_quadrics = quadrics[:, upper[0], upper[1]].tolist()
+    points = positions.tolist()
+
+    def edge_collapse(u, v):
+        # cost and direction of collapsing the edge into the vertex with the lower error
+        a11, a12, a13, a14, a22, a23, a24, a33, a34, a44 = [qu + qv for qu, qv in zip(vertex_quadrics[u],
+                                                                                     vertex_quadrics[v])]
+        costs = []
+        for x, y, z in (points[u], points[v]):
+            costs.append(x * (a11 * x + 2.0 * (a12 * y + a13 * z + a14)) + y * (a22 * y + 2.0 * (a23 * z + a24)) +
+                         z * (a33 * z + 2.0 * a34) + a44)
+        return (costs[0], v, u) if costs[0] < costs[1] else (costs[1], u, v)
+
+    def face_normal(a, b, c):
+        (ax, ay, az), (bx, by, bz), (cx, cy, cz) = a, b, c
+        ux, uy, uz, vx, vy, vz = bx - ax, by - ay, bz - az, cx - ax, cy - ay, cz - az
+        return uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+
+    faces = triangles.tolist()
+    vertex_faces = [set() for _ in range(vertex_count)]
+    for f, face in enumerate(faces):
+        for v in face:
+            vertex_faces[v].add(f)
+
+    version = [0] * vertex_count
+    heap = [(cost, u, v, 0, 0) for cost, (u, v) in zip(costs.min(axis=1).tolist(), directed.tolist())]
+    heapq.heapify(heap)
+
+    collapsed = list(range(vertex_count))
+    face_count = len(faces)
+    while face_count > target_count and heap:
+        _, u, v, version_u, version_v = heapq.heappop(heap)
+        if version[u] != version_u or version[v] != version_v or collapsed[u] != u or collapsed[v] != v:
+            # outdated entry
+            continue
+
+        # link condition: the only vertices adjacent to both u and v are those opposite of the edge, otherwise the
+        # collapse would create non-manifold edges or duplicate triangles
+        shared = vertex_faces[u] & vertex_faces[v]
+        opposite = set(w for f in shared for w in faces[f])
+        neighbours_u = set(w for f in vertex_faces[u] for w in faces[f])
+        if any(w not in opposite and w in neighbours_u for f in vertex_faces[v] for w in faces[f]):
+            continue
+
+        # nor may the opposite vertices be connected by an edge in both rings, as in a tetrahedron
+        moved = vertex_faces[u] - shared
+        faces_v = set(frozenset(faces[f]) for f in vertex_faces[v])
+        if any(frozenset(v if w == u else w for w in faces[f]) in faces_v for f in moved):
+            continue
+
+        # triangles around u which stay must not flip, compared to their current orientation
+        flips = False
+        for f in moved:
+            corners = [points[w] for w in faces[f]]
+            before = face_normal(*corners)
+            after = face_normal(*[points[v] if w == u else c for w, c in zip(faces[f], corners)])
+            if before[0] * after[0] + before[1] * after[1] + before[2] * after[2] <= 0.0:
+                flips = True
+                break
+        if flips:
+            continue
+
+        for f in shared:
+            # triangles with both vertices degenerate
+            face_count -= 1
+            for w in faces[f]:
+                vertex_faces[w].discard(f)
+        for f in moved:
+            faces[f] = [v if w == u else w for w in faces[f]]
+            vertex_faces[v].add(f)
+        vertex_faces[u] = set()
+
+        vertex_quadrics[v] = [qu + qv for qu, qv in zip(vertex_quadrics[u], vertex_quadrics[v])]
+        collapsed[u] = v
+        version[v] += 1
+
+        neighbours = set(w for f in vertex_faces[v] for w in faces[f])
+        neighbours.discard(v)
+        for w in neighbours:
+            cost, a, b = edge_collapse(v, w)
+            heapq.heappush(heap, (cost, a, b, version[a], version[b]))
+
+    collapsed = numpy.array(collapsed, numpy.int64)
+
+    # follow chains of collapses to the remaining vertices
+    while True:
+        next_collapsed = collapsed[collapsed]
+        if numpy.array_equal(next_collapsed, collapsed):
+            return collapsed
+        collapsed = next_collapsed
+
+
+def decimate(export_mesh, ratio):
+    """
+    Reduce the number of triangles of per vertex data with quadric_decimation(). Vertices are collapsed by position, so
+    that split vertices, e.g. at uv seams, stay together. Vertices which were moved take the attributes of the most
+    similar vertex at the position they were collapsed into and unused vertices are removed afterwards.
+    :param export_mesh: dict of property to per vertex data, e.g. as returned by per_vertex_data(). Data of all keys
+    except "tris" is per vertex.
+    :param ratio: fraction of triangles to keep
+    :return: dict of property to the per vertex data of the decimated mesh
+    """
+    positions = numpy.asarray(export_mesh["position"])
+    tris = [numpy.asarray(t, numpy.int64).reshape(-1, 3) for t in export_mesh["tris"]]
+    corners = numpy.concatenate(tris)
+    materials = numpy.repeat(numpy.arange(len(tris)), [len(t) for t in tris])
+    if len(corners) == 0:
+        return {key: data for key, data in export_mesh.items() if key != "acmr"}
+
+    attributes = OrderedDict()
+    for key, data in export_mesh.items():
+        if key in ("position", "tris", "acmr"):
+            continue
+        if isinstance(data, dict):
+            attributes[key] = OrderedDict((name, numpy.asarray(values)) for name, values in data.items())
+        else:
+            attributes[key] = numpy.asarray(data)
+
+    # decimate the surface of distinct positions
+    first, points, _ = unique_rows(positions)
+    collapsed = quadric_decimation(positions[first], points[corners], max(1, int(len(corners) * ratio)))
+
+    # replace moved vertices by the vertex with the most similar attributes at their new position
+    columns = [numpy.asarray(values, numpy.float64).reshape(len(positions), -1)
+               for data in attributes.values() for values in (data.values() if isinstance(data, dict) else [data])]
+    columns.append(numpy.zeros((len(positions), 0)))
+    vertex_attributes = numpy.hstack(columns)
+
+    targets = collapsed[points]
+    replacement = numpy.arange(len(positions))
+    moved = numpy.flatnonzero(targets != points)
+    if len(moved):
+        by_point = numpy.argsort(points, kind="stable")
+        point_starts = numpy.searchsorted(points[by_point], numpy.arange(len(first) + 1))
+        for vertex in moved.tolist():
+            target = targets[vertex]
+            candidates = by_point[point_starts[target]:point_starts[target + 1]]
+            distances = numpy.square(vertex_attributes[candidates] - vertex_attributes[vertex]).sum(axis=1)
+            replacement[vertex] = candidates[numpy.argmin(distances)]
+
+    corners = replacement[corners]
+    corner_points = points[corners]
+    remaining = (corner_points[:, 0] != corner_points[:, 1]) & (corner_points[:, 1] != corner_points[:, 2]) & \
+        (corner_points[:, 2] != corner_points[:, 0])
+    corners = corners[remaining]
+    materials = materials[remaining]
+
+    # renumber the remaining vertices in order of first use
+    used, first_use, indices = numpy.unique(corners.ravel(), return_index=True, return_inverse=True)
+    order = numpy.argsort(first_use, kind="stable")
+    renumber = numpy.empty(len(used), numpy.int64)
+    renumber[order] = numpy.arange(len(used))
+    vertices = used[order]
+    tris = renumber[indices.ravel()].astype(numpy.uint32).reshape(-1, 3)
+
+    ret_value = {
+        "position": positions[vertices],
+        "tris": [tris[materials == i] for i in range(len(export_mesh["tris"]))]}
+    for key, data in attributes.items():
+        if isinstance(data, dict):
+            ret_value[key] = OrderedDict((name, values[vertices]) for name, values in data.items())
+        else:
+            ret_value[key] = data[vertices]
+    return ret_value
+
+
+def split_mesh(export_mesh, max_vertices=0xFFFF):
+    """
+    Split per vertex data into chunks of at most `max_vertices` vertices, e.g. to index every chunk with 16 bit
+    indices. Chunks are filled greedily with the triangles in their order, material by material, which keeps
+    neighbouring triangles together. Only vertices on the border between chunks are duplicated.
+    :param export_mesh: dict of property to per vertex data, e.g. as returned by per_vertex_data(). Data of all keys
+    except "tris" is per vertex.
+    :param max_vertices: maximum number of vertices of a chunk, at least 3
+    :return: list of dicts of property to the per vertex data of the chunks, only `export_mesh` if it does not exceed
+    `max_vertices`
+    """
+    if max_vertices < 3:
+        raise ValueError("Chunks need at least 3 vertices, got {}".format(max_vertices))
+    if len(export_mesh["position"]) <= max_vertices:
+        return [export_mesh]
+
+    tris = [numpy.asarray(t, numpy.int64).reshape(-1, 3) for t in export_mesh["tris"]]
+    corners = numpy.concatenate(tris)
+    materials = numpy.repeat(numpy.arange(len(tris)), [len(t) for t in tris])
+
+    chunks = []
+    start = 0
+    while start < len(corners):
+        # count the vertices used by the triangles from `start` on after each triangle, in a window which is
+        # enlarged until the chunk is full
+        size = 2 * max_vertices
+        while True:
+            window = corners[start:start + size].ravel()
+            _, first_use = numpy.unique(window, return_index=True)
+            is_first = numpy.zeros(len(window), bool)
+            is_first[first_use] = True
+            vertex_counts = numpy.cumsum(is_first.reshape(-1, 3).sum(axis=1))
+            end = start + int(numpy.searchsorted(vertex_counts, max_vertices, side="right"))
+            if end < start + len(vertex_counts) or end == len(corners):
+                break
+            size *= 2
+
+        # renumber the vertices of the chunk in order of first use
+        vertices, first_use, indices = numpy.unique(corners[start:end].ravel(), return_index=True,
+                                                    return_inverse=True)
+        order = numpy.argsort(first_use, kind="stable")
+        renumber = numpy.empty(len(vertices), numpy.int64)
+        renumber[order] = numpy.arange(len(vertices))
+        vertices = vertices[order]
+        chunk_tris = renumber[indices.ravel()].astype(numpy.uint32).reshape(-1, 3)
+        chunk_materials = materials[start:end]
+
+        chunk = {"tris": [chunk_tris[chunk_materials == i] for i in range(len(tris))]}
+        for key, data in export_mesh.items():
+            if key in ("tris", "acmr"):
+                continue
+            if isinstance(data, dict):
+                chunk[key] = OrderedDict((name, numpy.asarray(values)[vertices]) for name, values in data.items())
+            else:
+                chunk[key] = numpy.asarray(data)[vertices]
+        chunks.append(chunk)
+        start = end
+
+    return chunks
+
+
+def process_meshes(meshes, processes=1, function=per_vertex_data):
+    """
+    Process multiple meshes, in a pool of `processes` processes if more than one process is requested and processes
+    can be forked on this platform. The worker processes inherit the function and mesh data, so only the results are
+    transferred between processes.
+    :param meshes: list of argument tuples for the function, e.g. mesh data as returned by read_mesh() and number of
+    materials for per_vertex_data()
+    :param processes: number of processes to use
+    :param function: function to call for each mesh, e.g. per_vertex_data()
+    :return: a generator yielding the result of the function for each mesh in order of `meshes`
+    """
+    global _pool_function, _pool_meshes
+
+    try:
+        context = multiprocessing.get_context("fork") if processes > 1 and len(meshes) > 1 else None
+    except ValueError:
+        # fork is not available on Windows
+        context = None
+
+    if context is None or _pool_meshes is not None:
+        for args in meshes:
+            yield function(*args)
+        return
+
+    _pool_function = function
+    _pool_meshes = meshes
+    try:
+        with context.Pool(min(processes, len(meshes))) as pool:
+            # batch small meshes to keep the overhead of transferring results low
+            chunk_size = max(1, len(meshes) // (processes * 16))
+            for result in pool.imap(_pool_process_mesh, range(len(meshes)), chunk_size):
+                yield result
+    finally:
+        _pool_function = None
+        _pool_meshes = None
@@ -1,10 +1,38 @@
 from abc import abstractmethod
+from array import array
+from collections import OrderedDict
+import itertools
 import math
+import multiprocessing
+import os
+import re
+import struct
+import sys
+import tempfile
 from enum import Enum
 
 __author__ = "Jonathan Hale"
 __version__ = "0.1.0"
 
+# trailing zeros of comma terminated "%f" formatted values
+_trailing_zeros = re.compile(rb"0+(?=,)")
+# whole comma terminated values which str() would write in exponent notation or with less significant digits than "%f"
+_float_repr_fixups = re.compile(rb"(?<![^,])(?:[^,]{17,}|-?0\.0000\d*)(?=,)")
+# infinite and nan values, which are written as 0.0
+_non_finite = re.compile(rb"-?inf|nan")
+
+# writer whose document is being serialized by a process pool, inherited by the forked worker processes
+_pool_writer = None
+
+
+def _pool_structure_as_bytes(index):
+    """
+    Serialize a top-level structure of the document of `_pool_writer` in a worker process.
+    :param index: index of the structure in the documents structures
+    :return: the serialized structure as bytes
+    """
+    return B"".join(_pool_writer.structure_as_chunks(_pool_writer.get_document().structures[index]))
+
 
 class DdlPrimitiveDataType(Enum):
     """
@@ -30,28 +58,95 @@ class DdlPrimitiveDataType(Enum):
     type = 14
 
 
+class DdlFloatEncoding(Enum):
+    """
+    Enum for the text representations of float and double primitive data.
+
+    fixed: decimal rounded to a fixed number of decimal places (see `rounding` of the text writers)
+    hex: exact hexadecimal bit pattern, 32 bit for float and 64 bit for double data
+    float32: shortest decimal which converts back to the same 32 bit float, double data is written exactly
+    """
+    fixed = 0
+    hex = 1
+    float32 = 2
+
+
 class DdlPrimitive:
     """
     An OpenDDL primitive structure.
     """
 
-    def __init__(self, data_type, data, name=None, vector_size=0):
+    __slots__ = ("data_type", "data", "name", "vector_size", "comment", "max_elements_per_line")
+
+    def __init__(self, data_type, data, name=None, vector_size=0, comment=None, max_elements_per_line=None):
         """
         Constructor
         :param data_type: primitive data type (see pyddl.enum.PrimitiveType)
-        :param data: list of values. If vector_size != 0, the list should contain tuples
+        :param data: list of values. If vector_size != 0, the list should contain tuples. Numeric data may also be a
+                     flat `array.array`, `memoryview` or NumPy array containing the components of all vectors
         :param name: name of the primitive structure
         :param vector_size: size of the contained vectors
+        :param comment: optional one-line comment as bytes
+        :param max_elements_per_line: optional max amount of elements per line of the data in text form
         """
         self.data_type = data_type
         self.name = name
         self.vector_size = vector_size
         self.data = data
+        self.comment = comment
+        self.max_elements_per_line = max_elements_per_line
+
+    def has_flat_data(self):
+        """
+        :return: true if the data is a buffer of vector components rather than a list of values or tuples
+        """
+        data = self.data
+        return not isinstance(data, (list, tuple)) and (isinstance(data, (array, memoryview)) or hasattr(data, "dtype"))
+
+    def element_count(self):
+        """
+        :return: number of values, or vectors if the primitive has a vector size
+        """
+        if isinstance(self.data, (list, tuple)) or not self.has_flat_data():
+            return len(self.data)
+
+        if isinstance(self.data, memoryview):
+            components = self.data.nbytes // self.data.itemsize
+        elif isinstance(self.data, array):
+            components = len(self.data)
+        else:
+            components = self.data.size
+        return components // max(self.vector_size, 1)
+
+    def flat_data(self):
+        """
+        :return: sequence of all values, or of all components of the vectors if the primitive has a vector size. For
+                 buffer data this is a one-dimensional view of the buffer
+        """
+        if isinstance(self.data, memoryview):
+            return self.data.cast("B").cast(self.data.format) if self.data.ndim != 1 else self.data
+        elif hasattr(self.data, "dtype"):
+            return self.data.reshape(-1)
+        elif self.vector_size == 0 or isinstance(self.data, array):
+            return self.data
+
+        values = tuple(itertools.chain.from_iterable(self.data))
+        if len(values) != len(self.data) * self.vector_size:
+            raise ValueError("Primitive data does not match its vector size of {}.".format(self.vector_size))
+        return values
+
+    def flat_values(self):
+        """
+        :return: tuple of the values like `flat_data`, with buffer contents converted to Python ints and floats
+        """
+        data = self.flat_data()
+        return tuple(data.tolist() if self.has_flat_data() else data)
 
     def is_simple_primitive(self):
-        if len(self.data) == 1:
+        count = self.element_count()
+        if count == 1:
             return self.vector_size <= 4
-        elif len(self.data) <= 4:
+        elif count <= 4:
             return self.vector_size == 0
         return False
 
@@ -61,18 +156,23 @@ class DdlStructure:
     An OpenDDL structure.
     """
 
-    def __init__(self, identifier, name=None, children=[], props=dict()):
+    __slots__ = ("identifier", "name", "name_is_global", "properties", "children", "comment")
+
+    def __init__(self, identifier, name=None, children=None, props=None, comment=None):
         """
         Constructor
         :param identifier: structure identifier
         :param name: optional name
         :param children: list of substructures
+        :param props: dict of properties
+        :param comment: optional one-line comment as bytes
         """
-        self.children = children
-        self.properties = props
+        self.children = [] if children is None else children
+        self.properties = dict() if props is None else props
         self.identifier = identifier
         self.name = name if name != "" else None
         self.name_is_global = True
+        self.comment = comment
 
     def is_simple_structure(self):
         """
@@ -94,7 +194,7 @@ class DdlStructure:
 
         return self.children[0].is_simple_primitive()
 
-    def add_structure(self, identifier, name=None, children=[], props=dict()):
+    def add_structure(self, identifier, name=None, children=None, props=None):
         """
         Add a substructure
         :param identifier: structure identifier
@@ -107,7 +207,7 @@ class DdlStructure:
         self.children.append(s)
         return s
 
-    def add_primitive(self, data_type, data=[], name=None, vector_size=0):
+    def add_primitive(self, data_type, data=None, name=None, vector_size=0):
         """
         Add a primitive substructure
         :param data_type: primitive data type (see pyddl.enum.PrimitiveType)
@@ -116,10 +216,69 @@ class DdlStructure:
         :param vector_size: size of the contained vectors
         :return: self (for method chaining)
         """
-        self.children.append(DdlPrimitive(data_type, data, name, vector_size))
+        self.children.append(DdlPrimitive(data_type, [] if data is None else data, name, vector_size))
         return self
 
 
+class DdlSerializedStructure(DdlStructure):
+    """
+    A structure which was already serialized by a text writer, e.g. to be stored and written again without
+    formatting it again. See DdlTextWriter.serialize_structure().
+    """
+
+    __slots__ = ("text", "depth", "simple")
+
+    def __init__(self, identifier, text, depth=0, simple=False):
+        """
+        Constructor
+        :param identifier: identifier of the serialized structure
+        :param text: serialized structure as bytes
+        :param depth: nesting depth the text was indented for
+        :param simple: whether the serialized structure was simple, which decides the empty lines around it
+        """
+        DdlStructure.__init__(self, identifier)
+        self.text = text
+        self.depth = depth
+        self.simple = simple
+
+    def is_simple_structure(self):
+        return self.simple
+
+
+class DdlSpooledStructure(DdlSerializedStructure):
+    """
+    A serialized structure whose text is kept in a temporary file instead of memory until it is written. See
+    DdlTextWriter.spool_structure().
+    """
+
+    __slots__ = ("spool", "offset", "length")
+
+    def __init__(self, identifier, spool, offset, length, depth=0, simple=False):
+        """
+        Constructor
+        :param identifier: identifier of the serialized structure
+        :param spool: temporary file containing the text
+        :param offset: position of the text in the file
+        :param length: length of the text in bytes
+        :param depth: nesting depth the text was indented for
+        :param simple: whether the serialized structure was simple, which decides the empty lines around it
+        """
+        DdlStructure.__init__(self, identifier)
+        self.spool = spool
+        self.offset = offset
+        self.length = length
+        self.depth = depth
+        self.simple = simple
+
+    @property
+    def text(self):
+        if hasattr(os, "pread"):
+            # does not move the shared file position, which forked writer processes may read concurrently
+            return os.pread(self.spool.fileno(), self.length, self.offset)
+        self.spool.seek(self.offset)
+        return self.spool.read(self.length)
+
+
 class DdlDocument:
     """
     An OpenDDL document.
@@ -128,7 +287,7 @@ class DdlDocument:
     def __init__(self):
         self.structures = []
 
-    def add_structure(self, identifier, name=None, children=[], props=dict()):
+    def add_structure(self, identifier, name=None, children=None, props=None):
         """
         Add a substructure
         :param identifier: structure identifier
@@ -160,32 +319,129 @@ class DdlWriter:
         """
         return self.doc
 
+    # default file extensions appended for the supported compression methods
+    compression_extensions = {"gzip": ".gz", "bz2": ".bz2", "lzma": ".xz"}
+
     @abstractmethod
-    def write(self, filename):
+    def write(self, filename, compression=None, compression_level=None):
         """
         Write the writers document to a specified file.
         :param filename: path to a file to write to
+        :param compression: None to write uncompressed or one of "gzip", "bz2" or "lzma" to compress the output
+                            while it is being written
+        :param compression_level: compression level from 0 to 9, None for the default of the compression method
         :return: nothing
         """
         pass
 
+    @staticmethod
+    def open_file(filename, compression=None, compression_level=None):
+        """
+        Open a file for writing, optionally compressing everything written to it on the fly.
+        :param filename: path to the file to open
+        :param compression: None, "gzip", "bz2" or "lzma"
+        :param compression_level: compression level from 0 to 9, None for the default of the compression method
+        :return: a binary file object
+        """
+        # compression modules are imported on demand, not every Python build ships all of them
+        if compression is None:
+            return open(filename, "wb")
+        elif compression == "gzip":
+            import gzip
+            return gzip.open(filename, "wb", 9 if compression_level is None else compression_level)
+        elif compression == "bz2":
+            import bz2
+            return bz2.open(filename, "wb", 9 if compression_level is None else max(compression_level, 1))
+        elif compression == "lzma":
+            import lzma
+            return lzma.open(filename, "wb", preset=compression_level)
+        else:
+            raise ValueError("Unknown compression \"{}\".".format(compression))
+
+    @staticmethod
+    def float_to_half_bits(f):
+        """
+        :param f: float to convert, rounded to the nearest half float with ties to even
+        :return: IEEE 754 binary16 bit pattern of the float
+        """
+        if math.isnan(f):
+            return 0x7e00
+        sign = 0x8000 if math.copysign(1.0, f) < 0.0 else 0
+        f = abs(f)
+        if f == 0.0:
+            return sign
+        if math.isinf(f):
+            return sign | 0x7c00
+
+        mantissa, exponent = math.frexp(f)
+        exponent -= 1
+        if exponent < -14:
+            # subnormal, scaling by a power of two is exact and round() rounds ties to even
+            return sign | int(round(math.ldexp(f, 24)))
+
+        mantissa = int(round(math.ldexp(mantissa * 2.0 - 1.0, 10)))
+        if mantissa == 0x400:
+            mantissa = 0
+            exponent += 1
+        if exponent > 15:
+            return sign | 0x7c00
+        return sign | ((exponent + 15) << 10) | mantissa
+
+    @staticmethod
+    def half_values(primitive):
+        """
+        :param primitive: primitive structure with data to be stored as half floats
+        :return: tuple of the data of the primitive rounded to the nearest half floats
+        """
+        data = primitive.flat_data()
+        if hasattr(data, "dtype"):
+            # NumPy converts with correct rounding in one go
+            return tuple(data.astype("<f2").tolist())
+        return tuple(DdlTextReader.half_bits_to_float(DdlWriter.float_to_half_bits(f)) for f in data)
+
+    @staticmethod
+    def join_chunks(chunks, size=1 << 20):
+        """
+        Join small chunks to larger blocks, so that compressing file objects are not called for every line.
+        :param chunks: iterable of byte strings
+        :param size: minimum size of the joined blocks in bytes
+        :return: a generator of byte strings
+        """
+        block = []
+        block_size = 0
+        for chunk in chunks:
+            block.append(chunk)
+            block_size += len(chunk)
+            if block_size >= size:
+                yield B"".join(block)
+                block = []
+                block_size = 0
+        if block:
+            yield B"".join(block)
+
 
 class DdlTextWriter(DdlWriter):
     """
     OpenDdlWriter which writes OpenDdlDocuments in human-readable text form.
     """
 
-    def __init__(self, document, rounding=6):
+    def __init__(self, document, rounding=6, workers=1, float_encoding=DdlFloatEncoding.fixed):
         """
         Constructor
         :param document: document to write
-        :param rounding: number of decimal places to keep or None to keep all
+        :param rounding: number of decimal places to keep or None to keep all, for the fixed float encoding
+        :param workers: number of processes to serialize top-level structures in, 1 to serialize in this process
+        :param float_encoding: text representation of float and double primitive data (see DdlFloatEncoding)
         """
         DdlWriter.__init__(self, document)
 
         self.file = None
+        # temporary file for the text of spooled structures, see spool_structure()
+        self.spool = None
         self.indent = B""
         self.rounding = rounding
+        self.workers = workers
+        self.float_encoding = float_encoding
 
     def to_float_byte_rounded(self, f):
         if (math.isinf(f)) or (math.isnan(f)):
@@ -200,6 +456,208 @@ class DdlTextWriter(DdlWriter):
         else:
             return bytes(str(f), "UTF-8")
 
+    @staticmethod
+    def to_float_byte_hex(f):
+        return B"0x%08X" % array("I", array("f", [f]).tobytes())[0]
+
+    @staticmethod
+    def to_double_byte_hex(f):
+        return B"0x%016X" % array("Q", array("d", [f]).tobytes())[0]
+
+    @staticmethod
+    def to_half_byte_hex(f):
+        return B"0x%04X" % DdlWriter.float_to_half_bits(f)
+
+    def to_half_byte_rounded(self, f):
+        f = DdlTextReader.half_bits_to_float(self.float_to_half_bits(f))
+        return self.to_float_byte(f) if self.rounding is None else self.to_float_byte_rounded(f)
+
+    @staticmethod
+    def to_half_byte(f):
+        return DdlTextWriter.shortest_float_array_as_bytes([f], DdlTextWriter.round_to_half, 5)[0]
+
+    @staticmethod
+    def round_to_half(values):
+        """
+        :param values: iterable of floats
+        :return: list of the values rounded to the nearest half floats
+        """
+        return [DdlTextReader.half_bits_to_float(DdlWriter.float_to_half_bits(f)) for f in values]
+
+    @staticmethod
+    def to_float32_byte(f):
+        value = array("f", [f])
+        if (math.isinf(value[0])) or (math.isnan(value[0])):
+            return B"0.0"
+
+        for precision in range(1, 9):
+            text = B"%.*g" % (precision, value[0])
+            if array("f", [float(text)]) == value:
+                break
+        else:
+            text = B"%.9g" % value[0]
+
+        return text if B"." in text or B"e" in text or B"n" in text else text + B".0"
+
+    def float_array_as_bytes(self, values, data_type=DdlPrimitiveDataType.float):
+        """
+        Convert a flat sequence of floats to their byte representations in one batch. The result is identical to
+        mapping the conversion function for the writers float encoding over the values.
+        :param values: tuple of floats
+        :param data_type: half, float or double, the data type of the primitive the values belong to. Half values need
+                          to be rounded to half floats already (see half_values()).
+        :return: list of byte strings, one per value
+        """
+        if self.float_encoding == DdlFloatEncoding.hex:
+            return self.hex_float_array_as_bytes(values, data_type)
+        elif self.float_encoding == DdlFloatEncoding.float32 and data_type == DdlPrimitiveDataType.float:
+            return self.float32_array_as_bytes(values)
+        elif self.float_encoding == DdlFloatEncoding.float32 and data_type == DdlPrimitiveDataType.half:
+            return self.shortest_float_array_as_bytes(values, self.round_to_half, 5)
+
+        return self.rounded_float_array_as_bytes(values, None if self.float_encoding == DdlFloatEncoding.float32
+                                                 else self.rounding)
+
+    @staticmethod
+    def hex_float_array_as_bytes(values, data_type):
+        """
+        Convert a flat sequence of floats to their hexadecimal bit patterns in one batch.
+        :param values: tuple of floats
+        :param data_type: half for 16 bit, float for 32 bit or double for 64 bit patterns
+        :return: list of byte strings, one per value
+        """
+        if data_type == DdlPrimitiveDataType.half:
+            bits = tuple(map(DdlWriter.float_to_half_bits, values))
+            text = (B"0x%04X," * len(bits)) % bits
+        elif data_type == DdlPrimitiveDataType.double:
+            bits = tuple(array("Q", array("d", values).tobytes()))
+            text = (B"0x%016X," * len(bits)) % bits
+        else:
+            bits = tuple(array("I", array("f", values).tobytes()))
+            text = (B"0x%08X," * len(bits)) % bits
+
+        return text[:-1].split(B",")
+
+    @staticmethod
+    def float32_array_as_bytes(values):
+        """
+        Convert a flat sequence of floats to the shortest decimals which convert back to the same 32 bit floats in one
+        batch.
+        :param values: tuple of floats
+        :return: list of byte strings, one per value
+        """
+        return DdlTextWriter.shortest_float_array_as_bytes(values, lambda v: array("f", v), 9)
+
+    @staticmethod
+    def shortest_float_array_as_bytes(values, to_precision, max_digits):
+        """
+        Convert a flat sequence of floats to the shortest decimals which convert back to the same floats of a lower
+        precision in one batch. The number of significant digits is searched for all values at once by bisection.
+        :param values: tuple of floats
+        :param to_precision: function rounding a sequence of floats to the lower precision
+        :param max_digits: number of significant digits which always convert back to the same value
+        :return: list of byte strings, one per value
+        """
+        floats = to_precision(values)
+        tokens = [None] * len(floats)
+
+        # indices of the values still searched for, grouped by the interval of significant digits to search in
+        finite = [i for (i, f) in enumerate(floats) if not (math.isinf(f) or math.isnan(f))]
+        intervals = {(1, max_digits): finite} if finite else {}
+        while intervals:
+            next_intervals = {}
+            for (low, high), indices in intervals.items():
+                if low == high:
+                    if tokens[indices[0]] is None:
+                        # only the maximum number of digits was left, which always converts back
+                        text = ((B"%." + bytes(str(max_digits), "UTF-8") + B"g,") * len(indices)) % \
+                            tuple(floats[i] for i in indices)
+                        for i, token in zip(indices, text[:-1].split(B",")):
+                            tokens[i] = token
+                    continue
+
+                precision = (low + high) // 2
+                text = ((B"%." + bytes(str(precision), "UTF-8") + B"g,") * len(indices)) % \
+                    tuple(floats[i] for i in indices)
+                candidates = text[:-1].split(B",")
+                converted = to_precision(list(map(float, candidates)))
+
+                shorter = []
+                longer = []
+                for i, token, f in zip(indices, candidates, converted):
+                    if f == floats[i]:
+                        tokens[i] = token
+                        shorter.append(i)
+                    else:
+                        longer.append(i)
+
+                if shorter:
+                    next_intervals.setdefault((low, precision), []).extend(shorter)
+                if longer:
+                    next_intervals.setdefault((precision + 1, high), []).extend(longer)
+            intervals = next_intervals
+
+        return [B"0.0" if token is None else
+                (token if B"." in token or B"e" in token else token + B".0") for token in tokens]
+
+    def rounded_float_array_as_bytes(self, values, rounding):
+        """
+        Convert a flat sequence of floats to their byte representations in one batch. The result is identical to
+        mapping `to_float_byte_rounded` (or `to_float_byte` if rounding is None) over the values, but the whole array
+        is formatted by a single printf-style formatting call instead of one round(), str() and bytes() call per value.
+        :param values: tuple of floats
+        :param rounding: number of decimal places to keep or None to keep all
+        :return: list of byte strings, one per value
+        """
+        if rounding is None:
+            text = (B"%r," * len(values)) % values
+        else:
+            # "%.nf" is correctly rounded like round(f, n), but keeps trailing zeros and never uses exponent notation
+            text = ((B"%." + self.to_int_byte(rounding) + B"f,") * len(values)) % values
+            text = _trailing_zeros.sub(B"", text).replace(B".,", B".0,")
+
+            # values with more than 15 significant digits or below 1e-4 need to be converted like str() would
+            bound = 10.0 ** (15 - rounding)
+            if B"0.0000" in text or B"n" in text or \
+                    (len(values) != 0 and (max(values) >= bound or min(values) <= -bound)):
+                text = _float_repr_fixups.sub(lambda match: bytes(repr(float(match.group())), "UTF-8"), text)
+
+        if B"n" in text:
+            # "inf" or "nan"
+            text = _non_finite.sub(B"0.0", text)
+
+        return text[:-1].split(B",")
+
+    def encode_primitive_data(self, primitive, to_bytes):
+        """
+        Convert the data of a primitive structure to byte strings ahead of laying it out. Float and double data is
+        converted in one batch.
+        :param primitive: primitive structure to convert the data of
+        :param to_bytes: conversion function for a single element of the primitives data
+        :return: list of byte strings, or list of tuples of byte strings if the primitive has a vector size
+        """
+        if primitive.data_type == DdlPrimitiveDataType.half:
+            values = self.half_values(primitive)
+        else:
+            values = primitive.flat_values()
+
+        # rounding to 0 decimal places is only supported by the per element conversion
+        batched = primitive.data_type in [DdlPrimitiveDataType.double, DdlPrimitiveDataType.float,
+                                          DdlPrimitiveDataType.half] and \
+            (self.float_encoding != DdlFloatEncoding.fixed or self.rounding is None or self.rounding > 0) and \
+            set(map(type, values)) <= {float}
+
+        if batched:
+            tokens = self.float_array_as_bytes(values, primitive.data_type)
+        else:
+            # other types, or floats mixed with integers, need to be converted one by one
+            tokens = list(map(to_bytes, values))
+
+        if primitive.vector_size != 0:
+            tokens = list(zip(*[iter(tokens)] * primitive.vector_size))
+
+        return tokens
+
     @staticmethod
     def to_int_byte(i):
         return bytes(str(i), "UTF-8")
@@ -234,23 +692,63 @@ class DdlTextWriter(DdlWriter):
         """
         self.indent = self.indent[:-1]
 
-    def write(self, filename):
-        self.file = open(filename, "wb")
+    def write(self, filename, compression=None, compression_level=None):
+        self.file = self.open_file(filename, compression, compression_level)
+        self.file.writelines(self.join_chunks(self.document_as_chunks()))
+        self.file.close()
+
+    def document_as_chunks(self):
+        """
+        Generate the text representation of the writers document chunk by chunk.
+        :return: a generator of byte strings which concatenated form the document text
+        """
+        structures = self.get_document().structures
+        serialized = self.top_level_structures_as_chunks()
 
-        if len(self.get_document().structures) != 0:
+        if len(structures) != 0:
             # first element will never prepend a empty line
-            structure = self.get_document().structures[0]
-            self.file.write(self.structure_as_text(structure))
+            structure = structures[0]
+            yield from next(serialized)
             previous_was_simple = structure.is_simple_structure()
 
-            for structure in self.get_document().structures[1:]:
+            for structure in structures[1:]:
                 if not (previous_was_simple and structure.is_simple_structure()):
-                    self.file.write(B"\n")
+                    yield B"\n"
                     previous_was_simple = structure.is_simple_structure()
 
-                self.file.write(self.structure_as_text(structure))
+                yield from next(serialized)
 
-        self.file.close()
+    def top_level_structures_as_chunks(self):
+        """
+        Serialize the top-level structures of the writers document, in a pool of `workers` processes if more than
+        one worker is requested and processes can be forked on this platform. The worker processes inherit the
+        document, so only the resulting bytes are transferred between processes.
+        :return: a generator yielding an iterable of byte strings per top-level structure in document order
+        """
+        global _pool_writer
+
+        structures = self.get_document().structures
+
+        try:
+            context = multiprocessing.get_context("fork") if self.workers > 1 and len(structures) > 1 else None
+        except ValueError:
+            # fork is not available on Windows
+            context = None
+
+        if context is None or _pool_writer is not None:
+            for structure in structures:
+                yield self.structure_as_chunks(structure)
+            return
+
+        _pool_writer = self
+        try:
+            with context.Pool(self.workers) as pool:
+                # batch small structures to keep the overhead of transferring results low
+                chunk_size = max(1, len(structures) // (self.workers * 16))
+                for text in pool.imap(_pool_structure_as_bytes, range(len(structures)), chunk_size):
+                    yield [text]
+        finally:
+            _pool_writer = None
 
     def property_as_text(self, prop):
         """
@@ -276,97 +774,140 @@ class DdlTextWriter(DdlWriter):
 
         return prop[0] + B" = " + value_bytes
 
-    def primitive_as_text(self, primitive, no_indent=False):
+    def get_conversion_function(self, primitive):
         """
-        Get a text representation of the given primitive structure
-        :param primitive: primitive structure to get the text representation for
-        :param no_indent: if true will skip adding the first indent
-        :return: a byte string representing the primitive structure
+        Find the function which converts a single element of the given primitive structures data to bytes.
+        :param primitive: the primitive structure to find the conversion function for
+        :return: function taking a single data element and returning its byte representation or None for empty string
+                 primitives
         """
-        lines = [(B"" if no_indent else self.indent) + bytes(primitive.data_type.name, "UTF-8")]
-
-        if primitive.vector_size > 0:
-            lines.append(B"[" + self.to_int_byte(primitive.vector_size) + B"]")
-
-        if primitive.name is not None:
-            lines.append(B" $" + primitive.name + B" ")
-
-        has_comment = hasattr(primitive, 'comment')
-        if has_comment:
-            lines.append(B"\t\t// " + primitive.comment)
-
-        # find appropriate conversion function
         if primitive.data_type in [DdlPrimitiveDataType.bool]:
             # bool
-            to_bytes = self.to_bool_byte
+            return self.to_bool_byte
         elif primitive.data_type in [DdlPrimitiveDataType.double, DdlPrimitiveDataType.float]:
             # float/double
-            to_bytes = self.to_float_byte if self.rounding is None else self.to_float_byte_rounded
+            is_double = primitive.data_type == DdlPrimitiveDataType.double
+            if self.float_encoding == DdlFloatEncoding.hex:
+                return self.to_double_byte_hex if is_double else self.to_float_byte_hex
+            elif self.float_encoding == DdlFloatEncoding.float32:
+                return self.to_float_byte if is_double else self.to_float32_byte
+            return self.to_float_byte if self.rounding is None else self.to_float_byte_rounded
+        elif primitive.data_type in [DdlPrimitiveDataType.half]:
+            # half, written as decimals or bit patterns of the nearest half float
+            if self.float_encoding == DdlFloatEncoding.hex:
+                return self.to_half_byte_hex
+            elif self.float_encoding == DdlFloatEncoding.float32:
+                return self.to_half_byte
+            return self.to_half_byte_rounded
         elif primitive.data_type in [DdlPrimitiveDataType.int8, DdlPrimitiveDataType.int16, DdlPrimitiveDataType.int32,
                                      DdlPrimitiveDataType.int64, DdlPrimitiveDataType.unsigned_int8,
                                      DdlPrimitiveDataType.unsigned_int16, DdlPrimitiveDataType.unsigned_int32,
-                                     DdlPrimitiveDataType.unsigned_int64, DdlPrimitiveDataType.half]:
+                                     DdlPrimitiveDataType.unsigned_int64]:
             # integer types
-            to_bytes = self.to_int_byte
+            return self.to_int_byte
         elif primitive.data_type in [DdlPrimitiveDataType.string]:
             # string
             if primitive.vector_size == 0 and len(primitive.data) > 0:
-                to_bytes = self.id if isinstance(primitive.data[0], bytes) else self.to_string_byte
-            else:
-                if len(primitive.data) > 0:
-                    to_bytes = self.id if isinstance(primitive.data[0][0], bytes) else self.to_string_byte
+                return self.id if isinstance(primitive.data[0], bytes) else self.to_string_byte
+            elif len(primitive.data) > 0:
+                return self.id if isinstance(primitive.data[0][0], bytes) else self.to_string_byte
+            return None
         elif primitive.data_type in [DdlPrimitiveDataType.ref]:
-            to_bytes = self.to_ref_byte
+            return self.to_ref_byte
         else:
             raise TypeError("Encountered unknown primitive type.")
 
-        if len(primitive.data) == 0:
-            lines.append(B"\n" if has_comment else B" ")
-            lines.append(B"{ }")
+    def primitive_as_text(self, primitive, no_indent=False):
+        """
+        Get a text representation of the given primitive structure
+        :param primitive: primitive structure to get the text representation for
+        :param no_indent: if true will skip adding the first indent
+        :return: a list of byte strings representing the primitive structure
+        """
+        return list(self.primitive_as_chunks(primitive, no_indent))
+
+    def primitive_as_chunks(self, primitive, no_indent=False):
+        """
+        Generate a text representation of the given primitive structure chunk by chunk. Data which is laid out over
+        multiple lines is yielded line by line.
+        :param primitive: primitive structure to get the text representation for
+        :param no_indent: if true will skip adding the first indent
+        :return: a generator of byte strings representing the primitive structure
+        """
+        header = [(B"" if no_indent else self.indent) + bytes(primitive.data_type.name, "UTF-8")]
+
+        if primitive.vector_size > 0:
+            header.append(B"[" + self.to_int_byte(primitive.vector_size) + B"]")
+
+        if primitive.name is not None:
+            header.append(B" $" + primitive.name + B" ")
+
+        has_comment = primitive.comment is not None
+        if has_comment:
+            header.append(B"\t\t// " + primitive.comment)
+
+        # find appropriate conversion function
+        to_bytes = self.get_conversion_function(primitive)
+
+        if primitive.element_count() == 0:
+            header.append(B"\n" if has_comment else B" ")
+            header.append(B"{ }")
+            yield B"".join(header)
         elif primitive.is_simple_primitive():
-            lines.append(B"\n" if has_comment else B" ")
+            header.append(B"\n" if has_comment else B" ")
             if primitive.vector_size == 0:
-                lines.append(B"{" + B", ".join(map(to_bytes, primitive.data)) + B"}")
+                header.append(B"{" + B", ".join(map(to_bytes, primitive.flat_values())) + B"}")
             else:
-                lines.append(B"{{" + (B", ".join(map(to_bytes, primitive.data[0]))) + B"}}")
+                header.append(B"{{" + (B", ".join(map(to_bytes, primitive.flat_values()))) + B"}}")
+            yield B"".join(header)
         else:
-            lines.append(B"\n" + self.indent + B"{\n")
-            self.inc_indent()
+            header.append(B"\n" + self.indent + B"{\n")
+            yield B"".join(header)
 
-            if primitive.vector_size == 0:
-                if hasattr(primitive, 'max_elements_per_line'):
-                    n = primitive.max_elements_per_line
-                    data = primitive.data
-                    lines.append(self.indent + ((B",\n" + self.indent).join(
-                        [B", ".join(group) for group in
-                         [map(to_bytes, data[i:i + n]) for i in range(0, len(data), n)]])) + B"\n")
-                else:
-                    lines.append(self.indent + (B", ".join(map(to_bytes, primitive.data))) + B"\n")
-            else:
-                if hasattr(primitive, 'max_elements_per_line'):
-                    n = primitive.max_elements_per_line
-                    data = primitive.data
-
-                    if len(data) == 1:
-                        data = data[0]
-                        # there is exactly one vector, we will handle its components for formatting with
-                        # max_elements_per_line.
-                        lines.append(self.indent + B"{" + ((B",\n" + self.indent + B" ").join(
-                            [(B", ".join(map(to_bytes, line))) for line in
-                             [data[i:i + n] for i in range(0, len(data), n)]  # group generator
-                             ]) + B"}\n"))
-                    else:
-                        lines.append(self.indent + B"{" + ((B"},\n" + self.indent + B"{").join(
-                            [(B"}, {".join(B", ".join(map(to_bytes, vec)) for vec in group)) for group in
-                             [data[i:i + n] for i in range(0, len(data), n)]])) + B"}\n")
-                else:
-                    lines.append(self.indent + B"{" + (B"}, {".join(
-                        B", ".join(map(to_bytes, vec)) for vec in primitive.data)) + B"}\n")
+            data = self.encode_primitive_data(primitive, to_bytes)
 
+            self.inc_indent()
+            yield from self.primitive_data_as_chunks(primitive, data)
             self.dec_indent()
-            lines.append(self.indent + B"}")
 
-        return lines
+            yield self.indent + B"}"
+
+    def primitive_data_as_chunks(self, primitive, data):
+        """
+        Generate the lines of the data of a non-simple primitive structure.
+        :param primitive: primitive structure to generate the data lines of
+        :param data: the data of the primitive converted by `encode_primitive_data`
+        :return: a generator of byte strings
+        """
+        indent = self.indent
+
+        if primitive.vector_size == 0:
+            if primitive.max_elements_per_line is not None:
+                n = primitive.max_elements_per_line
+                separator = B",\n"
+                for i in range(0, len(data), n):
+                    yield indent + B", ".join(data[i:i + n]) + (B"\n" if i + n >= len(data) else separator)
+            else:
+                yield indent + B", ".join(data) + B"\n"
+        else:
+            if primitive.max_elements_per_line is not None:
+                n = primitive.max_elements_per_line
+
+                if len(data) == 1:
+                    data = data[0]
+                    # there is exactly one vector, we will handle its components for formatting with
+                    # max_elements_per_line.
+                    separator = B",\n"
+                    for i in range(0, len(data), n):
+                        yield (indent + B"{" if i == 0 else indent + B" ") + B", ".join(data[i:i + n]) + \
+                            (B"}\n" if i + n >= len(data) else separator)
+                else:
+                    separator = B"},\n"
+                    for i in range(0, len(data), n):
+                        yield indent + B"{" + B"}, {".join(map(B", ".join, data[i:i + n])) + \
+                            (B"}\n" if i + n >= len(data) else separator)
+            else:
+                yield indent + B"{" + B"}, {".join(map(B", ".join, data)) + B"}\n"
 
     def structure_as_text(self, structure):
         """
@@ -374,47 +915,113 @@ class DdlTextWriter(DdlWriter):
         :param structure: structure to get the text representation for
         :return: a byte string representing the structure
         """
-        lines = [self.indent + structure.identifier]
+        return B"".join(self.structure_as_chunks(structure))
+
+    def serialize_structure(self, structure, depth=0):
+        """
+        Serialize a structure ahead of writing the document, so that it can be stored or does not need to be formatted
+        again. The result can only be written by writers with the same settings.
+        :param structure: structure to serialize
+        :param depth: nesting depth the structure will be written at
+        :return: a DdlSerializedStructure with the text of the structure
+        """
+        previous_indent = self.indent
+        self.indent = B"\t" * depth
+        try:
+            text = self.structure_as_text(structure)
+        finally:
+            self.indent = previous_indent
+
+        return DdlSerializedStructure(structure.identifier, text, depth, structure.is_simple_structure())
+
+    def spool_structure(self, structure, depth=0):
+        """
+        Serialize a structure ahead of writing the document like serialize_structure(), but keep its text in a
+        temporary file until the document is written, so that neither the structure nor its text is kept in memory.
+        :param structure: structure to serialize
+        :param depth: nesting depth the structure will be written at
+        :return: a DdlSpooledStructure referring to the text of the structure
+        """
+        if self.spool is None:
+            self.spool = tempfile.TemporaryFile()
+
+        self.spool.seek(0, os.SEEK_END)
+        offset = self.spool.tell()
+
+        previous_indent = self.indent
+        self.indent = B"\t" * depth
+        try:
+            for chunk in self.structure_as_chunks(structure):
+                self.spool.write(chunk)
+        finally:
+            self.indent = previous_indent
+
+        self.spool.flush()
+        return DdlSpooledStructure(structure.identifier, self.spool, offset, self.spool.tell() - offset, depth,
+                                   structure.is_simple_structure())
+
+    def close_spool(self):
+        """
+        Delete the temporary file of the spooled structures, which cannot be written afterwards.
+        """
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+
+    def structure_as_chunks(self, structure):
+        """
+        Generate a text representation of the given structure chunk by chunk.
+        :param structure: structure to get the text representation for
+        :return: a generator of byte strings representing the structure
+        """
+        if isinstance(structure, DdlSerializedStructure):
+            if len(self.indent) != structure.depth:
+                raise ValueError("Structure was serialized for depth {}, but written at depth {}.".format(
+                    structure.depth, len(self.indent)))
+            yield structure.text
+            return
+
+        header = [self.indent + structure.identifier]
 
         if structure.name:
-            lines.append(B" $" if structure.name_is_global else B" %")
-            lines.append(structure.name)
+            header.append(B" $" if structure.name_is_global else B" %")
+            header.append(structure.name)
 
         if len(structure.properties) != 0:
-            lines.append(B" (" + B", ".join(self.property_as_text(prop) for prop in structure.properties.items()) + B")")
+            header.append(B" (" + B", ".join(self.property_as_text(prop) for prop in structure.properties.items()) + B")")
 
-        has_comment = hasattr(structure, 'comment')
+        has_comment = structure.comment is not None
         if has_comment:
-            lines.append(B"\t\t// " + structure.comment)
+            header.append(B"\t\t// " + structure.comment)
 
         if structure.is_simple_structure() and not has_comment:
-            lines.append(B" {")
-            lines.extend(self.primitive_as_text(structure.children[0], True))
-            lines.append(B"}\n")
+            header.append(B" {")
+            header.extend(self.primitive_as_chunks(structure.children[0], True))
+            header.append(B"}\n")
+            yield B"".join(header)
         else:
-            lines.append(B"\n" + self.indent + B"{\n")
+            header.append(B"\n" + self.indent + B"{\n")
+            yield B"".join(header)
 
             previous_was_simple = False
-            first = structure.children[0]
+            first = structure.children[0] if len(structure.children) != 0 else None
 
             self.inc_indent()
             for sub in structure.children:
                 if isinstance(sub, DdlPrimitive):
-                    lines.extend(self.primitive_as_text(sub))
-                    lines.append(B"\n")
+                    yield from self.primitive_as_chunks(sub)
+                    yield B"\n"
                     previous_was_simple = False
                 else:
-                    if not (previous_was_simple and sub.is_simple_structure()) and not sub == first:
-                        lines.append(B"\n")
+                    if not (previous_was_simple and sub.is_simple_structure()) and sub is not first:
+                        yield B"\n"
 
-                    lines.append(self.structure_as_text(sub))
+                    yield from self.structure_as_chunks(sub)
                     previous_was_simple = sub.is_simple_structure()
 
             self.dec_indent()
 
-            lines.append(self.indent + B"}\n")
-
-        return B''.join(lines)
+            yield self.indent + B"}\n"
 
     @staticmethod
     def set_max_elements_per_line(primitive, elements):
@@ -425,7 +1032,7 @@ class DdlTextWriter(DdlWriter):
         the components of the vector are treated as the elements.
         :param primitive: the primitive
         :param elements: max amount of elements per line
-        :return: the provided primitive with an added `max_elements_per_line` attribute
+        :return: the provided primitive with its `max_elements_per_line` set
         """
         if isinstance(primitive, DdlPrimitive):
             primitive.max_elements_per_line = elements
@@ -439,7 +1046,7 @@ class DdlTextWriter(DdlWriter):
         Set a one-line comment to a structure or primitive structure
         :param structure: the structure to add the one-line comment to
         :param comment: the comment to add
-        :return: the provided structure with an added `comment` attribute
+        :return: the provided structure with its `comment` set
         """
         if isinstance(structure, DdlStructure) or isinstance(structure, DdlPrimitive):
 
@@ -462,22 +1069,23 @@ class DdlCompressedTextWriter(DdlTextWriter):
     Faster than DdlTextWriter and produces smaller files.
     """
 
-    def __init__(self, document, rounding=6):
+    def __init__(self, document, rounding=6, workers=1, float_encoding=DdlFloatEncoding.fixed):
         """
         Constructor
         :param document: document to write
-        :param rounding: number of decimal places to keep or None to keep all
+        :param rounding: number of decimal places to keep or None to keep all, for the fixed float encoding
+        :param workers: number of processes to serialize top-level structures in, 1 to serialize in this process
+        :param float_encoding: text representation of float and double primitive data (see DdlFloatEncoding)
         """
-        super().__init__(document, rounding)
-
-    def write(self, filename):
-        self.file = open(filename, "wb")
-
-        if len(self.get_document().structures) != 0:
-            for structure in self.get_document().structures:
-                self.file.write(self.structure_as_text(structure))
+        super().__init__(document, rounding, workers, float_encoding)
 
-        self.file.close()
+    def document_as_chunks(self):
+        """
+        Generate the compressed text representation of the writers document chunk by chunk.
+        :return: a generator of byte strings which concatenated form the document text
+        """
+        for chunks in self.top_level_structures_as_chunks():
+            yield from chunks
 
     def property_as_text(self, prop):
         """
@@ -492,6 +1100,8 @@ class DdlCompressedTextWriter(DdlTextWriter):
             value_bytes = self.to_int_byte(value)
         elif isinstance(value, float):
             value_bytes = self.to_float_byte(value)
+        elif isinstance(value, DdlStructure):
+            value_bytes = self.to_ref_byte(value)
         elif isinstance(value, str):
             value_bytes = B"\"" + bytes(value, "UTF-8") + B"\""
         elif isinstance(value, bytes):
@@ -501,87 +1111,947 @@ class DdlCompressedTextWriter(DdlTextWriter):
 
         return prop[0] + B"=" + value_bytes
 
-    def primitive_as_text(self, primitive):
+    def primitive_as_text(self, primitive, no_indent=False):
         """
         Get a text representation of the given primitive structure
         :param primitive: primitive structure to get the text representation for
-        :return: a byte string representing the primitive structure
+        :param no_indent: ignored, compressed text is never indented
+        :return: a list of byte strings representing the primitive structure
+        """
+        return list(self.primitive_as_chunks(primitive))
+
+    def primitive_as_chunks(self, primitive, no_indent=False):
+        """
+        Generate a text representation of the given primitive structure chunk by chunk.
+        :param primitive: primitive structure to get the text representation for
+        :param no_indent: ignored, compressed text is never indented
+        :return: a generator of byte strings representing the primitive structure
         """
-        lines = [bytes(primitive.data_type.name, "UTF-8")]
+        header = [bytes(primitive.data_type.name, "UTF-8")]
 
         if primitive.vector_size > 0:
-            lines.append(B"[" + self.to_int_byte(primitive.vector_size) + B"]")
+            header.append(B"[" + self.to_int_byte(primitive.vector_size) + B"]")
 
         if primitive.name is not None:
-            lines.append(B"$"+ primitive.name)
+            header.append(B"$" + primitive.name)
 
         # find appropriate conversion function
-        if primitive.data_type in [DdlPrimitiveDataType.bool]:
-            # bool
-            to_bytes = self.to_bool_byte
-        elif primitive.data_type in [DdlPrimitiveDataType.double, DdlPrimitiveDataType.float]:
-            # float/double
-            to_bytes = self.to_float_byte if self.rounding is None else self.to_float_byte_rounded
-        elif primitive.data_type in [DdlPrimitiveDataType.int8, DdlPrimitiveDataType.int16, DdlPrimitiveDataType.int32,
-                                     DdlPrimitiveDataType.int64, DdlPrimitiveDataType.unsigned_int8,
-                                     DdlPrimitiveDataType.unsigned_int16, DdlPrimitiveDataType.unsigned_int32,
-                                     DdlPrimitiveDataType.unsigned_int64, DdlPrimitiveDataType.half]:
-            # integer types
-            to_bytes = self.to_int_byte
-        elif primitive.data_type in [DdlPrimitiveDataType.string]:
-            # string
-            if primitive.vector_size == 0 and len(primitive.data) > 0:
-                to_bytes = self.id if isinstance(primitive.data[0], bytes) else self.to_string_byte
-            else:
-                if len(primitive.data) > 0:
-                    to_bytes = self.id if isinstance(primitive.data[0][0], bytes) else self.to_string_byte
-        elif primitive.data_type in [DdlPrimitiveDataType.ref]:
-            to_bytes = self.to_ref_byte
-        else:
-            raise TypeError("Encountered unknown primitive type.")
+        to_bytes = self.get_conversion_function(primitive)
 
-        if len(primitive.data) == 0:
-            lines.append(B"{}")
+        if primitive.element_count() == 0:
+            header.append(B"{}")
+            yield B"".join(header)
         elif primitive.is_simple_primitive():
             if primitive.vector_size == 0:
-                lines.append(B"{" + to_bytes(primitive.data[0]) + B"}")
+                header.append(B"{" + B",".join(map(to_bytes, primitive.flat_values())) + B"}")
             else:
-                lines.append(B"{{" + (B",".join(map(to_bytes, primitive.data[0]))) + B"}}")
+                header.append(B"{{" + (B",".join(map(to_bytes, primitive.flat_values()))) + B"}}")
+            yield B"".join(header)
         else:
-            if primitive.vector_size == 0:
-                lines.append(B"{" + B",".join(map(to_bytes, primitive.data)) + B"}")
-            else:
-                lines.append(B"{{" + (B"},{".join(B",".join(map(to_bytes, vec)) for vec in primitive.data)) + B"}}")
+            yield B"".join(header)
 
-        return lines
+            data = self.encode_primitive_data(primitive, to_bytes)
+            yield from self.primitive_data_as_chunks(primitive, data)
 
-    def structure_as_text(self, structure):
+    def primitive_data_as_chunks(self, primitive, data):
         """
-        Get a text representation of the given structure
+        Generate the data of a non-simple primitive structure including the surrounding braces.
+        :param primitive: primitive structure to generate the data of
+        :param data: the data of the primitive converted by `encode_primitive_data`
+        :return: a generator of byte strings
+        """
+        if primitive.vector_size == 0:
+            yield B"{" + B",".join(data) + B"}"
+        else:
+            yield B"{{" + B"},{".join(map(B",".join, data)) + B"}}"
+
+    def structure_as_chunks(self, structure):
+        """
+        Generate a text representation of the given structure chunk by chunk.
         :param structure: structure to get the text representation for
-        :return: a byte string representing the structure
+        :return: a generator of byte strings representing the structure
         """
-        lines = [structure.identifier]
+        if isinstance(structure, DdlSerializedStructure):
+            yield structure.text
+            return
+
+        header = [structure.identifier]
 
         if structure.name:
-            lines.append(B"$" if structure.name_is_global else B"%")
-            lines.append(structure.name)
+            header.append(B"$" if structure.name_is_global else B"%")
+            header.append(structure.name)
 
         if len(structure.properties) != 0:
-            lines.append(B"(" + B",".join(self.property_as_text(prop) for prop in structure.properties.items()) + B")")
+            header.append(B"(" + B",".join(self.property_as_text(prop) for prop in structure.properties.items()) + B")")
+
+        header.append(B"{")
+        yield B"".join(header)
+
+        for sub in structure.children:
+            if isinstance(sub, DdlPrimitive):
+                yield from self.primitive_as_chunks(sub)
+            else:
+                yield from self.structure_as_chunks(sub)
+
+        yield B"}"
+
+
+class DdlBinaryWriter(DdlWriter):
+    """
+    OpenDdlWriter which writes OpenDdlDocuments in a compact binary form. There is no official specification for
+    binary OpenDDL, the layout is designed so that files can be memory mapped and primitive data can be used directly.
+
+    All values are little-endian. The file starts with the magic `ODDB` and a uint32 format version, followed by a
+    uint32 count of top level structures and the structures themselves:
+
+    - structure: uint8 0, uint32 identifier, int32 name, uint8 flags (1 if the name is global), uint32 property count,
+      properties, uint32 child count, children
+    - property: uint32 key, uint8 value type (0 bool as uint8, 1 int64, 2 double, 3 uint32 string, 4 int32 reference),
+      value
+    - primitive: uint8 1, uint8 data type (see DdlPrimitiveDataType), int32 name, uint32 vector size,
+      uint64 element count, uint64 data size, zero padding to the next multiple of 8 bytes in the file, data
+
+    Identifiers, names, property keys and string property values are uint32 indices into the string table, -1 means
+    no name. Numeric primitive data is a raw block of the corresponding type (bool as uint8, half as uint16), string
+    data is a sequence of uint32 length prefixed UTF-8 strings and ref data are int32 indices into the reference table.
+
+    The file ends with the tables, each starting with a uint32 entry count:
+
+    - string table: uint32 length and UTF-8 bytes per string
+    - structure table: uint64 offset, uint64 size and int32 parent index per structure and primitive in file order
+    - reference table: int32 structure table index per referenced structure, -1 if it was not written
+
+    followed by a trailer with the uint64 offsets of the string, structure and reference tables and the magic `ODDB`
+    with the format version again.
+    """
+
+    magic = B"ODDB"
+    version = 1
+
+    primitive_type_codes = {
+        DdlPrimitiveDataType.bool: "B",
+        DdlPrimitiveDataType.int8: "b",
+        DdlPrimitiveDataType.int16: "h",
+        DdlPrimitiveDataType.int32: "i",
+        DdlPrimitiveDataType.int64: "q",
+        DdlPrimitiveDataType.unsigned_int8: "B",
+        DdlPrimitiveDataType.unsigned_int16: "H",
+        DdlPrimitiveDataType.unsigned_int32: "I",
+        DdlPrimitiveDataType.unsigned_int64: "Q",
+        DdlPrimitiveDataType.half: "H",
+        DdlPrimitiveDataType.float: "f",
+        DdlPrimitiveDataType.double: "d",
+    }
+
+    def __init__(self, document):
+        """
+        Constructor
+        :param document: document to write
+        """
+        DdlWriter.__init__(self, document)
+
+        self.file = None
+        self.offset = 0
+        # string table in index order, see string_index()
+        self.strings = OrderedDict()
+        self.structure_table = []
+        self.written_structures = {}
+        self.reference_ids = {}
+
+    def write(self, filename, compression=None, compression_level=None):
+        self.file = self.open_file(filename, compression, compression_level)
+        self.file.writelines(self.join_chunks(self.document_as_chunks()))
+        self.file.close()
+
+    def document_as_chunks(self):
+        """
+        Generate the binary representation of the writers document chunk by chunk.
+        :return: a generator of byte strings which concatenated form the document
+        """
+        self.offset = 0
+        self.strings = OrderedDict()
+        self.structure_table = []
+        self.written_structures = {}
+        self.reference_ids = {}
+
+        structures = self.get_document().structures
+
+        yield self.emit(self.magic + struct.pack("<II", self.version, len(structures)))
+
+        for structure in structures:
+            yield from self.structure_as_chunks(structure, -1)
+
+        string_table_offset = self.offset
+        yield self.emit(struct.pack("<I", len(self.strings)))
+        for string in self.strings:
+            yield self.emit(struct.pack("<I", len(string)) + string)
+
+        structure_table_offset = self.offset
+        yield self.emit(struct.pack("<I", len(self.structure_table)))
+        yield self.emit(B"".join(struct.pack("<QQi", *entry) for entry in self.structure_table))
+
+        reference_table_offset = self.offset
+        references = sorted(self.reference_ids.items(), key=lambda item: item[1])
+        yield self.emit(struct.pack("<I", len(references)) + self.to_array("i", [
+            self.written_structures.get(key, -1) for (key, _) in references]))
+
+        yield self.emit(struct.pack("<QQQ", string_table_offset, structure_table_offset, reference_table_offset) +
+                        self.magic + struct.pack("<I", self.version))
+
+    def emit(self, chunk):
+        """
+        Keep track of the file offset for a chunk which is about to be written.
+        :param chunk: byte string to be written
+        :return: the given chunk
+        """
+        self.offset += len(chunk)
+        return chunk
+
+    @staticmethod
+    def to_array(type_code, values):
+        """
+        Convert values to a little-endian block of raw data.
+        :param type_code: `array` type code of the values
+        :param values: iterable of values
+        :return: the raw data as bytes
+        """
+        if isinstance(values, memoryview) and values.format == type_code:
+            a = array(type_code, values.tobytes())
+        else:
+            a = array(type_code, values)
+        if sys.byteorder != "little":
+            a.byteswap()
+        return a.tobytes()
+
+    @staticmethod
+    def to_string_bytes(s):
+        if isinstance(s, bytes):
+            # byte strings are preformatted OpenDDL strings, which may already be quoted
+            if len(s) > 1 and s.startswith(B"\"") and s.endswith(B"\""):
+                # the string table holds the values of the strings, not their escaped text form
+                return bytes(DdlTextReader.replace_escape_sequences(s[1:-1].decode("UTF-8")), "UTF-8")
+            return s
+        return bytes(s, "UTF-8")
+
+    def string_index(self, s):
+        """
+        :param s: str or bytes
+        :return: index of the given string in the string table
+        """
+        s = self.to_string_bytes(s)
+        index = self.strings.get(s)
+        if index is None:
+            index = len(self.strings)
+            self.strings[s] = index
+        return index
+
+    @staticmethod
+    def reference_key(structure):
+        # global names are unique in a document, other structures can only be identified by object identity
+        if structure.name and structure.name_is_global:
+            return structure.name
+        return id(structure)
+
+    def reference_index(self, structure):
+        """
+        :param structure: referenced structure or None
+        :return: index of the referenced structure in the reference table or -1 for null references
+        """
+        if structure is None:
+            return -1
+
+        key = self.reference_key(structure)
+        index = self.reference_ids.get(key)
+        if index is None:
+            index = len(self.reference_ids)
+            self.reference_ids[key] = index
+        return index
+
+    def name_index(self, name):
+        return -1 if not name else self.string_index(name)
+
+    def property_as_bytes(self, prop):
+        """
+        Create a binary representation for a key-value-pair.
+        :param prop: a pair to represent
+        :return: a byte string containing the key, the value type and the value
+        """
+        key = struct.pack("<I", self.string_index(prop[0]))
+
+        value = prop[1]
+        if isinstance(value, bool):
+            return key + struct.pack("<BB", 0, value)
+        elif isinstance(value, int):
+            return key + struct.pack("<Bq", 1, value)
+        elif isinstance(value, float):
+            return key + struct.pack("<Bd", 2, value)
+        elif isinstance(value, (str, bytes)):
+            return key + struct.pack("<BI", 3, self.string_index(value))
+        elif isinstance(value, DdlStructure):
+            return key + struct.pack("<Bi", 4, self.reference_index(value))
+        else:
+            raise TypeError("ERROR: Unknown property type for property \"{}\"".format(prop[0]))
+
+    def primitive_data_as_bytes(self, primitive):
+        """
+        :param primitive: primitive structure to convert the data of
+        :return: the raw data of the primitive structure
+        """
+        values = primitive.flat_data()
+
+        type_code = self.primitive_type_codes.get(primitive.data_type)
+        if primitive.data_type == DdlPrimitiveDataType.half:
+            if hasattr(values, "dtype"):
+                return values.astype("<f2").tobytes()
+            return self.to_array(type_code, map(self.float_to_half_bits, values))
+        elif type_code is not None:
+            if hasattr(values, "dtype"):
+                # NumPy arrays convert to the little-endian type without going through Python objects
+                return values.astype("<" + type_code).tobytes()
+            return self.to_array(type_code, values)
+        elif primitive.data_type == DdlPrimitiveDataType.string:
+            return B"".join(struct.pack("<I", len(s)) + s for s in map(self.to_string_bytes, values))
+        elif primitive.data_type == DdlPrimitiveDataType.ref:
+            return self.to_array("i", map(self.reference_index, values))
+        elif primitive.data_type == DdlPrimitiveDataType.type:
+            return self.to_array("B", [t.value for t in values])
+        else:
+            raise TypeError("Encountered unknown primitive type.")
+
+    def primitive_as_chunks(self, primitive, parent):
+        """
+        Generate a binary representation of the given primitive structure chunk by chunk.
+        :param primitive: primitive structure to get the binary representation for
+        :param parent: index of the parent structure in the structure table
+        :return: a generator of byte strings
+        """
+        entry = [self.offset, 0, parent]
+        self.structure_table.append(entry)
+
+        data = self.primitive_data_as_bytes(primitive)
+        header = struct.pack("<BBiIQQ", 1, primitive.data_type.value, self.name_index(primitive.name),
+                             primitive.vector_size, primitive.element_count(), len(data))
+        # align the data for direct access when memory mapped
+        padding = -(self.offset + len(header)) % 8
+
+        yield self.emit(header + bytes(padding))
+        yield self.emit(data)
+
+        entry[1] = self.offset - entry[0]
+
+    def structure_as_chunks(self, structure, parent):
+        """
+        Generate a binary representation of the given structure chunk by chunk.
+        :param structure: structure to get the binary representation for
+        :param parent: index of the parent structure in the structure table
+        :return: a generator of byte strings
+        """
+        if isinstance(structure, DdlSerializedStructure):
+            raise TypeError("Serialized text structures cannot be written in binary form.")
 
-        lines.append(B"{")
+        index = len(self.structure_table)
+        entry = [self.offset, 0, parent]
+        self.structure_table.append(entry)
+        if structure.name:
+            self.written_structures[self.reference_key(structure)] = index
+
+        header = [struct.pack("<BIiBI", 0, self.string_index(structure.identifier), self.name_index(structure.name),
+                              1 if structure.name_is_global else 0, len(structure.properties))]
+        header.extend(self.property_as_bytes(prop) for prop in structure.properties.items())
+        header.append(struct.pack("<I", len(structure.children)))
+        yield self.emit(B"".join(header))
 
         for sub in structure.children:
             if isinstance(sub, DdlPrimitive):
-                lines.extend(self.primitive_as_text(sub))
+                yield from self.primitive_as_chunks(sub, index)
             else:
-                lines.append(self.structure_as_text(sub))
+                yield from self.structure_as_chunks(sub, index)
 
-        lines.append(B"}")
+        entry[1] = self.offset - entry[0]
 
-        return B''.join(lines)
 
+class DdlReader:
+    """
+    Abstract class for classes responsible for reading OpenDdlDocuments.
+    """
+
+    @abstractmethod
+    def read(self, filename):
+        """
+        Read a document from a specified file.
+        :param filename: path to a file to read from
+        :return: the read DdlDocument
+        """
+        pass
+
+
+class DdlTextReader(DdlReader):
+    """
+    OpenDdlReader which reads OpenDdlDocuments in text form, as written by DdlTextWriter or DdlCompressedTextWriter.
+
+    Identifiers, names and property keys are read as byte strings, string values as str. References are resolved to
+    the referenced structures. The data of numeric primitive structures is decoded in bulk to flat `array.array`s
+    containing all vector components. Comments following a structure header are kept via
+    `DdlTextWriter.set_comment`, the line layout of primitive data via `DdlTextWriter.set_max_elements_per_line`,
+    so that writing a read document again reproduces the original text.
+    """
+
+    data_types = {
+        B"bool": DdlPrimitiveDataType.bool, B"b": DdlPrimitiveDataType.bool,
+        B"int8": DdlPrimitiveDataType.int8, B"i8": DdlPrimitiveDataType.int8,
+        B"int16": DdlPrimitiveDataType.int16, B"i16": DdlPrimitiveDataType.int16,
+        B"int32": DdlPrimitiveDataType.int32, B"i32": DdlPrimitiveDataType.int32,
+        B"int64": DdlPrimitiveDataType.int64, B"i64": DdlPrimitiveDataType.int64,
+        B"unsigned_int8": DdlPrimitiveDataType.unsigned_int8, B"u8": DdlPrimitiveDataType.unsigned_int8,
+        B"uint8": DdlPrimitiveDataType.unsigned_int8,
+        B"unsigned_int16": DdlPrimitiveDataType.unsigned_int16, B"u16": DdlPrimitiveDataType.unsigned_int16,
+        B"uint16": DdlPrimitiveDataType.unsigned_int16,
+        B"unsigned_int32": DdlPrimitiveDataType.unsigned_int32, B"u32": DdlPrimitiveDataType.unsigned_int32,
+        B"uint32": DdlPrimitiveDataType.unsigned_int32,
+        B"unsigned_int64": DdlPrimitiveDataType.unsigned_int64, B"u64": DdlPrimitiveDataType.unsigned_int64,
+        B"uint64": DdlPrimitiveDataType.unsigned_int64,
+        B"half": DdlPrimitiveDataType.half, B"h": DdlPrimitiveDataType.half,
+        B"float16": DdlPrimitiveDataType.half,
+        B"float": DdlPrimitiveDataType.float, B"f": DdlPrimitiveDataType.float,
+        B"float32": DdlPrimitiveDataType.float,
+        B"double": DdlPrimitiveDataType.double, B"d": DdlPrimitiveDataType.double,
+        B"float64": DdlPrimitiveDataType.double,
+        B"string": DdlPrimitiveDataType.string, B"s": DdlPrimitiveDataType.string,
+        B"ref": DdlPrimitiveDataType.ref, B"r": DdlPrimitiveDataType.ref,
+        B"type": DdlPrimitiveDataType.type, B"t": DdlPrimitiveDataType.type,
+    }
+
+    # array type codes of the numeric data types, half is decoded to double like float
+    array_type_codes = {
+        DdlPrimitiveDataType.int8: "b",
+        DdlPrimitiveDataType.int16: "h",
+        DdlPrimitiveDataType.int32: "i",
+        DdlPrimitiveDataType.int64: "q",
+        DdlPrimitiveDataType.unsigned_int8: "B",
+        DdlPrimitiveDataType.unsigned_int16: "H",
+        DdlPrimitiveDataType.unsigned_int32: "I",
+        DdlPrimitiveDataType.unsigned_int64: "Q",
+        DdlPrimitiveDataType.half: "d",
+        DdlPrimitiveDataType.float: "d",
+        DdlPrimitiveDataType.double: "d",
+    }
+
+    # struct formats for floats given as hexadecimal, octal or binary bit patterns
+    float_bit_formats = {
+        DdlPrimitiveDataType.float: ("<I", "<f"),
+        DdlPrimitiveDataType.double: ("<Q", "<d"),
+    }
+
+    whitespace = re.compile(rb"(?:\s+|//[^\n]*|/\*.*?\*/)*", re.DOTALL)
+    header_comment = re.compile(rb"[ \t]*// ?([^\r\n]*)")
+    token = re.compile(rb"""
+        (?P<identifier>[A-Za-z_][0-9A-Za-z_]*)
+        |(?P<name>[$%][A-Za-z_][0-9A-Za-z_]*(?:%[A-Za-z_][0-9A-Za-z_]*)*)
+        |(?P<string>"(?:[^"\\]|\\.)*")
+        |(?P<char>'(?:[^'\\]|\\.)*')
+        |(?P<number>[-+]?\.?[0-9][0-9A-Za-z_.]*(?:[eE][-+][0-9_]+)?)
+        |(?P<punctuation>[{}()\[\],=])
+        """, re.VERBOSE | re.DOTALL)
+    vector_data_end = re.compile(rb"}\s*}")
+    escape_sequence = re.compile(r"\\(?:x[0-9A-Fa-f]{2}|u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{6}|.)", re.DOTALL)
+    escapes = {"\"": "\"", "'": "'", "?": "?", "\\": "\\", "a": "\a", "b": "\b", "f": "\f", "n": "\n", "r": "\r",
+               "t": "\t", "v": "\v"}
+
+    def __init__(self):
+        self.text = B""
+        self.pos = 0
+        self.global_names = {}
+        self.local_names = {}
+        self.parents = {}
+        self.unresolved_properties = []
+        self.unresolved_primitives = []
+
+    def read(self, filename):
+        file = open(filename, "rb")
+        text = file.read()
+        file.close()
+
+        return self.parse(text)
+
+    def parse(self, text):
+        """
+        Parse a document from its text representation.
+        :param text: bytes or str containing the document
+        :return: the parsed DdlDocument
+        """
+        self.text = text if isinstance(text, bytes) else bytes(text, "UTF-8")
+        self.pos = 0
+        self.global_names = {}
+        self.local_names = {}
+        self.parents = {}
+        self.unresolved_properties = []
+        self.unresolved_primitives = []
+
+        document = DdlDocument()
+        while True:
+            self.skip_whitespace()
+            if self.pos >= len(self.text):
+                break
+            document.structures.append(self.read_structure(None))
+
+        self.resolve_references()
+        return document
+
+    def error(self, message, pos=None):
+        """
+        :param message: description of the error
+        :param pos: position in the text the error occurred at, the current position if None
+        :return: a ValueError for the given message including the line number
+        """
+        line = self.text.count(B"\n", 0, self.pos if pos is None else pos) + 1
+        return ValueError("{} at line {}.".format(message, line))
+
+    def skip_whitespace(self):
+        self.pos = self.whitespace.match(self.text, self.pos).end()
+
+    def next_token(self):
+        """
+        Read the next token, skipping preceding whitespace and comments.
+        :return: tuple of the kind of token and its bytes
+        """
+        self.skip_whitespace()
+        match = self.token.match(self.text, self.pos)
+        if match is None:
+            if self.pos >= len(self.text):
+                raise self.error("Unexpected end of document")
+            raise self.error("Unexpected character \"{}\"".format(chr(self.text[self.pos])))
+        self.pos = match.end()
+        return match.lastgroup, match.group()
+
+    def peek_token(self):
+        """
+        :return: the next token like `next_token`, without consuming it
+        """
+        pos = self.pos
+        token = self.next_token()
+        self.pos = pos
+        return token
+
+    def expect(self, punctuation):
+        kind, value = self.next_token()
+        if value != punctuation:
+            raise self.error("Expected \"{}\" but found \"{}\"".format(punctuation.decode(), value.decode()))
+
+    def read_header_comment(self, structure):
+        match = self.header_comment.match(self.text, self.pos)
+        if match is not None:
+            DdlTextWriter.set_comment(structure, match.group(1).rstrip())
+            self.pos = match.end()
+
+    def add_name(self, obj, name, scope):
+        """
+        Register the name of a structure for reference resolution.
+        :param obj: named structure or primitive
+        :param name: name including its `$` or `%` prefix
+        :param scope: structure containing the named structure, None at top level
+        """
+        if name.startswith(B"$"):
+            if name[1:] in self.global_names:
+                raise self.error("Duplicate global name \"{}\"".format(name.decode()))
+            self.global_names[name[1:]] = obj
+        else:
+            self.local_names.setdefault(id(scope), {})[name[1:]] = obj
+
+    def read_structure(self, scope):
+        """
+        Read a structure or primitive structure.
+        :param scope: the structure containing the structure to read, None at top level
+        :return: the read DdlStructure or DdlPrimitive
+        """
+        kind, identifier = self.next_token()
+        if kind != "identifier":
+            raise self.error("Expected structure identifier but found \"{}\"".format(identifier.decode()))
+
+        data_type = self.data_types.get(identifier)
+        if data_type is not None:
+            return self.read_primitive(data_type, scope)
+
+        structure = DdlStructure(identifier, None, [], OrderedDict())
+        self.parents[id(structure)] = scope
+
+        kind, value = self.peek_token()
+        if kind == "name":
+            self.next_token()
+            if B"%" in value[1:]:
+                raise self.error("Invalid structure name \"{}\"".format(value.decode()))
+            structure.name = value[1:]
+            structure.name_is_global = value.startswith(B"$")
+            self.add_name(structure, value, scope)
+            kind, value = self.peek_token()
+
+        if value == B"(":
+            self.next_token()
+            self.read_properties(structure)
+
+        self.read_header_comment(structure)
+        self.expect(B"{")
+
+        while True:
+            kind, value = self.peek_token()
+            if value == B"}":
+                self.next_token()
+                break
+            structure.children.append(self.read_structure(structure))
+
+        return structure
+
+    def read_properties(self, structure):
+        """
+        Read the property list of a structure up to and including the closing parenthesis.
+        :param structure: structure to add the properties to
+        """
+        kind, value = self.next_token()
+        if value == B")":
+            return
+
+        while True:
+            if kind != "identifier":
+                raise self.error("Expected property key but found \"{}\"".format(value.decode()))
+            key = value
+
+            kind, value = self.next_token()
+            if value == B"=":
+                kind, value = self.next_token()
+                if kind == "name" or value == B"null":
+                    structure.properties[key] = None
+                    if kind == "name":
+                        self.unresolved_properties.append((structure, key, value, structure))
+                elif kind == "string":
+                    structure.properties[key] = self.read_string(value)
+                elif kind == "number" or kind == "char":
+                    structure.properties[key] = self.number_literal(value, None)
+                elif value == B"true" or value == B"false":
+                    structure.properties[key] = value == B"true"
+                elif value in self.data_types:
+                    structure.properties[key] = self.data_types[value]
+                else:
+                    raise self.error("Invalid value \"{}\" for property \"{}\"".format(value.decode(), key.decode()))
+                kind, value = self.next_token()
+            else:
+                # properties without value are boolean flags
+                structure.properties[key] = True
+
+            if value == B")":
+                return
+            if value != B",":
+                raise self.error("Expected \",\" or \")\" but found \"{}\"".format(value.decode()))
+            kind, value = self.next_token()
 
-# Space reserved for a specification based OpenDdlBinaryWriter ;)
-# Hope there will be some specification for it some day.
+    def read_primitive(self, data_type, scope):
+        """
+        Read a primitive structure after its data type identifier.
+        :param data_type: the data type of the primitive structure
+        :param scope: the structure containing the primitive structure, None at top level
+        :return: the read DdlPrimitive
+        """
+        vector_size = 0
+        name = None
+
+        kind, value = self.peek_token()
+        if value == B"[":
+            self.next_token()
+            kind, value = self.next_token()
+            if kind != "number" or not value.isdigit():
+                raise self.error("Invalid vector size \"{}\"".format(value.decode()))
+            vector_size = int(value)
+            self.expect(B"]")
+            kind, value = self.peek_token()
+
+        if kind == "name":
+            self.next_token()
+            if B"%" in value[1:]:
+                raise self.error("Invalid structure name \"{}\"".format(value.decode()))
+            name = value
+
+        primitive = DdlPrimitive(data_type, [], None if name is None else name[1:], vector_size)
+        if name is not None:
+            self.add_name(primitive, name, scope)
+
+        self.read_header_comment(primitive)
+        self.expect(B"{")
+
+        if data_type in self.array_type_codes:
+            primitive.data = self.read_numeric_data(primitive)
+        else:
+            primitive.data = self.read_data_list(primitive)
+            if data_type == DdlPrimitiveDataType.ref:
+                self.unresolved_primitives.append((primitive, scope))
+
+        return primitive
+
+    def read_numeric_data(self, primitive):
+        """
+        Read the data of a numeric primitive structure after its opening brace. The data is decoded in bulk, only
+        data containing comments or character literals falls back to reading literal by literal.
+        :param primitive: the primitive structure to read the data of
+        :return: array of the values, or of the vector components if the primitive has a vector size
+        """
+        start = self.pos
+        if primitive.vector_size == 0:
+            end = self.text.find(B"}", start)
+        else:
+            match = self.vector_data_end.search(self.text, start)
+            end = -1 if match is None else match.start() + 1
+
+        if end == -1:
+            raise self.error("Unterminated primitive data")
+
+        region = self.text[start:end]
+        if B"/" in region or B"'" in region or (primitive.vector_size == 0 and B"{" in region):
+            # comments and character literals need to be tokenized
+            return self.read_data_list(primitive)
+
+        type_code = self.array_type_codes[primitive.data_type]
+        if len(region) == 0 or region.isspace():
+            values = array(type_code)
+            vector_count = 0
+        else:
+            vector_count = region.count(B"{")
+            tokens = region.translate(None, B"{}").split(B",")
+            try:
+                try:
+                    values = array(type_code, map(float if type_code == "d" else int, tokens))
+                except ValueError:
+                    # hexadecimal, octal, binary or otherwise irregular literals
+                    values = array(type_code, (self.number_literal(token.strip(), primitive.data_type)
+                                               for token in tokens))
+            except OverflowError:
+                raise self.error("Value out of range for {}".format(primitive.data_type.name), start)
+
+        self.pos = end
+        self.expect(B"}")
+
+        if primitive.vector_size != 0 and \
+                (len(values) != vector_count * primitive.vector_size or region.count(B"}") != vector_count):
+            raise self.error("Primitive data does not match its vector size of {}".format(primitive.vector_size), start)
+
+        self.read_line_layout(primitive, region)
+        return values
+
+    @staticmethod
+    def read_line_layout(primitive, region):
+        """
+        Keep the number of elements per line of primitive data which was laid out over multiple lines.
+        :param primitive: the primitive structure the data was read for
+        :param region: the text of the data without its enclosing braces
+        """
+        region = region.strip()
+        line_end = region.find(B"\n")
+        if line_end == -1:
+            return
+
+        line = region[:line_end].rstrip()
+        if primitive.vector_size != 0 and region.count(B"{") > 1:
+            elements = line.count(B"{")
+        else:
+            elements = line.count(B",") + (0 if line.endswith(B",") else 1)
+        DdlTextWriter.set_max_elements_per_line(primitive, elements)
+
+    def read_data_list(self, primitive):
+        """
+        Read the data of a primitive structure after its opening brace literal by literal.
+        :param primitive: the primitive structure to read the data of
+        :return: list of the values or list of tuples if the primitive has a vector size, array of the values or vector
+                 components for numeric data
+        """
+        start = self.pos
+        data = []
+
+        kind, value = self.next_token()
+        while value != B"}":
+            if primitive.vector_size == 0:
+                data.append(self.read_literal(primitive.data_type, kind, value))
+            else:
+                if value != B"{":
+                    raise self.error("Expected \"{{\" but found \"{}\"".format(value.decode()))
+                vector = []
+                for i in range(primitive.vector_size):
+                    if i != 0:
+                        self.expect(B",")
+                    kind, value = self.next_token()
+                    vector.append(self.read_literal(primitive.data_type, kind, value))
+                self.expect(B"}")
+                data.append(tuple(vector))
+
+            kind, value = self.next_token()
+            if value == B",":
+                kind, value = self.next_token()
+            elif value != B"}":
+                raise self.error("Expected \",\" or \"}}\" but found \"{}\"".format(value.decode()))
+
+        if primitive.data_type in self.array_type_codes:
+            self.read_line_layout(primitive, self.text[start:self.pos - 1])
+            if primitive.vector_size != 0:
+                data = itertools.chain.from_iterable(data)
+            try:
+                return array(self.array_type_codes[primitive.data_type], data)
+            except OverflowError:
+                raise self.error("Value out of range for {}".format(primitive.data_type.name), start)
+        return data
+
+    def read_literal(self, data_type, kind, value):
+        """
+        Convert a single data literal token.
+        :param data_type: data type of the primitive structure containing the literal
+        :param kind: kind of the token
+        :param value: bytes of the token
+        :return: the value of the literal, or the name of the referenced structure for references
+        """
+        if data_type == DdlPrimitiveDataType.bool:
+            if value == B"true" or value == B"false":
+                return value == B"true"
+            if value == B"0" or value == B"1":
+                return value == B"1"
+        elif data_type == DdlPrimitiveDataType.string:
+            if kind == "string":
+                return self.read_string(value)
+        elif data_type == DdlPrimitiveDataType.ref:
+            if kind == "name":
+                return value
+            if value == B"null":
+                return None
+        elif data_type == DdlPrimitiveDataType.type:
+            if value in self.data_types:
+                return self.data_types[value]
+        elif kind == "number" or kind == "char":
+            return self.number_literal(value, data_type)
+
+        raise self.error("Invalid {} literal \"{}\"".format(data_type.name, value.decode()))
+
+    def read_string(self, value):
+        """
+        Read a string literal, concatenating directly following string literals.
+        :param value: bytes of the first string literal token including its quotes
+        :return: the unescaped str
+        """
+        parts = [value[1:-1]]
+        while True:
+            kind, next_value = self.peek_token()
+            if kind != "string":
+                break
+            self.next_token()
+            parts.append(next_value[1:-1])
+        return self.unescape(B"".join(parts).decode("UTF-8"))
+
+    def unescape(self, s):
+        try:
+            return self.replace_escape_sequences(s)
+        except ValueError as e:
+            raise self.error(str(e))
+
+    @staticmethod
+    def replace_escape_sequences(s):
+        """
+        :param s: str which may contain OpenDDL escape sequences
+        :return: the str with all escape sequences replaced by the characters they stand for
+        """
+        if "\\" not in s:
+            return s
+
+        def replace(match):
+            sequence = match.group()[1:]
+            if sequence[0] in "xuU" and len(sequence) > 1:
+                return chr(int(sequence[1:], 16))
+            if sequence not in DdlTextReader.escapes:
+                raise ValueError("Invalid escape sequence \"\\{}\"".format(sequence))
+            return DdlTextReader.escapes[sequence]
+
+        return DdlTextReader.escape_sequence.sub(replace, s)
+
+    def number_literal(self, value, data_type):
+        """
+        Convert a numeric or character literal.
+        :param value: bytes of the literal
+        :param data_type: data type the literal is read for, None for property values
+        :return: int or float value of the literal
+        """
+        if value.startswith(B"'"):
+            result = 0
+            for c in bytes(self.unescape(value[1:-1].decode("UTF-8")), "UTF-8"):
+                result = (result << 8) | c
+            return result
+
+        text = value.replace(B"_", B"").lower()
+        negative = text.startswith(B"-")
+        digits = text.lstrip(B"+-")
+        try:
+            if digits[:2] in (B"0x", B"0o", B"0b"):
+                bits = int(digits, 0)
+                if data_type == DdlPrimitiveDataType.half:
+                    result = self.half_bits_to_float(bits)
+                elif data_type in self.float_bit_formats:
+                    int_format, float_format = self.float_bit_formats[data_type]
+                    result = struct.unpack(float_format, struct.pack(int_format, bits))[0]
+                else:
+                    result = bits
+                return -result if negative else result
+
+            if data_type in self.float_bit_formats or data_type == DdlPrimitiveDataType.half or \
+                    (data_type is None and (B"." in digits or B"e" in digits)):
+                return float(text)
+            return int(text)
+        except (ValueError, struct.error):
+            raise self.error("Invalid numeric literal \"{}\"".format(value.decode()))
+
+    @staticmethod
+    def half_bits_to_float(bits):
+        """
+        :param bits: IEEE 754 binary16 bit pattern
+        :return: the float value of the bit pattern
+        """
+        if bits >> 16:
+            raise ValueError("Bit pattern exceeds 16 bits.")
+        sign = -1.0 if bits & 0x8000 else 1.0
+        exponent = (bits >> 10) & 0x1f
+        mantissa = bits & 0x3ff
+        if exponent == 0x1f:
+            return sign * math.inf if mantissa == 0 else math.nan
+        if exponent == 0:
+            return sign * math.ldexp(mantissa, -24)
+        return sign * math.ldexp(mantissa | 0x400, exponent - 25)
+
+    def resolve_name(self, path, scope):
+        """
+        Find the structure referenced by a name or name path like `$node%transform`.
+        :param path: reference as bytes
+        :param scope: structure the reference appears in, None at top level
+        :return: the referenced structure or primitive
+        """
+        names = re.findall(rb"[$%][^$%]+", path)
+        if names[0].startswith(B"$"):
+            result = self.global_names.get(names[0][1:])
+        else:
+            result = None
+            while True:
+                result = self.local_names.get(id(scope), {}).get(names[0][1:])
+                if result is not None or scope is None:
+                    break
+                scope = self.parents[id(scope)]
+
+        for name in names[1:]:
+            if result is None:
+                break
+            result = self.local_names.get(id(result), {}).get(name[1:])
+
+        if result is None:
+            raise ValueError("Unresolved reference \"{}\".".format(path.decode()))
+        return result
+
+    def resolve_references(self):
+        """
+        Replace the names in reference properties and primitive data by the referenced structures.
+        """
+        for structure, key, path, scope in self.unresolved_properties:
+            structure.properties[key] = self.resolve_name(path, scope)
+
+        for primitive, scope in self.unresolved_primitives:
+            if primitive.vector_size == 0:
+                primitive.data = [None if path is None else self.resolve_name(path, scope) for path in primitive.data]
+            else:
+                primitive.data = [tuple(None if path is None else self.resolve_name(path, scope) for path in vector)
+                                  for vector in primitive.data]
@@ -10,6 +10,8 @@ DdlStructure subclasses for structures of OpenGEX for easier use.
 
 
 class Name(DdlStructure):
+    __slots__ = ()
+
     def __init__(self, name):
         super().__init__(B"Name", children=[
             DdlPrimitive(data_type=DataType.string, data=[name])
@@ -17,6 +19,8 @@ class Name(DdlStructure):
 
 
 class Color(DdlStructure):
+    __slots__ = ()
+
     def __init__(self, attrib, value):
         super().__init__(B"Color", props={B"attrib": attrib}, children=[
             DdlPrimitive(data_type=DataType.float, data=[value], vector_size=3)
@@ -24,6 +28,8 @@ class Color(DdlStructure):
 
 
 class Param(DdlStructure):
+    __slots__ = ()
+
     def __init__(self, attrib, value):
         super().__init__(B"Param", props={B"attrib": attrib}, children=[
             DdlPrimitive(data_type=DataType.float, data=[value])
@@ -31,24 +37,29 @@ class Param(DdlStructure):
 
 
 class Track(DdlStructure):
-    def __init__(self, children=[], target=None):
+    __slots__ = ()
+
+    def __init__(self, children=None, target=None):
         props = dict() if target is None else {B"target": target}
-        super().__init__(B"Track", props=props, children=[])
-        self.children.extend(children)
+        super().__init__(B"Track", props=props, children=[] if children is None else children)
 
 
 class Time(DdlStructure):
-    def __init__(self, curve=B"linear", children=[]):
+    __slots__ = ()
+
+    def __init__(self, curve=B"linear", children=None):
         props = dict() if curve == B"linear" else {B"curve": curve}
 
         super().__init__(B"Time", props=props, children=children)
 
 
 class Key(DdlStructure):
-    def __init__(self, kind=None, data=[], vector_size=0):
+    __slots__ = ()
+
+    def __init__(self, kind=None, data=None, vector_size=0):
         props = dict() if kind is None else {B"kind": kind}
 
-        primitive = DdlPrimitive(data_type=DataType.float, data=data, vector_size=vector_size)
+        primitive = DdlPrimitive(data_type=DataType.float, data=[] if data is None else data, vector_size=vector_size)
         if vector_size == 16:
             # special case for matrices which should be displayed one per line
             DdlTextWriter.set_max_elements_per_line(primitive, 1)
@@ -57,13 +68,17 @@ class Key(DdlStructure):
 
 
 class Value(DdlStructure):
-    def __init__(self, curve=B"linear", children=[]):
+    __slots__ = ()
+
+    def __init__(self, curve=B"linear", children=None):
         props = dict() if curve == B"linear" else {B"curve": curve}
 
         super().__init__(B"Value", props=props, children=children)
 
 
 class Metric(DdlStructure):
+    __slots__ = ()
+
     def __init__(self, key, data_type, value):
         super().__init__(B"Metric", props={B"key": key}, children=[
             DdlPrimitive(data_type, data=[value])
@@ -71,8 +86,10 @@ class Metric(DdlStructure):
 
 
 class Translation(DdlStructure):
+    __slots__ = ()
+
     def __init__(self, value, kind=None, name=None, vector_size=0):
-        props = dict if kind is None else {B"kind": kind}
+        props = dict() if kind is None else {B"kind": kind}
         super().__init__(B"Translation", name=name, props=props, children=[
             DdlPrimitive(DataType.float, data=[value], vector_size=vector_size)
         ])
@@ -80,8 +97,10 @@ class Translation(DdlStructure):
 
 
 class Rotation(DdlStructure):
+    __slots__ = ()
+
     def __init__(self, value, kind=None, name=None, vector_size=0):
-        props = dict if kind is None else {B"kind": kind}
+        props = dict() if kind is None else {B"kind": kind}
         super().__init__(B"Rotation", name=name, props=props, children=[
             DdlPrimitive(DataType.float, data=[value], vector_size=vector_size)
         ])
@@ -89,8 +108,10 @@ class Rotation(DdlStructure):
 
 
 class Scale(DdlStructure):
+    __slots__ = ()
+
     def __init__(self, value, kind=None, name=None, vector_size=0):
-        props = dict if kind is None else {B"kind": kind}
+        props = dict() if kind is None else {B"kind": kind}
         super().__init__(B"Scale", name=name, props=props, children=[
             DdlPrimitive(DataType.float, data=[value], vector_size=vector_size)
         ])
@@ -98,6 +119,8 @@ class Scale(DdlStructure):
 
 
 class Transform(DdlStructure):
+    __slots__ = ()
+
     def __init__(self, matrix=None, matrices=None):
         if matrices is None:
             matrices = [] if matrix is None else [matrix]
@@ -111,12 +134,16 @@ class Transform(DdlStructure):
 
 
 class Extension(DdlStructure):
-    def __init__(self, type, applic=B"Blender", children=[]):
+    __slots__ = ()
+
+    def __init__(self, type, applic=B"Blender", children=None):
         super().__init__(B"Extension",
                          props=OrderedDict([(B"applic", applic), (B"type", type)]), children=children)
 
 
 class ObjectRef(DdlStructure):
+    __slots__ = ()
+
     def __init__(self, ref_object):
         if not isinstance(ref_object, DdlStructure):
             raise TypeError("Cannot create a ObjectRef for a non DdlStructure object.")
@@ -127,6 +154,8 @@ class ObjectRef(DdlStructure):
 
 
 class MaterialRef(DdlStructure):
+    __slots__ = ()
+
     def __init__(self, ref_material, index):
         super().__init__(B"MaterialRef", props={B"index": index}, children=[
             DdlPrimitive(DataType.ref, data=[ref_material])
@@ -134,14 +163,21 @@ class MaterialRef(DdlStructure):
 
 
 class Mesh(DdlStructure):
-    def __init__(self, mesh=None, primitive=B"triangles", children=[]):
-        super().__init__(B"Mesh", props={B"primitive": primitive}, children=children)
+    __slots__ = ("mesh",)
+
+    def __init__(self, mesh=None, primitive=B"triangles", lod=None, children=None):
+        props = OrderedDict([(B"primitive", primitive)])
+        if lod is not None:
+            props[B"lod"] = lod
+        super().__init__(B"Mesh", props=props, children=children)
 
         # a reference to a blender mesh to keep it in memory for referring VertexArrays
         self.mesh = mesh
 
 
 class Texture(DdlStructure):
+    __slots__ = ()
+
     def __init__(self, texture_slot, attrib, path):
         super().__init__(B"Texture", props={B"attrib": attrib}, children=[
             DdlPrimitive(DataType.string, data=[path])
@@ -163,7 +199,9 @@ class Texture(DdlStructure):
 
 
 class Material(DdlStructure):
-    def __init__(self, material, name, export_ambient=False, textures=[]):
+    __slots__ = ()
+
+    def __init__(self, material, name, export_ambient=False, textures=()):
         if material is None:
             raise ValueError("material cannot be None")
 
@@ -215,6 +253,8 @@ class Material(DdlStructure):
 
 
 class LightObject(DdlStructure):
+    __slots__ = ()
+
     def __init__(self, name, light):
         is_point = False
         is_spot = False
@@ -285,6 +325,8 @@ class LightObject(DdlStructure):
 
 
 class CameraObject(DdlStructure):
+    __slots__ = ()
+
     def __init__(self, name, camera):
         super().__init__(B"CameraObject", name=name, children=[
             Param(B"fov", camera.angle_x),
@@ -294,7 +336,9 @@ class CameraObject(DdlStructure):
 
 
 class Node(DdlStructure):
-    def __init__(self, identifier, obj, name, props=dict(), children=[], use_custom_properties=False):
+    __slots__ = ()
+
+    def __init__(self, identifier, obj, name, props=None, children=(), use_custom_properties=False):
         super().__init__(identifier, name=name, props=props, children=[])
 
         if obj.name != "":
@@ -334,26 +378,54 @@ class Node(DdlStructure):
         return properties
 
 
+def index_data_type(count):
+    """
+    :param count: number of elements to index
+    :return: the smallest unsigned integer data type which can hold all indices
+    """
+    if count <= 0x100:
+        return DataType.unsigned_int8
+    elif count <= 0x10000:
+        return DataType.unsigned_int16
+    return DataType.unsigned_int32
+
+
+def to_unorm8(values):
+    """
+    :param values: per vertex data with components from 0.0 to 1.0, a NumPy array or a list of tuples
+    :return: the values clamped to 0.0 to 1.0 as rounded integers from 0 to 255
+    """
+    if hasattr(values, "dtype"):
+        return (values.clip(0.0, 1.0) * 255.0 + 0.5).astype("u1")
+    return [tuple(int(min(max(c, 0.0), 1.0) * 255.0 + 0.5) for c in value) for value in values]
+
+
 class VertexArray(DdlStructure):
-    def __init__(self, attrib, data, vertex_count, vector_size=3, morph=None):
+    __slots__ = ()
+
+    def __init__(self, attrib, data, vertex_count, vector_size=3, morph=None, data_type=DataType.float):
         props = OrderedDict([(B"attrib", attrib)])
         if morph is not None:
             props[B"morph"] = morph
 
         super().__init__(B"VertexArray", props=props, children=[
             DdlTextWriter.set_max_elements_per_line(
-                DdlTextWriter.set_comment(DdlPrimitive(DataType.float, data=data, vector_size=vector_size),
+                DdlTextWriter.set_comment(DdlPrimitive(data_type, data=data, vector_size=vector_size),
                                           comment=str(vertex_count)),
                 elements=8)
         ])
 
 
 class GeometryObject(DdlStructure):
+    __slots__ = ()
+
     def __init__(self, name):
         super().__init__(B"GeometryObject", name=name, children=[])
 
 
 class GeometryNode(Node):
+    __slots__ = ()
+
     def __init__(self, mesh, name, geometry, materials, use_custom_properties=False):
         props = {B"visible": False} if mesh.hide_render else dict()
         super().__init__(B"GeometryNode", mesh, name, props=props, children=[],
@@ -0,0 +1,89 @@
+import itertools
+import unittest
+
+from io_scene_ogex.AnimationSampler import AnimationSampler
+from io_scene_ogex.pyddl import DdlTextReader, DdlTextWriter
+from io_scene_ogex.pygex import Key
+
+__author__ = 'Jonathan Hale'
+
+
+class Scene:
+    """
+    Scene with a value animated over frames 1 to 4 and a counter of the frames set.
+    """
+
+    def __init__(self):
+        self.frame_current = 3
+        self.frame_subframe = 0.5
+        self.frames_set = 0
+
+    def frame_set(self, frame, subframe=0.0):
+        self.frame_current = frame
+        self.frame_subframe = subframe
+        self.frames_set += 1
+
+    def value(self):
+        return min(self.frame_current, 3) * 2.0
+
+
+# Test sampling several animations in one pass over the timeline
+class AnimationSamplerTest(unittest.TestCase):
+
+    def testSample(self):
+        scene = Scene()
+        sampler = AnimationSampler(1, 4)
+        removed = []
+
+        keys = [Key() for _ in range(3)]
+        sampler.request(keys[0], scene.value)
+        sampler.request(keys[1], scene.value, changed=lambda: scene.value() != 6.0,
+                        static=lambda: removed.append(1))
+        # only changes at the last frame, which is not checked
+        sampler.request(keys[2], lambda: float(scene.frame_current == 4), changed=lambda: scene.frame_current == 4,
+                        static=lambda: removed.append(2))
+
+        sampler.sample(scene)
+
+        # every frame is set once and the current frame is restored
+        self.assertEqual(scene.frames_set, 5)
+        self.assertEqual((scene.frame_current, scene.frame_subframe), (3, 0.5))
+
+        self.assertEqual(keys[0].children[0].data, [2.0, 4.0, 6.0, 6.0])
+        self.assertEqual(keys[1].children[0].data, [2.0, 4.0, 6.0, 6.0])
+        self.assertEqual(keys[2].children[0].data, [])
+        self.assertEqual(removed, [2])
+
+        # requests are only sampled once
+        sampler.sample(scene)
+        self.assertEqual(scene.frames_set, 5)
+
+    def testSampleMatrices(self):
+        scene = Scene()
+        sampler = AnimationSampler(1, 4)
+
+        def matrix():
+            # row-iterable like a mathutils.Matrix, with the translation in the last column
+            return [[1.0, 0.0, 0.0, scene.value()], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0], [0.0, 0.0, 0.0, 1.0]]
+
+        # the rows of a matrix are no vectors of 16 elements and cannot be written
+        key = Key(vector_size=16)
+        key.children[0].data = [matrix()]
+        with self.assertRaises(ValueError):
+            DdlTextWriter(None).structure_as_text(key)
+
+        key = Key(vector_size=16)
+        sampler.request(key, lambda: tuple(itertools.chain(*zip(*matrix()))))
+        sampler.sample(scene)
+
+        # one matrix per frame in column-major order, with the translation in the last four elements
+        text = DdlTextWriter(None).structure_as_text(key)
+        values = DdlTextReader().parse(text).structures[0].children[0].flat_values()
+        self.assertEqual(len(values), 4 * 16)
+        for i, translation in enumerate([2.0, 4.0, 6.0, 6.0]):
+            self.assertEqual(values[i * 16:(i + 1) * 16], (1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0,
+                                                          translation, 0.0, 0.0, 1.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
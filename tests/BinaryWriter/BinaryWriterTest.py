@@ -0,0 +1,124 @@
+import os
+import struct
+import unittest
+
+from io_scene_ogex.pyddl import *
+
+__author__ = 'Jonathan Hale'
+
+
+# Test decoding documents written by DdlBinaryWriter
+class BinaryWriterTest(unittest.TestCase):
+
+    filename = os.path.dirname(os.path.realpath(__file__)) + os.sep + "Test.oddb"
+
+    def tearDown(self):
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+    def readStrings(self, contents):
+        string_table_offset = struct.unpack_from("<Q", contents, len(contents) - 32)[0]
+
+        count = struct.unpack_from("<I", contents, string_table_offset)[0]
+        offset = string_table_offset + 4
+        strings = []
+        for _ in range(count):
+            length = struct.unpack_from("<I", contents, offset)[0]
+            strings.append(contents[offset + 4:offset + 4 + length])
+            offset += 4 + length
+
+        return strings
+
+    def readStructure(self, contents, offset, strings):
+        self.assertEqual(contents[offset], 0)
+        identifier, name, flags, property_count = struct.unpack_from("<IiBI", contents, offset + 1)
+        offset += 14
+
+        properties = {}
+        for _ in range(property_count):
+            key, value_type = struct.unpack_from("<IB", contents, offset)
+            self.assertEqual(value_type, 3)
+            properties[strings[key]] = strings[struct.unpack_from("<I", contents, offset + 5)[0]]
+            offset += 9
+
+        child_count = struct.unpack_from("<I", contents, offset)[0]
+        offset += 4
+
+        children = []
+        for _ in range(child_count):
+            if contents[offset] == 0:
+                child, offset = self.readStructure(contents, offset, strings)
+            else:
+                data_type, primitive_name, vector_size, count, size = struct.unpack_from("<BiIQQ", contents,
+                                                                                         offset + 1)
+                self.assertEqual(data_type, DdlPrimitiveDataType.string.value)
+                offset += 26
+                offset += -offset % 8
+
+                values = []
+                end = offset + size
+                while offset < end:
+                    length = struct.unpack_from("<I", contents, offset)[0]
+                    values.append(contents[offset + 4:offset + 4 + length])
+                    offset += 4 + length
+                self.assertEqual(len(values), count)
+
+                child = (None if primitive_name == -1 else strings[primitive_name], values)
+            children.append(child)
+
+        return (strings[identifier], None if name == -1 else strings[name], properties, children), offset
+
+    def testStrings(self):
+        document = DdlDocument()
+        for i in range(20):
+            structure = document.add_structure(B"Node", B"node" + bytes(str(i), "UTF-8"), None,
+                                               {B"key" + bytes(str(i % 3), "UTF-8"): "value" + str(i)})
+            structure.add_structure(B"Name").children.append(
+                DdlPrimitive(DdlPrimitiveDataType.string, ["Name", "name" + str(i)], B"names"))
+
+        DdlBinaryWriter(document).write(self.filename)
+        with open(self.filename, "rb") as file:
+            contents = file.read()
+
+        strings = self.readStrings(contents)
+
+        # the string table contains identifiers, names, property keys and string property values in the order they
+        # were written first, string primitive data is stored inline
+        expected = []
+        for i in range(20):
+            index = bytes(str(i), "UTF-8")
+            for s in [B"Node", B"node" + index, B"key" + bytes(str(i % 3), "UTF-8"), B"value" + index, B"Name",
+                      B"names"]:
+                if s not in expected:
+                    expected.append(s)
+        self.assertEqual(strings, expected)
+
+        offset = 12
+        for i in range(20):
+            index = bytes(str(i), "UTF-8")
+            properties = {B"key" + bytes(str(i % 3), "UTF-8"): B"value" + index}
+            structure, offset = self.readStructure(contents, offset, strings)
+            self.assertEqual(structure, (B"Node", B"node" + index, properties,
+                                         [(B"Name", None, {}, [(B"names", [B"Name", B"name" + index])])]))
+
+    def testEscapedStrings(self):
+        # preformatted strings are written with their values, like the text form reads back
+        escaped = B"\"say \\\"hi\\\"\\\\n\\t\\x41\""
+        value = DdlTextReader().parse(B"Name {string {" + escaped + B"}}").structures[0].children[0].data[0]
+        self.assertEqual(value, "say \"hi\"\\n\tA")
+
+        document = DdlDocument()
+        document.add_structure(B"Name", None, None, {B"key": escaped}).children.append(
+            DdlPrimitive(DdlPrimitiveDataType.string, [escaped]))
+
+        DdlBinaryWriter(document).write(self.filename)
+        with open(self.filename, "rb") as file:
+            contents = file.read()
+
+        strings = self.readStrings(contents)
+        structure, _ = self.readStructure(contents, 12, strings)
+        self.assertEqual(structure, (B"Name", None, {B"key": bytes(value, "UTF-8")}, [(None, [bytes(value, "UTF-8")])]))
+
+
+if __name__ == '__main__':
+    unittest.main()
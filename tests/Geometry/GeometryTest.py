@@ -1,5 +1,6 @@
 import bpy
 import os
+import tempfile
 import unittest
 
 from tests import TestUtils
@@ -20,5 +21,161 @@ class GeometryTest(TestUtils.OgexExporterTest):
 
         self.assertFilesEqual(self.filename, self.base_dir + os.sep + "Expected.ogex")
 
+    def testGeometryExportBulk(self):
+        bpy.ops.wm.open_mainfile(filepath=self.base_dir + os.sep + "Test.blend")
+        bpy.ops.export_scene.ogex(filepath=self.filename, rounding=3, bulk_mesh_extraction=True)
+
+        self.assertFilesEqual(self.filename, self.base_dir + os.sep + "Expected.ogex")
+
+    def testGeometryExportParallel(self):
+        bpy.ops.wm.open_mainfile(filepath=self.base_dir + os.sep + "Test.blend")
+        bpy.ops.export_scene.ogex(filepath=self.filename, rounding=3, bulk_mesh_extraction=True,
+                                  geometry_processes=4)
+
+        self.assertFilesEqual(self.filename, self.base_dir + os.sep + "Expected.ogex")
+
+    def testGeometryExportCached(self):
+        bpy.ops.wm.open_mainfile(filepath=self.base_dir + os.sep + "Test.blend")
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # first export fills the cache, second export uses the cached meshes
+            for _ in range(2):
+                bpy.ops.export_scene.ogex(filepath=self.filename, rounding=3, bulk_mesh_extraction=True,
+                                          geometry_cache_path=cache_dir)
+
+                self.assertFilesEqual(self.filename, self.base_dir + os.sep + "Expected.ogex")
+
+    def testGeometryExportSpoolMeshText(self):
+        bpy.ops.wm.open_mainfile(filepath=self.base_dir + os.sep + "Test.blend")
+
+        for processes in [1, 4]:
+            bpy.ops.export_scene.ogex(filepath=self.filename, rounding=3, spool_mesh_text=True,
+                                      bulk_mesh_extraction=True, geometry_processes=processes)
+
+            self.assertFilesEqual(self.filename, self.base_dir + os.sep + "Expected.ogex")
+
+        bpy.ops.export_scene.ogex(filepath=self.filename, rounding=3, spool_mesh_text=True)
+
+        self.assertFilesEqual(self.filename, self.base_dir + os.sep + "Expected.ogex")
+
+    def testGeometryExportLod(self):
+        bpy.ops.wm.open_mainfile(filepath=self.base_dir + os.sep + "Test.blend")
+        bpy.ops.export_scene.ogex(filepath=self.filename, rounding=3, lod_ratios="0.5, 0.25")
+
+        with open(self.filename, "rb") as file:
+            text = file.read()
+
+        # one Mesh per level of detail for every GeometryObject
+        self.assertEqual(text.count(B"Mesh (primitive = \"triangles\", lod = 1)"), text.count(B"GeometryObject"))
+        self.assertEqual(text.count(B"Mesh (primitive = \"triangles\", lod = 2)"), text.count(B"GeometryObject"))
+
+    def testGeometryExportBounds(self):
+        bpy.ops.wm.open_mainfile(filepath=self.base_dir + os.sep + "Test.blend")
+        bpy.ops.export_scene.ogex(filepath=self.filename, rounding=3, export_bounds=True, export_node_bounds=True)
+
+        with open(self.filename, "rb") as file:
+            text = file.read()
+
+        self.assertEqual(text.count(B"type = \"BoundingBox\""), text.count(B"GeometryObject"))
+        self.assertEqual(text.count(B"type = \"BoundingSphere\""), text.count(B"GeometryObject"))
+        self.assertEqual(text.count(B"type = \"WorldBoundingBox\""), text.count(B"GeometryNode"))
+
+    def testGeometryExportDeduplicated(self):
+        bpy.ops.wm.open_mainfile(filepath=self.base_dir + os.sep + "Test.blend")
+
+        # without duplicates, nothing is merged or renamed
+        bpy.ops.export_scene.ogex(filepath=self.filename, rounding=3, deduplicate_geometry=True)
+        self.assertFilesEqual(self.filename, self.base_dir + os.sep + "Expected.ogex")
+
+        # copy of the object with a copy of its mesh datablock
+        original = bpy.data.objects["Suzanne"]
+        copy = original.copy()
+        copy.data = original.data.copy()
+        bpy.context.scene.objects.link(copy)
+
+        bpy.ops.export_scene.ogex(filepath=self.filename, rounding=3, deduplicate_geometry=True)
+
+        with open(self.filename, "rb") as file:
+            text = file.read()
+
+        self.assertEqual(text.count(B"GeometryNode"), 2)
+        self.assertEqual(text.count(B"GeometryObject"), 1)
+        self.assertEqual(text.count(B"ref {$geometry1}"), 2)
+
+        # both nodes are listed in the comment of the GeometryObject
+        comment = text[text.index(B"GeometryObject $geometry1"):].split(B"\n")[0].split(B"// ")[1]
+        self.assertEqual(sorted(comment.split(B", ")), [B"Suzanne", bytes(copy.name, "UTF-8")])
+
+    def testGeometryExportSplit(self):
+        bpy.ops.wm.open_mainfile(filepath=self.base_dir + os.sep + "Test.blend")
+        bpy.ops.export_scene.ogex(filepath=self.filename, rounding=3, split_meshes=True, max_chunk_vertices=200)
+
+        with open(self.filename, "rb") as file:
+            text = file.read()
+
+        # every chunk has its own GeometryObject, referenced by a subnode
+        chunks = text.count(B"GeometryObject $geometry1")
+        self.assertGreater(chunks, 1)
+        self.assertEqual(text.count(B"GeometryNode"), chunks)
+        for i in range(2, chunks + 1):
+            self.assertIn(B"ref {$geometry1_" + bytes(str(i), "UTF-8") + B"}", text)
+
+        # the index arrays of all chunks use 16 bit indices
+        self.assertEqual(text.count(B"unsigned_int16"), text.count(B"IndexArray"))
+
+    def testGeometryExportMorph(self):
+        bpy.ops.wm.open_mainfile(filepath=self.base_dir + os.sep + "Test.blend")
+
+        suzanne = bpy.data.objects["Suzanne"]
+        suzanne.shape_key_add(name="Basis")
+        suzanne.shape_key_add(name="Raised").data[0].co.z += 1.0
+        values = [block.value for block in suzanne.data.shape_keys.key_blocks]
+
+        for sparse in [False, True]:
+            bpy.ops.export_scene.ogex(filepath=self.filename, rounding=3, sparse_morph_targets=sparse)
+
+            with open(self.filename, "rb") as file:
+                text = file.read()
+
+            self.assertIn(B"Morph (index = 1, base = 0)", text)
+            self.assertIn(B"{\"Raised\"}", text)
+            self.assertIn(B"MorphWeight (index = 1)", text)
+            self.assertEqual(text.count(B"morph = 1"), 0 if sparse else 2)
+            self.assertEqual(text.count(B"type = \"SparseMorph\""), 1 if sparse else 0)
+
+        # the shape key values are restored after exporting
+        self.assertEqual([block.value for block in suzanne.data.shape_keys.key_blocks], values)
+
+    def testGeometryExportSkin(self):
+        bpy.ops.wm.open_mainfile(filepath=self.base_dir + os.sep + "Test.blend")
+
+        armature = bpy.data.objects.new("Armature", bpy.data.armatures.new("Armature"))
+        bpy.context.scene.objects.link(armature)
+        bpy.context.scene.objects.active = armature
+        bpy.ops.object.mode_set(mode='EDIT')
+        armature.data.edit_bones.new("Bone").tail = (0.0, 0.0, 1.0)
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+        suzanne = bpy.data.objects["Suzanne"]
+        suzanne.vertex_groups.new("Bone").add(range(len(suzanne.data.vertices)), 1.0, 'REPLACE')
+        suzanne.modifiers.new("Armature", 'ARMATURE').object = armature
+
+        bpy.ops.export_scene.ogex(filepath=self.filename, rounding=3, max_bone_influences=4)
+
+        with open(self.filename, "rb") as file:
+            text = file.read()
+
+        self.assertEqual(text.count(B"BoneNode"), 1)
+        for identifier in [B"Skin", B"Skeleton", B"BoneRefArray", B"BoneCountArray", B"BoneIndexArray",
+                           B"BoneWeightArray"]:
+            self.assertIn(B"\t" + identifier + B"\n", text)
+
+        # the vertex and skin arrays are spooled, the bone references are resolved after all nodes are exported
+        bpy.ops.export_scene.ogex(filepath=self.filename, rounding=3, max_bone_influences=4, spool_mesh_text=True)
+
+        with open(self.filename, "rb") as file:
+            self.assertEqual(file.read(), text)
+
+
 if __name__ == '__main__':
     unittest.main()
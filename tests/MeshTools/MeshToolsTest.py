@@ -0,0 +1,298 @@
+import math
+import unittest
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import numpy
+
+from io_scene_ogex import meshtools
+from io_scene_ogex.pyddl import DdlPrimitive, DdlPrimitiveDataType, DdlStructure
+
+__author__ = 'Jonathan Hale'
+
+
+# Test welding and index generation of the numpy mesh extraction
+class MeshToolsTest(unittest.TestCase):
+
+    def quad(self, smooth):
+        """
+        Mesh data of a quad made of two triangles, as read by meshtools.read_mesh().
+        Vertex 2 has no faces, the second triangle uses material 1.
+        """
+        face_normals = [[0.0, 0.0, 1.0]] * 3 + [[0.0, -0.0, 1.0]] * 3
+        return {
+            "position": numpy.array([[0, 0, 0], [1, 0, 0], [5, 5, 5], [1, 1, 0], [0, 1, 0]], numpy.float32),
+            "loop_vertex": numpy.array([0, 1, 3, 0, 3, 4], numpy.int32),
+            "normal": numpy.array(face_normals if smooth else face_normals[:3] + [[0, 1, 0]] * 3, numpy.float32),
+            "texcoord": OrderedDict([("UVMap", numpy.array([[0, 0], [1, 0], [1, 1], [0, 0], [1, 1], [0, 1]],
+                                                           numpy.float32))]),
+            "triangles": numpy.arange(6, dtype=numpy.int32).reshape(-1, 3),
+            "material": numpy.array([0, 1], numpy.int32)}
+
+    def testWeldShared(self):
+        data = meshtools.per_vertex_data(self.quad(smooth=True), num_materials=2)
+
+        self.assertEqual(data["position"].tolist(), [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]])
+        self.assertEqual(data["texcoord"]["UVMap"].tolist(), [[0, 0], [1, 0], [1, 1], [0, 1]])
+        self.assertEqual([tris.tolist() for tris in data["tris"]], [[[0, 1, 2]], [[0, 2, 3]]])
+
+    def testWeldSplit(self):
+        data = meshtools.per_vertex_data(self.quad(smooth=False), num_materials=1)
+
+        # vertices keep their index for the first normal, the second normal creates new ones
+        self.assertEqual(data["position"].tolist(), [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0], [0, 0, 0],
+                                                     [1, 1, 0]])
+        self.assertEqual(data["normal"].tolist(), [[0, 0, 1]] * 3 + [[0, 1, 0]] * 3)
+        self.assertEqual([tris.tolist() for tris in data["tris"]], [[[0, 1, 2], [4, 5, 3]]])
+
+    def testWeldOrder(self):
+        indices, sources = meshtools.weld([2, 0, 2, 1, 0], numpy.array([[1], [0], [0], [0], [0]], numpy.float32))
+
+        self.assertEqual(indices.tolist(), [2, 0, 3, 1, 0])
+        self.assertEqual(sources.tolist(), [1, 3, 0, 2])
+
+    def testWeldTolerance(self):
+        data = self.quad(smooth=True)
+        data["normal"][3:] += 1e-5
+        data["texcoord"]["UVMap"][3] += 1e-5
+
+        self.assertEqual(meshtools.exact_vertex_count(data), 6)
+        self.assertEqual(len(meshtools.per_vertex_data(data)["position"]), 6)
+
+        welded = meshtools.per_vertex_data(data, epsilons={"normal": 1e-3, "texcoord": 1e-3})
+        self.assertEqual(welded["position"].tolist(), [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]])
+        self.assertEqual(welded["texcoord"]["UVMap"].tolist(), [[0, 0], [1, 0], [1, 1], [0, 1]])
+
+        # vertex 1 moves next to vertex 3, which is merged into it, and the first triangle collapses
+        data["position"][1] = [1, 1, 2 ** -13]
+        welded = meshtools.per_vertex_data(data, epsilons={"position": 1e-3, "normal": 1e-3, "texcoord": 1e-3})
+        self.assertEqual(welded["position"].tolist(), [[0, 0, 0], [1, 1, 2 ** -13], [0, 1, 0]])
+        self.assertEqual([tris.tolist() for tris in welded["tris"]], [[[0, 1, 2]]])
+
+    def testMorphTargets(self):
+        data = self.quad(smooth=True)
+        target = data["position"] + [[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 1], [0, 0, 0]]
+        data["morph_position"] = (target - data["position"])[:, numpy.newaxis]
+
+        # both triangles are flat, their normals are equal for the base but not for the morph target
+        smooth = [False, False]
+        data["morph_normal"] = (meshtools.split_normals(target, data["loop_vertex"], data["triangles"], smooth) -
+                                meshtools.split_normals(data["position"], data["loop_vertex"], data["triangles"],
+                                                        smooth))[:, numpy.newaxis]
+
+        export_mesh = meshtools.per_vertex_data(data)
+
+        # both vertices created from vertex 3 are moved
+        positions, normals = meshtools.morph_target(export_mesh, 0)
+        self.assertEqual(positions.tolist(), [[0, 0, 0], [1, 0, 0], [1, 1, 1], [0, 1, 0], [0, 0, 0], [1, 1, 1]])
+        # the normals of flat triangles are the normals of their faces
+        numpy.testing.assert_allclose(normals, numpy.array([[0, -1, 1]] * 3 + [[-1, 0, 1]] * 3) / math.sqrt(2),
+                                      atol=1e-6)
+
+        indices, offsets, _ = meshtools.displaced_vertices(export_mesh, 0)
+        offsets = dict(zip(indices.tolist(), offsets.tolist()))
+        self.assertEqual(offsets.pop(2), [0, 0, 1])
+        self.assertEqual(offsets.pop(5), [0, 0, 1])
+        # other vertices are only included for their changed normals
+        self.assertTrue(all(offset == [0, 0, 0] for offset in offsets.values()))
+
+        # smooth triangles share their vertices and use the vertex normals of the morph target
+        smooth = [True, True]
+        data["morph_normal"] = (meshtools.split_normals(target, data["loop_vertex"], data["triangles"], smooth) -
+                                meshtools.split_normals(data["position"], data["loop_vertex"], data["triangles"],
+                                                        smooth))[:, numpy.newaxis]
+
+        positions, normals = meshtools.morph_target(meshtools.per_vertex_data(data), 0)
+        self.assertEqual(positions.tolist(), [[0, 0, 0], [1, 0, 0], [1, 1, 1], [0, 1, 0]])
+        expected = meshtools.vertex_normals(target, data["loop_vertex"][data["triangles"]])[[0, 1, 3, 4]]
+        numpy.testing.assert_allclose(normals, expected, atol=1e-6)
+
+    def testLimitInfluences(self):
+        # vertex 0 has three influences, vertex 1 one without bone, vertex 2 none and vertex 3 one with zero weight
+        influences = meshtools.limit_influences(4, vertices=[0, 0, 0, 1, 1, 3, 3], bones=[5, 2, 7, 1, -1, 3, 4],
+                                                weights=[0.1, 0.5, 0.4, 1.0, 0.3, 0.0, 0.2], max_influences=2)
+
+        self.assertEqual(influences["bone_count"].tolist(), [2, 1, 0, 1])
+        self.assertEqual(influences["bone_index"].tolist(), [[2, 7], [1, 0], [0, 0], [4, 0]])
+        numpy.testing.assert_allclose(influences["bone_weight"], [[5 / 9, 4 / 9], [1, 0], [0, 0], [1, 0]], rtol=1e-6)
+
+        counts, indices, weights = meshtools.skin_arrays(influences)
+        self.assertEqual(counts.tolist(), [2, 1, 0, 1])
+        self.assertEqual(indices.tolist(), [2, 7, 1, 4])
+        numpy.testing.assert_allclose(weights, [5 / 9, 4 / 9, 1, 1], rtol=1e-6)
+
+    def testReadVertexWeights(self):
+        # vertex 0 has two groups, vertex 1 none, vertex 2 one of a group without bone and one of a group of another
+        # object
+        def element(group, weight):
+            return SimpleNamespace(group=group, weight=weight)
+
+        mesh = SimpleNamespace(vertices=[SimpleNamespace(groups=[element(0, 0.25), element(2, 0.75)]),
+                                         SimpleNamespace(groups=[]),
+                                         SimpleNamespace(groups=[element(1, 0.5), element(5, 0.5)])])
+
+        influences = meshtools.read_vertex_weights(mesh, group_bones=[3, -1, 4])
+
+        self.assertEqual(influences["bone_count"].tolist(), [2, 0, 0])
+        self.assertEqual(influences["bone_index"].tolist(), [[4, 3], [0, 0], [0, 0]])
+        numpy.testing.assert_allclose(influences["bone_weight"], [[0.75, 0.25], [0, 0], [0, 0]])
+
+    def testSplitMesh(self):
+        # 16x16 grid of quads, split in two materials
+        size = 16
+        grid = numpy.arange((size + 1) * (size + 1)).reshape(size + 1, size + 1)
+        corners = [grid[:-1, :-1].ravel(), grid[:-1, 1:].ravel(), grid[1:, :-1].ravel(), grid[1:, 1:].ravel()]
+        tris = numpy.concatenate((numpy.stack(corners[:2] + corners[3:], 1),
+                                  numpy.stack(corners[::3] + corners[2:3], 1))).astype(numpy.uint32)
+        positions = numpy.stack((grid.ravel() % (size + 1), grid.ravel() // (size + 1), grid.ravel() * 0), 1)
+        data = {"position": positions, "texcoord": {"uv": positions[:, :2] / size},
+                "tris": [tris[:len(tris) // 2], tris[len(tris) // 2:]]}
+
+        self.assertIs(meshtools.split_mesh(data, len(positions))[0], data)
+
+        chunks = meshtools.split_mesh(data, 100)
+        self.assertGreater(len(chunks), 1)
+
+        triangles = []
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk["position"]), 100)
+            # only used vertices, in order of first use
+            indices = numpy.concatenate(chunk["tris"]).ravel()
+            self.assertEqual(sorted(set(indices.tolist())), list(range(len(chunk["position"]))))
+            numpy.testing.assert_array_equal(chunk["texcoord"]["uv"], chunk["position"][:, :2] / size)
+            triangles.extend(sorted(map(str, chunk["position"][t].tolist())) for t in chunk["tris"][1])
+
+        # all triangles of each material are kept, only vertices on the borders are duplicated
+        self.assertEqual(sorted(triangles), sorted(sorted(map(str, positions[t].tolist())) for t in data["tris"][1]))
+        self.assertLess(sum(len(chunk["position"]) for chunk in chunks), 1.5 * 2 * len(positions))
+
+    def testParallel(self):
+        meshes = [(self.quad(smooth=i % 2 == 0), 1 + i % 3) for i in range(10)]
+        parallel = list(meshtools.process_meshes(meshes, processes=4))
+
+        self.assertEqual(len(parallel), len(meshes))
+        for (data, num_materials), result in zip(meshes, parallel):
+            expected = meshtools.per_vertex_data(data, num_materials)
+            self.assertEqual(result["position"].tolist(), expected["position"].tolist())
+            self.assertEqual([tris.tolist() for tris in result["tris"]], [tris.tolist() for tris in expected["tris"]])
+
+    def testDigest(self):
+        data = self.quad(smooth=True)
+        key = meshtools.digest(data, 1)
+
+        self.assertEqual(key, meshtools.digest(self.quad(smooth=True), 1))
+        self.assertNotEqual(key, meshtools.digest(data, 2))
+        self.assertNotEqual(key, meshtools.digest(data, 1, salt=B"TEXT"))
+
+        data["texcoord"]["UVMap"][0, 0] = 0.5
+        self.assertNotEqual(key, meshtools.digest(data, 1))
+
+    def testStructureDigest(self):
+        def geometry(name):
+            bone_refs = DdlPrimitive(DdlPrimitiveDataType.ref, ["Bone", "Bone.001"])
+            struct = DdlStructure(B"GeometryObject", name, [DdlStructure(B"Skin", None, [
+                DdlStructure(B"BoneRefArray", None, [bone_refs]),
+                DdlStructure(B"BoneWeightArray", None, [DdlPrimitive(DdlPrimitiveDataType.float,
+                                                                     numpy.array([0.25, 0.75], numpy.float32))])])])
+            return struct, bone_refs
+
+        (first, first_refs), (second, second_refs) = geometry(B"geometry1"), geometry(B"geometry2")
+
+        # the name of the structure itself is not hashed
+        self.assertEqual(meshtools.structure_digest(first), meshtools.structure_digest(second))
+
+        # unresolved references to equally named bones of different armatures differ
+        refs = {id(first_refs): B"armature1", id(second_refs): B"armature2"}
+        self.assertNotEqual(meshtools.structure_digest(first, refs=refs), meshtools.structure_digest(second, refs=refs))
+        refs[id(second_refs)] = B"armature1"
+        self.assertEqual(meshtools.structure_digest(first, refs=refs), meshtools.structure_digest(second, refs=refs))
+
+    def testOptimizeVertexCache(self):
+        # 16x16 grid of quads with shuffled triangles
+        size = 16
+        grid = numpy.arange((size + 1) * (size + 1)).reshape(size + 1, size + 1)
+        corners = [grid[:-1, :-1].ravel(), grid[:-1, 1:].ravel(), grid[1:, :-1].ravel(), grid[1:, 1:].ravel()]
+        tris = numpy.concatenate((numpy.stack(corners[:2] + corners[3:], 1), numpy.stack(corners[3:0:-1], 1)))
+        tris = tris[numpy.random.RandomState(0).permutation(len(tris))].astype(numpy.uint32)
+        positions = numpy.stack((grid.ravel() % (size + 1), grid.ravel() // (size + 1), grid.ravel() * 0), 1)
+
+        for overdraw in [False, True]:
+            data = meshtools.optimize_vertex_cache({"position": positions, "tris": [tris]}, overdraw=overdraw)
+
+            (before, after), = data["acmr"]
+            self.assertAlmostEqual(before, meshtools.acmr(tris))
+            self.assertLess(after, 0.8 * before)
+
+            # same triangles, the first one uses the first vertices
+            self.assertEqual(sorted(map(str, data["position"][data["tris"][0]].tolist())),
+                             sorted(map(str, positions[tris].tolist())))
+            self.assertEqual(data["tris"][0][0].tolist(), [0, 1, 2])
+
+    def testDecimate(self):
+        # curved 32x32 grid of quads, split in two materials
+        size = 32
+        grid = numpy.arange((size + 1) * (size + 1)).reshape(size + 1, size + 1)
+        corners = [grid[:-1, :-1].ravel(), grid[:-1, 1:].ravel(), grid[1:, :-1].ravel(), grid[1:, 1:].ravel()]
+        tris = numpy.concatenate((numpy.stack(corners[:2] + corners[3:], 1),
+                                  numpy.stack(corners[::3] + corners[2:3], 1)))
+        x, y = grid.ravel() % (size + 1) / size, grid.ravel() // (size + 1) / size
+        positions = numpy.stack((x, y, 0.1 * numpy.sin(3 * x) * numpy.cos(2 * y)), 1).astype(numpy.float32)
+        data = {"position": positions, "texcoord": {"uv": positions[:, :2].copy()},
+                "tris": [tris[:len(tris) // 2].astype(numpy.uint32), tris[len(tris) // 2:].astype(numpy.uint32)]}
+
+        lod = meshtools.decimate(data, 0.25)
+
+        self.assertLessEqual(sum(len(t) for t in lod["tris"]), len(tris) // 4)
+        self.assertTrue(all(len(t) > 0 for t in lod["tris"]))
+        self.assertLess(len(lod["position"]), len(positions) // 2)
+
+        # only used vertices, which keep their attributes
+        indices = numpy.concatenate(lod["tris"]).ravel()
+        self.assertEqual(sorted(set(indices.tolist())), list(range(len(lod["position"]))))
+        numpy.testing.assert_array_equal(lod["texcoord"]["uv"], lod["position"][:, :2])
+
+        # boundary is kept in place
+        numpy.testing.assert_array_equal(lod["position"].min(axis=0)[:2], [0.0, 0.0])
+        numpy.testing.assert_array_equal(lod["position"].max(axis=0)[:2], [1.0, 1.0])
+
+    def testQuadricDecimationClosed(self):
+        # UV sphere, which is closed and has poles where many thin triangles meet
+        rings, segments = 12, 24
+        theta, phi = numpy.meshgrid(numpy.linspace(0.0, numpy.pi, rings + 1)[1:-1],
+                                    numpy.linspace(0.0, 2.0 * numpy.pi, segments, endpoint=False), indexing="ij")
+        positions = numpy.vstack((numpy.stack((numpy.sin(theta) * numpy.cos(phi), numpy.sin(theta) * numpy.sin(phi),
+                                               numpy.cos(theta)), -1).reshape(-1, 3), [(0, 0, 1), (0, 0, -1)]))
+        grid = numpy.arange((rings - 1) * segments).reshape(rings - 1, segments)
+        following = numpy.roll(grid, -1, axis=1)
+        poles = numpy.full(segments, len(positions) - 2)
+        tris = numpy.vstack((numpy.stack((grid[:-1], grid[1:], following[1:]), -1).reshape(-1, 3),
+                             numpy.stack((grid[:-1], following[1:], following[:-1]), -1).reshape(-1, 3),
+                             numpy.stack((poles, grid[0], following[0]), -1),
+                             numpy.stack((poles + 1, following[-1], grid[-1]), -1)))
+
+        for target_count in [len(tris) // 2, len(tris) // 8, 1]:
+            collapsed = meshtools.quadric_decimation(positions, tris, target_count)
+            remaining = collapsed[tris]
+            remaining = remaining[(remaining[:, 0] != remaining[:, 1]) & (remaining[:, 1] != remaining[:, 2]) &
+                                  (remaining[:, 2] != remaining[:, 0])]
+            self.assertLessEqual(len(remaining), target_count if target_count > 4 else 4)
+            if target_count < 4:
+                # a closed mesh is not reduced any further than to a tetrahedron
+                self.assertEqual(len(remaining), 4)
+
+            # still closed and manifold: every edge is used by exactly two triangles, once in every direction
+            edges = remaining[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+            self.assertEqual(len(set(map(tuple, edges.tolist()))), len(edges))
+            self.assertEqual(set(map(tuple, edges.tolist())), set(map(tuple, edges[:, ::-1].tolist())))
+
+            # no duplicate triangles
+            self.assertEqual(len(set(map(tuple, numpy.sort(remaining, axis=1).tolist()))), len(remaining))
+
+            # no flipped triangles, all of them still face away from the center of the remaining vertices
+            corners = positions[remaining] - positions[numpy.unique(remaining)].mean(axis=0)
+            normals = numpy.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+            self.assertTrue(numpy.all((normals * corners.sum(axis=1)).sum(axis=1) > 0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
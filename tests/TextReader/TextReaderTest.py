@@ -0,0 +1,83 @@
+import glob
+import os
+import unittest
+
+from io_scene_ogex.pyddl import *
+
+__author__ = 'Jonathan Hale'
+
+
+# Test reading exported documents back with DdlTextReader
+class TextReaderTest(unittest.TestCase):
+
+    tests_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    filename = os.path.dirname(os.path.realpath(__file__)) + os.sep + "Test.ogex"
+
+    def tearDown(self):
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+    def readContents(self, filename):
+        file = open(filename)
+        contents = file.readlines()
+        file.close()
+
+        return contents
+
+    def testRoundTrip(self):
+        for expected in ["Camera", "Lights", "LinkedParentedObjects", "PhysicsConstraints"]:
+            expected_filename = self.tests_dir + os.sep + expected + os.sep + "Expected.ogex"
+            DdlTextWriter(DdlTextReader().read(expected_filename), rounding=None).write(self.filename)
+
+            self.assertEqual(self.readContents(self.filename), self.readContents(expected_filename))
+
+    def testReadGeometry(self):
+        document = DdlTextReader().read(self.tests_dir + os.sep + "Geometry" + os.sep + "Expected.ogex")
+
+        node = document.structures[4]
+        geometry = document.structures[5]
+        self.assertEqual(node.identifier, B"GeometryNode")
+        self.assertIs(node.children[1].children[0].data[0], geometry)
+
+        positions = geometry.children[0].children[0].children[0]
+        self.assertEqual(positions.vector_size, 3)
+        self.assertEqual(positions.element_count(), int(positions.comment))
+        self.assertEqual(positions.data[0:3].tolist(), [0.492, -0.721, 0.186])
+
+    def testReadAllExpected(self):
+        for expected_filename in glob.glob(self.tests_dir + os.sep + "*" + os.sep + "Expected.ogex"):
+            document = DdlTextReader().read(expected_filename)
+            DdlTextWriter(document, rounding=None).write(self.filename)
+
+            # writing the read document is stable
+            rewritten = self.readContents(self.filename)
+            DdlTextWriter(DdlTextReader().read(self.filename), rounding=None).write(self.filename)
+            self.assertEqual(self.readContents(self.filename), rewritten)
+
+    def testHalfRoundTrip(self):
+        # 1/3 rounds to 0x3555, 1e-6 to a subnormal, 65519 to the largest half and 1e5 to infinity
+        values = [0.0, 1.0 / 3.0, -2.5, 1e-6, 65519.0]
+        halves = [0.0, 0.333251953125, -2.5, 1.0132789611816406e-06, 65504.0]
+
+        self.assertEqual([DdlWriter.float_to_half_bits(f) for f in values + [1e5]],
+                         [0x0000, 0x3555, 0xc100, 0x0011, 0x7bff, 0x7c00])
+
+        document = DdlDocument()
+        document.add_structure(B"Data", children=[DdlPrimitive(DdlPrimitiveDataType.half, values)])
+        for encoding in DdlFloatEncoding:
+            DdlTextWriter(document, rounding=None, float_encoding=encoding).write(self.filename)
+            data = DdlTextReader().read(self.filename).structures[0].children[0].data
+
+            if encoding == DdlFloatEncoding.float32:
+                # shortest decimals which convert to the same half floats
+                data = DdlTextWriter.round_to_half(data)
+            self.assertEqual(list(data), halves)
+
+    def testInvalidDocuments(self):
+        for text in [B"Metric {", B"Metric {float {1, x}}", B"Transform {float[2] {{1, 2, 3}}}",
+                     B"ObjectRef {ref {$missing}}"]:
+            with self.assertRaises(ValueError):
+                DdlTextReader().parse(text)
+
+if __name__ == '__main__':
+    unittest.main()
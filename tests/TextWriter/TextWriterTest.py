@@ -0,0 +1,322 @@
+import bz2
+import gzip
+import lzma
+import math
+import os
+import tracemalloc
+import unittest
+from array import array
+from unittest import mock
+
+import numpy
+
+from io_scene_ogex.pyddl import *
+from io_scene_ogex.pygex import VertexArray, index_data_type, to_unorm8
+
+__author__ = 'Jonathan Hale'
+
+
+# Test the output of the text writers without exporting from Blender
+class TextWriterTest(unittest.TestCase):
+
+    filename = os.path.dirname(os.path.realpath(__file__)) + os.sep + "Test.ogex"
+
+    def tearDown(self):
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+    def readBytes(self, filename):
+        with open(filename, "rb") as file:
+            return file.read()
+
+    def createDocument(self):
+        document = DdlDocument()
+        document.add_structure(B"Metric", None, [DdlPrimitive(DdlPrimitiveDataType.float, [1.0])],
+                               {B"key": B"\"distance\""})
+        document.add_structure(B"Metric", None, [DdlPrimitive(DdlPrimitiveDataType.string, ["z"])],
+                               {B"key": B"\"up\""})
+
+        material = document.add_structure(B"Material", B"material1")
+        material.add_structure(B"Name").add_primitive(DdlPrimitiveDataType.string, ["Material \"1\""])
+        material.add_structure(B"Color", None, None, {B"attrib": B"\"diffuse\""}).add_primitive(
+            DdlPrimitiveDataType.float, [(0.8, 0.25, 0.125)], vector_size=3)
+
+        node = document.add_structure(B"GeometryNode", B"node1", None, {B"visible": True, B"lod": 2})
+        node.comment = B"node1"
+        node.add_structure(B"Name").add_primitive(DdlPrimitiveDataType.string, ["Cube"])
+        node.add_structure(B"MaterialRef", None, None, {B"index": 0}).add_primitive(DdlPrimitiveDataType.ref,
+                                                                                    [material])
+        node.add_structure(B"Transform").add_primitive(DdlPrimitiveDataType.float, [tuple(
+            float(i == j) + 0.1234567 * j for j in range(16)) for i in range(2)], vector_size=16)
+
+        geometry = document.add_structure(B"GeometryObject", B"geometry1")
+        mesh = geometry.add_structure(B"Mesh", None, None, {B"primitive": B"\"triangles\""})
+        mesh.add_structure(B"VertexArray", None, None, {B"attrib": B"\"position\""}).add_primitive(
+            DdlPrimitiveDataType.float, [(i * 0.5, -i / 3.0, 1e-5 * i) for i in range(40)], vector_size=3)
+        mesh.add_structure(B"IndexArray").add_primitive(DdlPrimitiveDataType.unsigned_int32,
+                                                        [(i, i + 1, i + 2) for i in range(0, 37, 3)], vector_size=3)
+        mesh.add_structure(B"Flags").add_primitive(DdlPrimitiveDataType.bool, [True, False, True, True, False])
+
+        document.add_structure(B"Extension", None, [DdlPrimitive(DdlPrimitiveDataType.int32, [-1])])
+
+        return document
+
+    def expectedText(self, writer):
+        structures = writer.get_document().structures
+        if isinstance(writer, DdlCompressedTextWriter):
+            return B"".join(map(writer.structure_as_text, structures))
+
+        # top-level structures are separated by empty lines, except between two simple structures
+        text = []
+        previous_was_simple = False
+        for i, structure in enumerate(structures):
+            if i != 0 and not (previous_was_simple and structure.is_simple_structure()):
+                text.append(B"\n")
+                previous_was_simple = structure.is_simple_structure()
+            elif i == 0:
+                previous_was_simple = structure.is_simple_structure()
+
+            text.append(writer.structure_as_text(structure))
+
+        return B"".join(text)
+
+    def testStreamedWrite(self):
+        for writer_class in [DdlTextWriter, DdlCompressedTextWriter]:
+            for rounding in [6, None]:
+                writer = writer_class(self.createDocument(), rounding=rounding)
+                writer.write(self.filename)
+
+                self.assertEqual(self.readBytes(self.filename), self.expectedText(writer),
+                                 "{} with rounding {}".format(writer_class.__name__, rounding))
+
+    def testRoundedFloatArray(self):
+        values = (10.00001, 0.00001234, 100.000001, 1.5, -20.00005, 3.0000099, -0.00001, 0.0, -0.0, 1e-7, 0.5e-4,
+                  123456789.123456, 999999999.999999, 1e9, -1e9 - 0.5, 1234567890.12345, 1e16, -2.5e17, 1e300,
+                  float("inf"), float("nan"))
+
+        for rounding in [1, 3, 6, 9]:
+            writer = DdlTextWriter(DdlDocument(), rounding=rounding)
+            self.assertEqual(writer.rounded_float_array_as_bytes(values, rounding),
+                             list(map(writer.to_float_byte_rounded, values)), "rounding {}".format(rounding))
+
+        self.assertEqual(writer.rounded_float_array_as_bytes(values, None), list(map(writer.to_float_byte, values)))
+
+    def testSimplePrimitive(self):
+        # simple primitives with up to four values are written on one line with all of their values. Primitives without
+        # a vector size used to be written with their first value only, dropping the others
+        structures = [DdlStructure(B"Range", None, [DdlPrimitive(DdlPrimitiveDataType.float, [0.5, 1.0, 2.25])]),
+                      DdlStructure(B"Ints", None, [DdlPrimitive(DdlPrimitiveDataType.int32, [1, -2, 3, -4])],
+                                   {B"key": 1}),
+                      DdlStructure(B"Color", None, [DdlPrimitive(DdlPrimitiveDataType.float, [(0.5, 1.0)],
+                                                                 vector_size=2)])]
+
+        self.assertEqual(list(map(DdlTextWriter(None).structure_as_text, structures)),
+                         [B"Range {float {0.5, 1.0, 2.25}}\n", B"Ints (key = 1) {int32 {1, -2, 3, -4}}\n",
+                          B"Color {float[2] {{0.5, 1.0}}}\n"])
+        self.assertEqual(list(map(DdlCompressedTextWriter(None).structure_as_text, structures)),
+                         [B"Range{float{0.5,1.0,2.25}}", B"Ints(key=1){int32{1,-2,3,-4}}",
+                          B"Color{float[2]{{0.5,1.0}}}"])
+
+        document = DdlDocument()
+        document.structures = structures
+        DdlTextWriter(document).write(self.filename)
+        read = DdlTextReader().read(self.filename)
+        self.assertEqual([s.children[0].flat_values() for s in read.structures], [(0.5, 1.0, 2.25), (1, -2, 3, -4),
+                                                                                  (0.5, 1.0)])
+
+    def testWorkers(self):
+        for writer_class in [DdlTextWriter, DdlCompressedTextWriter]:
+            writer_class(self.createDocument(), workers=1).write(self.filename)
+            expected = self.readBytes(self.filename)
+
+            writer_class(self.createDocument(), workers=4).write(self.filename)
+            self.assertEqual(self.readBytes(self.filename), expected, writer_class.__name__)
+
+            # platforms without fork serialize in this process
+            with mock.patch("multiprocessing.get_context", side_effect=ValueError) as get_context:
+                writer_class(self.createDocument(), workers=4).write(self.filename)
+                get_context.assert_called_once_with("fork")
+            self.assertEqual(self.readBytes(self.filename), expected, writer_class.__name__)
+
+    def testCompression(self):
+        document = self.createDocument()
+        # large enough for the text forms to be written in several blocks
+        document.add_structure(B"VertexArray", None, None, {B"attrib": B"\"normal\""}).add_primitive(
+            DdlPrimitiveDataType.float, [(i * 0.25, -i * 0.125, 1.0) for i in range(60000)], vector_size=3)
+
+        for writer in [DdlTextWriter(document), DdlCompressedTextWriter(document), DdlBinaryWriter(document)]:
+            writer.write(self.filename)
+            expected = self.readBytes(self.filename)
+
+            for compression, module in [("gzip", gzip), ("bz2", bz2), ("lzma", lzma)]:
+                writer.write(self.filename, compression, 1)
+                with module.open(self.filename, "rb") as file:
+                    self.assertEqual(file.read(), expected, "{} {}".format(type(writer).__name__, compression))
+
+    def testJoinChunks(self):
+        chunks = [bytes([i % 256]) * (i * 7 % 50) for i in range(100)]
+
+        for size in [1, 64, 100, 10000]:
+            blocks = list(DdlWriter.join_chunks(chunks, size))
+            self.assertEqual(B"".join(blocks), B"".join(chunks))
+            for block in blocks[:-1]:
+                self.assertGreaterEqual(len(block), size)
+            # the last block may be smaller, but is never dropped or empty
+            self.assertGreater(len(blocks[-1]), 0)
+
+        self.assertEqual(list(DdlWriter.join_chunks(chunks, 10000)), [B"".join(chunks)])
+        self.assertEqual(list(DdlWriter.join_chunks([B"ab", B"cd", B"e"], 4)), [B"abcd", B"e"])
+        self.assertEqual(list(DdlWriter.join_chunks([])), [])
+
+    # zeros, the smallest and largest subnormal, the largest float32 and values which are not exact in float32
+    float32_values = (0.0, -0.0, 1.401298464324817e-45, -1e-40, 1.1754942106924411e-38, 3.4028234663852886e+38, 0.1,
+                      1.0 / 3.0, -2.5, 16777217.0)
+    non_finite_values = (float("inf"), float("-inf"), float("nan"))
+
+    def float32Bits(self, values):
+        return list(array("I", array("f", values).tobytes()))
+
+    def testHexFloats(self):
+        values = self.float32_values + self.non_finite_values
+        document = DdlDocument()
+        document.add_structure(B"Values").add_primitive(DdlPrimitiveDataType.float, list(values))
+        writer = DdlTextWriter(document, float_encoding=DdlFloatEncoding.hex)
+        reader = DdlTextReader()
+
+        for data_type, bits in [(DdlPrimitiveDataType.float, self.float32Bits),
+                                (DdlPrimitiveDataType.double, lambda v: list(array("Q", array("d", v).tobytes())))]:
+            to_bytes = writer.get_conversion_function(DdlPrimitive(data_type, values))
+            tokens = writer.float_array_as_bytes(values, data_type)
+            self.assertEqual(tokens, list(map(to_bytes, values)))
+
+            # the bit patterns are kept exactly, including the sign of zero, infinity and nan
+            self.assertEqual(bits([reader.number_literal(token, data_type) for token in tokens]), bits(values))
+
+        writer.write(self.filename)
+        read = DdlTextReader().read(self.filename).structures[0].children[0]
+        self.assertEqual(self.float32Bits(read.flat_values()), self.float32Bits(values))
+
+    def testFloat32Floats(self):
+        writer = DdlTextWriter(None, float_encoding=DdlFloatEncoding.float32)
+        to_bytes = writer.get_conversion_function(DdlPrimitive(DdlPrimitiveDataType.float, []))
+
+        tokens = writer.float_array_as_bytes(self.float32_values)
+        self.assertEqual(tokens, list(map(to_bytes, self.float32_values)))
+        self.assertEqual(tokens, [B"0.0", B"-0.0", B"1e-45", B"-1e-40", B"1.1754942e-38", B"3.4028235e+38", B"0.1",
+                                  B"0.33333334", B"-2.5", B"16777216.0"])
+
+        # the shortest decimals convert back to the same float32, including the sign of zero
+        self.assertEqual(self.float32Bits(map(float, tokens)), self.float32Bits(self.float32_values))
+
+        # like the fixed encoding, the float32 encoding writes infinity and nan as 0.0
+        self.assertEqual(writer.float_array_as_bytes(self.non_finite_values), [B"0.0"] * 3)
+        self.assertEqual(list(map(to_bytes, self.non_finite_values)), [B"0.0"] * 3)
+        self.assertEqual(writer.float_array_as_bytes((1.5,) + self.non_finite_values), [B"1.5"] + [B"0.0"] * 3)
+
+    def testSpoolStructure(self):
+        document = self.createDocument()
+        geometry = next(s for s in document.structures if s.identifier == B"GeometryObject")
+        mesh = geometry.children[0]
+        mesh.children[0].children[0].data *= 2500
+
+        writer = DdlTextWriter(document)
+        writer.write(self.filename)
+        expected = self.readBytes(self.filename)
+        text_length = len(writer.serialize_structure(mesh, depth=1).text)
+        self.assertGreater(text_length, 1 << 20)
+
+        tracemalloc.start()
+        try:
+            geometry.children[0] = writer.spool_structure(mesh, depth=1)
+            mesh = None
+            retained, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        # neither the text nor the data of the structure are kept in memory, only objects the interpreter keeps for
+        # reuse remain allocated
+        self.assertLess(retained, text_length // 10)
+        self.assertEqual(geometry.children[0].length, text_length)
+
+        writer.write(self.filename)
+        writer.close_spool()
+        self.assertEqual(self.readBytes(self.filename), expected)
+
+    def testSpoolSimpleStructures(self):
+        document = self.createDocument()
+        writer = DdlTextWriter(document)
+        writer.write(self.filename)
+        expected = self.readBytes(self.filename)
+
+        # substructures of the node and all top-level structures, both with simple and not simple neighbours
+        node = next(s for s in document.structures if s.identifier == B"GeometryNode")
+        node.children = [writer.spool_structure(child, depth=1) for child in node.children]
+        document.structures = [writer.spool_structure(structure) for structure in document.structures]
+        self.assertEqual([structure.is_simple_structure() for structure in document.structures],
+                         [True, True, False, False, False, True])
+
+        writer.write(self.filename)
+        writer.close_spool()
+        self.assertEqual(self.readBytes(self.filename), expected)
+
+    def readPrimitive(self, structure, rounding=None):
+        document = DdlDocument()
+        document.structures.append(structure)
+        DdlTextWriter(document, rounding=rounding).write(self.filename)
+        return DdlTextReader().read(self.filename).structures[0].children[0]
+
+    def testCompactIndices(self):
+        for count, data_type in [(1, DdlPrimitiveDataType.unsigned_int8), (0x100, DdlPrimitiveDataType.unsigned_int8),
+                                 (0x101, DdlPrimitiveDataType.unsigned_int16),
+                                 (0x10000, DdlPrimitiveDataType.unsigned_int16),
+                                 (0x10001, DdlPrimitiveDataType.unsigned_int32)]:
+            self.assertEqual(index_data_type(count), data_type, "{} indices".format(count))
+
+            # the largest index of the vertices is written and read back unchanged
+            indices = [(0, count - 1, count // 2)] * 2
+            structure = DdlStructure(B"IndexArray", children=[DdlPrimitive(data_type, indices, vector_size=3)])
+            self.assertIn(B"\t" + bytes(data_type.name, "UTF-8") + B"[3]\n",
+                          DdlTextWriter(None).structure_as_text(structure))
+
+            primitive = self.readPrimitive(structure)
+            self.assertEqual(primitive.data_type, data_type)
+            self.assertEqual(primitive.flat_values(), (0, count - 1, count // 2) * 2)
+
+    def testHalfPrecision(self):
+        # exact halves, values rounded to even, the largest half, the smallest normal and subnormal halves
+        values = [(0.0, -0.0, 1.0), (-1.0, 1.0 / 3.0, 1.0 + 2.0 ** -11), (65504.0, 2.0 ** -14, 2.0 ** -24),
+                  (0.1, -0.7, 2.0 ** -25 * 1.5)]
+        expected = (0.0, -0.0, 1.0, -1.0, 0.333251953125, 1.0, 65504.0, 2.0 ** -14, 2.0 ** -24, 0.0999755859375,
+                    -0.7001953125, 2.0 ** -24)
+
+        structure = VertexArray(B"normal", values, len(values), data_type=DdlPrimitiveDataType.half)
+        text = DdlTextWriter(None).structure_as_text(structure)
+        self.assertIn(B"\thalf[3]\t\t// 4\n", text)
+
+        primitive = self.readPrimitive(structure)
+        self.assertEqual(primitive.data_type, DdlPrimitiveDataType.half)
+        self.assertEqual(primitive.flat_values(), expected)
+        self.assertEqual([math.copysign(1.0, f) for f in primitive.flat_values()[:2]], [1.0, -1.0])
+
+        # bulk mesh extraction passes NumPy arrays, which are converted by NumPy
+        array_structure = VertexArray(B"normal", numpy.array(values, "f4"), len(values),
+                                      data_type=DdlPrimitiveDataType.half)
+        self.assertEqual(DdlTextWriter(None).structure_as_text(array_structure), text)
+
+        # with rounding, the half values are rounded like floats
+        self.assertEqual(self.readPrimitive(structure, 6).flat_values(), tuple(round(f, 6) for f in expected))
+
+    def testByteColors(self):
+        # clamped to 0 and 1, rounded to the nearest byte with halves rounded up
+        colors = [(-0.5, 0.0, 0.5 / 255.0, 0.49 / 255.0), (0.5, 254.5 / 255.0, 1.0, 1.5)]
+        expected = [(0, 0, 1, 0), (128, 255, 255, 255)]
+        self.assertEqual(to_unorm8(colors), expected)
+        self.assertEqual(to_unorm8(numpy.array(colors, "f4")).tolist(), list(map(list, expected)))
+
+        structure = VertexArray(B"color", to_unorm8(colors), len(colors), vector_size=4,
+                                data_type=DdlPrimitiveDataType.unsigned_int8)
+        self.assertIn(B"unsigned_int8[4]", DdlTextWriter(None).structure_as_text(structure))
+        self.assertEqual(self.readPrimitive(structure).flat_values(), sum(expected, ()))
+
+
+if __name__ == '__main__':
+    unittest.main()